@@ -20,10 +20,12 @@ from obiba_opal.dictionary import (
 )
 from obiba_opal.data import DataService, EntityService
 from obiba_opal.analysis import AnalysisCommand, ExportAnalysisService
-from obiba_opal.file import FileService
+from obiba_opal.file import FileService, FileDownloadCommand
 from obiba_opal.exports import (
     ExportPluginCommand,
     ExportCSVCommand,
+    ExportLocalCommand,
+    ExportSyncCommand,
     ExportXMLCommand,
     ExportRSASCommand,
     ExportRSPSSCommand,
@@ -45,8 +47,10 @@ from obiba_opal.perm import (
     SystemPermService,
 )
 from obiba_opal.imports import (
+    ImportBatchCommand,
     ImportPluginCommand,
     ImportCSVCommand,
+    ImportDataFrameCommand,
     ImportIDMapService,
     ImportIDService,
     ImportLimeSurveyCommand,
@@ -66,6 +70,7 @@ from obiba_opal.system import (
     TaskService,
     RESTService,
 )
+from obiba_opal.identifiers import IdentifierMap
 from obiba_opal.sql import SQLService, SQLHistoryService
 from obiba_opal.security import EncryptService, DecryptService
 
@@ -91,8 +96,11 @@ __all__ = [
     "AnalysisCommand",
     "ExportAnalysisService",
     "FileService",
+    "FileDownloadCommand",
     "ExportPluginCommand",
     "ExportCSVCommand",
+    "ExportLocalCommand",
+    "ExportSyncCommand",
     "ExportXMLCommand",
     "ExportRSASCommand",
     "ExportRSPSSCommand",
@@ -111,8 +119,10 @@ __all__ = [
     "RPermService",
     "DataSHIELDPermService",
     "SystemPermService",
+    "ImportBatchCommand",
     "ImportPluginCommand",
     "ImportCSVCommand",
+    "ImportDataFrameCommand",
     "ImportIDMapService",
     "ImportIDService",
     "ImportLimeSurveyCommand",
@@ -129,6 +139,7 @@ __all__ = [
     "TaxonomyService",
     "TaskService",
     "RESTService",
+    "IdentifierMap",
     "SQLService",
     "SQLHistoryService",
     "EncryptService",
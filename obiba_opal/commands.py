@@ -26,10 +26,12 @@ from obiba_opal.dictionary import (
 )
 from obiba_opal.data import DataService, EntityService
 from obiba_opal.analysis import AnalysisCommand, ExportAnalysisService
-from obiba_opal.file import FileService
+from obiba_opal.file import FileService, FileDownloadCommand
 from obiba_opal.exports import (
     ExportPluginCommand,
     ExportCSVCommand,
+    ExportLocalCommand,
+    ExportSyncCommand,
     ExportXMLCommand,
     ExportRSASCommand,
     ExportRSPSSCommand,
@@ -51,6 +53,7 @@ from obiba_opal.perm import (
     SystemPermService,
 )
 from obiba_opal.imports import (
+    ImportBatchCommand,
     ImportPluginCommand,
     ImportCSVCommand,
     ImportIDMapService,
@@ -304,8 +307,8 @@ def dict_command(
     no_ssl_verify: bool = typer.Option(
         False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
     ),
-    name: str = typer.Argument(
-        ...,
+    name: str | None = typer.Argument(
+        None,
         help="Fully qualified name of a datasource/project or a table or a variable, "
         "for instance: opal-data or opal-data.questionnaire or "
         "opal-data.questionnaire:Q1. Wild cards can also be used, "
@@ -313,7 +316,32 @@ def dict_command(
     ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
     excel: str | None = typer.Option(
-        None, "--excel", "-xls", help="Full path of the target data dictionary Excel file."
+        None,
+        "--excel",
+        "-xls",
+        help="Full path of the target data dictionary Excel file. When the name is a project or "
+        "all the tables of a project (<project> or <project>.*), full path of the target folder, or of the "
+        "target zip file if it ends with '.zip', of the Excel data dictionaries of the tables.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent requests (default is 4)."
+    ),
+    diff: tuple[str, str] | None = typer.Option(
+        None,
+        "--diff",
+        "-df",
+        help="Compare the data dictionaries of two projects or two tables (SRC DST), for instance: "
+        "opal-data opal-data-prod or opal-data.questionnaire opal-data-prod.questionnaire.",
+    ),
+    diff_opal: str | None = typer.Option(
+        None,
+        "--diff-opal",
+        "-do",
+        help="Opal server base url of the DST data dictionary, using the same credentials "
+        "(default is the same Opal server).",
+    ),
+    csv_output: bool = typer.Option(
+        False, "--csv", help="CSV formatting of the data dictionaries comparison report (default is JSON)."
     ),
 ):
     """Query for data dictionary."""
@@ -330,6 +358,10 @@ def dict_command(
         name=name,
         json=json_output,
         excel=excel,
+        max_workers=max_workers,
+        diff=diff,
+        diff_opal=diff_opal,
+        csv=csv_output,
     )
     DictionaryService.do_command(args)
 
@@ -601,11 +633,79 @@ def file_command(
     download_password: str | None = typer.Option(
         None, "--download-password", "-dlp", help="Password to encrypt the file content."
     ),
+    extract_to: str | None = typer.Option(
+        None,
+        "--extract-to",
+        "-x",
+        help="Download a folder, or a password protected file, as a zip archive that is extracted in a local "
+        "directory while it is streamed.",
+    ),
+    output: str | None = typer.Option(
+        None,
+        "--output",
+        "-out",
+        help="Local file path of the download (default is the standard output). A file download is resumed if it "
+        "was interrupted.",
+    ),
+    segments: int = typer.Option(
+        1,
+        "--segments",
+        "-sg",
+        help="Number of ranged segments of a file download, downloaded in parallel (default is 1).",
+    ),
+    retries: int = typer.Option(
+        3,
+        "--retries",
+        "-rs",
+        help="Maximum number of retries of a file download, after an interruption (default is 3).",
+    ),
     upload: str | None = typer.Option(
         None, "--upload", "-up", help="Upload a local file to a folder in Opal file system."
     ),
+    skip_unchanged: bool = typer.Option(
+        False, "--skip-unchanged", "-su", help="Do not upload the file if the file in Opal is identical."
+    ),
+    hash_cache: str | None = typer.Option(
+        None,
+        "--hash-cache",
+        "-hc",
+        help="Local file of the content hashes of the uploaded, downloaded or synchronized files, to compare them "
+        "by content.",
+    ),
     delete: bool = typer.Option(False, "--delete", "-dt", help="Delete a file on Opal file system."),
     force: bool = typer.Option(False, "--force", "-f", help="Skip confirmation."),
+    sync: str | None = typer.Option(
+        None,
+        "--sync",
+        "-sy",
+        help="Synchronize a local folder with the folder in Opal file system, only the files that differ are "
+        "transferred.",
+    ),
+    direction: str = typer.Option(
+        "up",
+        "--direction",
+        "-di",
+        help="Synchronization direction: 'up' to upload the local folder (default), 'down' to download the Opal "
+        "folder.",
+    ),
+    checksum: bool = typer.Option(
+        False,
+        "--checksum",
+        "-cs",
+        help="Compare the content of the files of same size, instead of their modification time.",
+    ),
+    delete_extra: bool = typer.Option(
+        False,
+        "--delete-extra",
+        "-de",
+        help="Delete the files of the synchronized folder that are not in the source folder.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent file transfers (default is 4)."
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-dr", help="Report the files to be transferred or deleted, without synchronizing them."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Manage Opal file system."""
@@ -622,14 +722,88 @@ def file_command(
         path=path,
         download=download,
         download_password=download_password,
+        extract_to=extract_to,
+        output=output,
+        segments=segments,
+        retries=retries,
         upload=upload,
+        skip_unchanged=skip_unchanged,
+        hash_cache=hash_cache,
         delete=delete,
         force=force,
+        sync=sync,
+        direction=direction,
+        checksum=checksum,
+        delete_extra=delete_extra,
+        max_workers=max_workers,
+        dry_run=dry_run,
         json=json_output,
     )
     FileService.do_command(args)
 
 
+def file_download_command(
+    ctx: typer.Context,
+    opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
+    user: str | None = typer.Option(
+        None, "--user", "-u", help="Credentials auth: user name (password will be requested if not provided)"
+    ),
+    password: str | None = typer.Option(
+        None, "--password", "-p", help="Credentials auth: user password (requires a user name)"
+    ),
+    token: str | None = typer.Option(None, "--token", "-tk", help="Token auth: User access token"),
+    ssl_cert: str | None = typer.Option(
+        None, "--ssl-cert", "-sc", help="Two-way SSL auth: certificate/public key file (requires a private key)"
+    ),
+    ssl_key: str | None = typer.Option(
+        None, "--ssl-key", "-sk", help="Two-way SSL auth: private key file (requires a certificate)"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose output"),
+    no_ssl_verify: bool = typer.Option(
+        False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
+    ),
+    paths: list[str] = typer.Argument(
+        ..., help="File or folder paths in Opal file system, or glob patterns (e.g. '/projects/*/export/*.csv')."
+    ),
+    output: str = typer.Option(..., "--output", "-out", help="Local directory where the files are downloaded."),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent file downloads (default is 4)."
+    ),
+    segments: int = typer.Option(
+        1,
+        "--segments",
+        "-sg",
+        help="Number of ranged segments of a file download, downloaded in parallel (default is 1).",
+    ),
+    retries: int = typer.Option(
+        3,
+        "--retries",
+        "-rs",
+        help="Maximum number of retries of a file download, after an interruption (default is 3).",
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
+):
+    """Download files in parallel."""
+    args = _make_args_with_globals(
+        ctx,
+        opal=opal,
+        user=user,
+        password=password,
+        token=token,
+        ssl_cert=ssl_cert,
+        ssl_key=ssl_key,
+        verbose=verbose,
+        no_ssl_verify=no_ssl_verify,
+        paths=paths,
+        output=output,
+        max_workers=max_workers,
+        segments=segments,
+        retries=retries,
+        json=json_output,
+    )
+    FileDownloadCommand.do_command(args)
+
+
 # =============================================================================
 # Table Commands
 # =============================================================================
@@ -715,6 +889,10 @@ def delete_table_command(
     ),
     project: str = typer.Option(..., "--project", "-pr", help="Project name"),
     tables: list[str] | None = typer.Option(None, "--tables", "-t", help="List of table names to be deleted"),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent requests (default is 4)."
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Delete some tables."""
     args = _make_args_with_globals(
@@ -729,6 +907,8 @@ def delete_table_command(
         no_ssl_verify=no_ssl_verify,
         project=project,
         tables=tables,
+        max_workers=max_workers,
+        json=json_output,
     )
     DeleteTableService.do_command(args)
 
@@ -967,6 +1147,41 @@ def import_csv_command(
         help="Default value type (text, integer, decimal, boolean etc.).",
     ),
     entity_type: str = typer.Option("Participant", "--type", "-ty", help="Entity type (e.g. Participant)"),
+    local: str | None = typer.Option(
+        None,
+        "--local",
+        "-lo",
+        help="Local CSV file to import: it is split in chunks of rows that are uploaded into the --path "
+        "folder of the Opal filesystem and imported in parallel into the same table.",
+    ),
+    chunk_rows: int = typer.Option(
+        100000, "--chunk-rows", "-cr", help="Number of rows per chunk of the local CSV file (default is 100000)."
+    ),
+    max_workers: int = typer.Option(
+        2,
+        "--max-workers",
+        "-mw",
+        help="Maximum number of chunks being uploaded or imported concurrently (default is 2).",
+    ),
+    validate: bool = typer.Option(
+        False,
+        "--validate",
+        "-va",
+        help="Validate the --local CSV file and report the inferred column value types and the suggested "
+        "import configuration, without importing it.",
+    ),
+    checkpoint: str | None = typer.Option(
+        None,
+        "--checkpoint",
+        "-cp",
+        help="Checkpoint file, where the task ID and status of each part of the import are recorded.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        "-re",
+        help="Resume an interrupted import from its checkpoint file: completed parts are skipped and in-flight tasks are waited for instead of being submitted again.",
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Import data from a CSV file."""
@@ -994,6 +1209,12 @@ def import_csv_command(
         firstRow=first_row,
         valueType=value_type,
         type=entity_type,
+        local=local,
+        chunk_rows=chunk_rows,
+        max_workers=max_workers,
+        validate=validate,
+        checkpoint=checkpoint,
+        resume=resume,
         json=json_output,
     )
     ImportCSVCommand.do_command(args)
@@ -1267,6 +1488,18 @@ def import_r_spss_command(
         "-mg",
         help="Merge imported data dictionary with the destination one (default is false, i.e. data dictionary is overridden).",
     ),
+    checkpoint: str | None = typer.Option(
+        None,
+        "--checkpoint",
+        "-cp",
+        help="Checkpoint file, where the task ID and status of each part of the import are recorded.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        "-re",
+        help="Resume an interrupted import from its checkpoint file: completed parts are skipped and in-flight tasks are waited for instead of being submitted again.",
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
     locale: str | None = typer.Option(None, "--locale", "-l", help="Preferred locale (e.g. 'en')"),
     type: str = typer.Option("Participant", "--type", "-ty", help="Entity type (e.g. 'Participant')"),
@@ -1296,6 +1529,8 @@ def import_r_spss_command(
         identifiers=identifiers,
         policy=policy,
         merge=merge,
+        checkpoint=checkpoint,
+        resume=resume,
         json=json_output,
         locale=locale,
         type=type,
@@ -1429,6 +1664,18 @@ def import_opal_command(
         "-mg",
         help="Merge imported data dictionary with the destination one (default is false, i.e. data dictionary is overridden).",
     ),
+    group_size: int | None = typer.Option(
+        None,
+        "--group-size",
+        "-gs",
+        help="Split the import in jobs of at most this number of tables (1 for one job per table), that are submitted concurrently and retried independently. The default is a single job for all the tables.",
+    ),
+    max_workers: int = typer.Option(
+        2,
+        "--max-workers",
+        "-mw",
+        help="Maximum number of import jobs running concurrently, when split in jobs (default is 2).",
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Import data from a remote Opal server."""
@@ -1454,6 +1701,8 @@ def import_opal_command(
         identifiers=identifiers,
         policy=policy,
         merge=merge,
+        group_size=group_size,
+        max_workers=max_workers,
         json=json_output,
     )
     ImportOpalCommand.do_command(args)
@@ -1579,6 +1828,18 @@ def import_sql_command(
         "-mg",
         help="Merge imported data dictionary with the destination one (default is false, i.e. data dictionary is overridden).",
     ),
+    checkpoint: str | None = typer.Option(
+        None,
+        "--checkpoint",
+        "-cp",
+        help="Checkpoint file, where the task ID and status of each part of the import are recorded.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        "-re",
+        help="Resume an interrupted import from its checkpoint file: completed parts are skipped and in-flight tasks are waited for instead of being submitted again.",
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Import data from a SQL database."""
@@ -1600,6 +1861,8 @@ def import_sql_command(
         identifiers=identifiers,
         policy=policy,
         merge=merge,
+        checkpoint=checkpoint,
+        resume=resume,
         json=json_output,
     )
     ImportSQLCommand.do_command(args)
@@ -1629,6 +1892,19 @@ def import_vcf_command(
         ..., "--project", "-pr", help="Project name into which genotypes data will be imported"
     ),
     vcf: list[str] = typer.Option(..., "--vcf", help="List of VCF/BCF file paths (in Opal file system)"),
+    shard: bool = typer.Option(
+        False,
+        "--shard",
+        "-sh",
+        help="One task per VCF/BCF file, tasks are run concurrently and the failed ones are retried. The progress is reported until all the tasks are completed.",
+    ),
+    max_workers: int = typer.Option(
+        2, "--max-workers", "-mw", help="Maximum number of tasks running concurrently, when sharded (default is 2)."
+    ),
+    retries: int = typer.Option(
+        1, "--retries", "-rs", help="Number of retries of a failed task, when sharded (default is 1)."
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Import genotypes data from some VCF/BCF files."""
     args = _make_args_with_globals(
@@ -1643,10 +1919,80 @@ def import_vcf_command(
         no_ssl_verify=no_ssl_verify,
         project=project,
         vcf=vcf,
+        shard=shard,
+        max_workers=max_workers,
+        retries=retries,
+        json=json_output,
     )
     ImportVCFCommand.do_command(args)
 
 
+def import_batch_command(
+    ctx: typer.Context,
+    opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
+    user: str | None = typer.Option(
+        None, "--user", "-u", help="Credentials auth: user name (password will be requested if not provided)"
+    ),
+    password: str | None = typer.Option(
+        None, "--password", "-p", help="Credentials auth: user password (requires a user name)"
+    ),
+    token: str | None = typer.Option(None, "--token", "-tk", help="Token auth: User access token"),
+    ssl_cert: str | None = typer.Option(
+        None, "--ssl-cert", "-sc", help="Two-way SSL auth: certificate/public key file (requires a private key)"
+    ),
+    ssl_key: str | None = typer.Option(
+        None, "--ssl-key", "-sk", help="Two-way SSL auth: private key file (requires a certificate)"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose output"),
+    no_ssl_verify: bool = typer.Option(
+        False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
+    ),
+    manifest: str = typer.Argument(
+        ...,
+        help="Manifest file (JSON or YAML) with the list of imports. Each import has a 'source' "
+        "(csv, xml, sas, spss, stata, rds, sql, opal, plugin, limesurvey), a 'destination' and the options "
+        "of the corresponding import command.",
+    ),
+    max_workers: int | None = typer.Option(
+        None,
+        "--max-workers",
+        "-mw",
+        help="Maximum number of concurrent imports (default is the manifest's 'max_workers' or 4).",
+    ),
+    checkpoint: str | None = typer.Option(
+        None,
+        "--checkpoint",
+        "-cp",
+        help="Checkpoint file, where the task ID and status of each part of the import are recorded.",
+    ),
+    resume: bool = typer.Option(
+        False,
+        "--resume",
+        "-re",
+        help="Resume an interrupted import from its checkpoint file: completed parts are skipped and in-flight tasks are waited for instead of being submitted again.",
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
+):
+    """Import data from several sources declared in a manifest file."""
+    args = _make_args_with_globals(
+        ctx,
+        opal=opal,
+        user=user,
+        password=password,
+        token=token,
+        ssl_cert=ssl_cert,
+        ssl_key=ssl_key,
+        verbose=verbose,
+        no_ssl_verify=no_ssl_verify,
+        manifest=manifest,
+        max_workers=max_workers,
+        checkpoint=checkpoint,
+        resume=resume,
+        json=json_output,
+    )
+    ImportBatchCommand.do_command(args)
+
+
 def import_ids_command(
     ctx: typer.Context,
     opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
@@ -1668,6 +2014,18 @@ def import_ids_command(
         False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
     ),
     type: str = typer.Option("Participant", "--type", "-ty", help="Entity type (e.g. Participant)"),
+    chunk_size: int = typer.Option(
+        10000, "--chunk-size", "-cs", help="Maximum number of identifiers per request (default is 10000)."
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent requests (default is 4)."
+    ),
+    skip_chunks: list[int] | None = typer.Option(
+        None,
+        "--skip-chunks",
+        help="Index of a chunk already sent, as reported by a failed import of the same input, to resume it "
+        "(can be repeated).",
+    ),
 ):
     """Import system identifiers."""
     args = _make_args_with_globals(
@@ -1681,6 +2039,9 @@ def import_ids_command(
         verbose=verbose,
         no_ssl_verify=no_ssl_verify,
         type=type,
+        chunk_size=chunk_size,
+        max_workers=max_workers,
+        skip_chunks=skip_chunks,
     )
     ImportIDService.do_command(args)
 
@@ -1708,6 +2069,18 @@ def import_ids_map_command(
     type: str = typer.Option("Participant", "--type", "-ty", help="Entity type (e.g. Participant)"),
     mapping: str = typer.Option(..., "--mapping", "-m", help="Mapping name"),
     separator: str | None = typer.Option(",", "--separator", "-s", help="Field separator in the mapping file"),
+    chunk_size: int = typer.Option(
+        10000, "--chunk-size", "-cs", help="Maximum number of identifiers per request (default is 10000)."
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of concurrent requests (default is 4)."
+    ),
+    skip_chunks: list[int] | None = typer.Option(
+        None,
+        "--skip-chunks",
+        help="Index of a chunk already sent, as reported by a failed import of the same input, to resume it "
+        "(can be repeated).",
+    ),
 ):
     """Import identifiers mappings."""
     args = _make_args_with_globals(
@@ -1723,6 +2096,9 @@ def import_ids_map_command(
         type=type,
         map=mapping,
         separator=separator,
+        chunk_size=chunk_size,
+        max_workers=max_workers,
+        skip_chunks=skip_chunks,
     )
     ImportIDMapService.do_command(args)
 
@@ -1808,6 +2184,27 @@ def export_csv_command(
     no_multilines: bool = typer.Option(
         False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
     ),
+    shards: int | None = typer.Option(
+        None,
+        "--shards",
+        "-sd",
+        help="Split the export in this number of jobs, running concurrently, each one covering a subset of the tables balanced by their number of value sets.",
+    ),
+    max_jobs: int | None = typer.Option(
+        None,
+        "--max-jobs",
+        "-mj",
+        help="Maximum number of export jobs running concurrently, when split (default is the number of jobs).",
+    ),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a folder of CSV files."""
@@ -1827,11 +2224,152 @@ def export_csv_command(
         identifiers=identifiers,
         id_name=id_name,
         no_multilines=no_multilines,
+        shards=shards,
+        max_jobs=max_jobs,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportCSVCommand.do_command(args)
 
 
+def export_local_command(
+    ctx: typer.Context,
+    opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
+    user: str | None = typer.Option(
+        None, "--user", "-u", help="Credentials auth: user name (password will be requested if not provided)"
+    ),
+    password: str | None = typer.Option(
+        None, "--password", "-p", help="Credentials auth: user password (requires a user name)"
+    ),
+    token: str | None = typer.Option(None, "--token", "-tk", help="Token auth: User access token"),
+    ssl_cert: str | None = typer.Option(
+        None, "--ssl-cert", "-sc", help="Two-way SSL auth: certificate/public key file (requires a private key)"
+    ),
+    ssl_key: str | None = typer.Option(
+        None, "--ssl-key", "-sk", help="Two-way SSL auth: private key file (requires a certificate)"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose output"),
+    no_ssl_verify: bool = typer.Option(
+        False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
+    ),
+    datasource: str = typer.Option(..., "--datasource", "-d", help="Project name"),
+    tables: list[str] = typer.Option(..., "--tables", "-t", help="The list of tables to be exported"),
+    output: str = typer.Option(..., "--output", "-out", help="Local output folder path"),
+    format: str = typer.Option(
+        "csv", "--format", "-f", help="Output file format: csv (default) or parquet (requires pyarrow)"
+    ),
+    identifiers: str | None = typer.Option(None, "--identifiers", "-id", help="Name of the ID mapping"),
+    id_name: str | None = typer.Option(None, "--id-name", "-in", help='Name of the ID column name. Default is "_id".'),
+    no_multilines: bool = typer.Option(
+        False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
+    ),
+    batch_size: int = typer.Option(
+        1000, "--batch-size", "-bs", help="Number of value sets per request (default is 1000)."
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of tables exported concurrently (default is 4)."
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
+):
+    """Export data to local CSV or Parquet files, streamed from the value sets."""
+    args = _make_args_with_globals(
+        ctx,
+        opal=opal,
+        user=user,
+        password=password,
+        token=token,
+        ssl_cert=ssl_cert,
+        ssl_key=ssl_key,
+        verbose=verbose,
+        no_ssl_verify=no_ssl_verify,
+        datasource=datasource,
+        tables=tables,
+        output=output,
+        format=format,
+        identifiers=identifiers,
+        id_name=id_name,
+        no_multilines=no_multilines,
+        batch_size=batch_size,
+        max_workers=max_workers,
+        json=json_output,
+    )
+    ExportLocalCommand.do_command(args)
+
+
+def export_sync_command(
+    ctx: typer.Context,
+    opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
+    user: str | None = typer.Option(
+        None, "--user", "-u", help="Credentials auth: user name (password will be requested if not provided)"
+    ),
+    password: str | None = typer.Option(
+        None, "--password", "-p", help="Credentials auth: user password (requires a user name)"
+    ),
+    token: str | None = typer.Option(None, "--token", "-tk", help="Token auth: User access token"),
+    ssl_cert: str | None = typer.Option(
+        None, "--ssl-cert", "-sc", help="Two-way SSL auth: certificate/public key file (requires a private key)"
+    ),
+    ssl_key: str | None = typer.Option(
+        None, "--ssl-key", "-sk", help="Two-way SSL auth: private key file (requires a certificate)"
+    ),
+    verbose: bool = typer.Option(False, "--verbose", "-v", help="Verbose output"),
+    no_ssl_verify: bool = typer.Option(
+        False, "--no-ssl-verify", "-nv", help="Do not verify SSL certificates for HTTPS."
+    ),
+    datasource: str = typer.Option(..., "--datasource", "-d", help="Project name"),
+    tables: list[str] | None = typer.Option(
+        None, "--tables", "-t", help="The list of tables to be exported (default is all)"
+    ),
+    output: str = typer.Option(
+        ...,
+        "--output",
+        "-out",
+        help="Output directory name (in Opal file system), '{timestamp}' is replaced by the time of the run",
+    ),
+    format: str = typer.Option(
+        "csv", "--format", "-f", help="Export format: csv (default), xml, rds, sas, xpt, spss, zspss or stata"
+    ),
+    state: str = typer.Option(..., "--state", "-s", help="Local state file of the previous exports"),
+    id_name: str | None = typer.Option(None, "--id-name", "-in", help="Name of the ID column name"),
+    identifiers: str | None = typer.Option(None, "--identifiers", "-id", help="Name of the ID mapping"),
+    no_multilines: bool = typer.Option(
+        False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of export jobs running concurrently (default is 4)."
+    ),
+    dry_run: bool = typer.Option(
+        False, "--dry-run", "-dr", help="Report the tables that have changed, without exporting them."
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
+):
+    """Export the tables that have changed since the last export."""
+    args = _make_args_with_globals(
+        ctx,
+        opal=opal,
+        user=user,
+        password=password,
+        token=token,
+        ssl_cert=ssl_cert,
+        ssl_key=ssl_key,
+        verbose=verbose,
+        no_ssl_verify=no_ssl_verify,
+        datasource=datasource,
+        tables=tables,
+        output=output,
+        format=format,
+        state=state,
+        id_name=id_name,
+        identifiers=identifiers,
+        no_multilines=no_multilines,
+        max_workers=max_workers,
+        dry_run=dry_run,
+        json=json_output,
+    )
+    ExportSyncCommand.do_command(args)
+
+
 def export_xml_command(
     ctx: typer.Context,
     opal: str = typer.Option("http://localhost:8080", "--opal", "-o", help="Opal server base url"),
@@ -1856,6 +2394,15 @@ def export_xml_command(
     tables: list[str] = typer.Option(..., "--tables", "-t", help="The list of tables to be exported"),
     output: str = typer.Option(..., "--output", "-out", help="Output ZIP file path in Opal file system"),
     identifiers: str | None = typer.Option(None, "--identifiers", "-id", help="Name of the ID mapping"),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a zip of Opal XML files."""
@@ -1873,6 +2420,8 @@ def export_xml_command(
         tables=tables,
         output=output,
         identifiers=identifiers,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportXMLCommand.do_command(args)
@@ -1906,6 +2455,15 @@ def export_r_sas_command(
     no_multilines: bool = typer.Option(
         False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
     ),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a SAS or SAS Transport file (using R)."""
@@ -1925,6 +2483,8 @@ def export_r_sas_command(
         identifiers=identifiers,
         id_name=id_name,
         no_multilines=no_multilines,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportRSASCommand.do_command(args)
@@ -1958,6 +2518,15 @@ def export_r_stata_command(
     no_multilines: bool = typer.Option(
         False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
     ),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a Stata file (using R)."""
@@ -1977,6 +2546,8 @@ def export_r_stata_command(
         identifiers=identifiers,
         id_name=id_name,
         no_multilines=no_multilines,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportRSTATACommand.do_command(args)
@@ -2010,6 +2581,15 @@ def export_r_spss_command(
     no_multilines: bool = typer.Option(
         False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
     ),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a SPSS or compressed SPSS file (using R)."""
@@ -2029,6 +2609,8 @@ def export_r_spss_command(
         identifiers=identifiers,
         id_name=id_name,
         no_multilines=no_multilines,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportRSPSSCommand.do_command(args)
@@ -2062,6 +2644,15 @@ def export_r_rds_command(
     no_multilines: bool = typer.Option(
         False, "--no-multilines", "-nl", help="Do not write value sequences as multiple lines"
     ),
+    fetch_to: str | None = typer.Option(
+        None,
+        "--fetch-to",
+        "-ft",
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    ),
+    max_workers: int = typer.Option(
+        4, "--max-workers", "-mw", help="Maximum number of files downloaded concurrently, when fetching (default is 4)."
+    ),
     json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export data to a RDS file (single serialized R object, using R)."""
@@ -2081,6 +2672,8 @@ def export_r_rds_command(
         identifiers=identifiers,
         id_name=id_name,
         no_multilines=no_multilines,
+        fetch_to=fetch_to,
+        max_workers=max_workers,
         json=json_output,
     )
     ExportRDSCommand.do_command(args)
@@ -2161,6 +2754,19 @@ def export_vcf_command(
     no_case_controls: bool = typer.Option(
         False, "--no-case-controls", "-nocc", help="Do not include case-control data"
     ),
+    shard: bool = typer.Option(
+        False,
+        "--shard",
+        "-sh",
+        help="One task per VCF/BCF file, tasks are run concurrently and the failed ones are retried. The progress is reported until all the tasks are completed.",
+    ),
+    max_workers: int = typer.Option(
+        2, "--max-workers", "-mw", help="Maximum number of tasks running concurrently, when sharded (default is 2)."
+    ),
+    retries: int = typer.Option(
+        1, "--retries", "-rs", help="Number of retries of a failed task, when sharded (default is 1)."
+    ),
+    json_output: bool = typer.Option(False, "--json", "-j", help="Pretty JSON formatting of the response"),
 ):
     """Export genotypes data to VCF/BCF files."""
     args = _make_args_with_globals(
@@ -2178,6 +2784,10 @@ def export_vcf_command(
         destination=destination,
         filter_table=filter_table,
         no_case_controls=no_case_controls,
+        shard=shard,
+        max_workers=max_workers,
+        retries=retries,
+        json=json_output,
     )
     ExportVCFCommand.do_command(args)
 
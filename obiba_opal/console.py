@@ -45,6 +45,7 @@ app.command(name="dict", help="Query for data dictionary.")(handle_exceptions(cm
 app.command(name="data", help="Query for data.")(handle_exceptions(cmd.data_command))
 app.command(name="entity", help="Query for entities (Participant, etc.).")(handle_exceptions(cmd.entity_command))
 app.command(name="file", help="Manage Opal file system.")(handle_exceptions(cmd.file_command))
+app.command(name="file-download", help="Download files in parallel.")(handle_exceptions(cmd.file_download_command))
 
 # Backup/Restore commands
 app.command(
@@ -104,6 +105,9 @@ app.command(name="import-sql", help="Import data from a SQL database.")(handle_e
 app.command(name="import-vcf", help="Import genotypes data from some VCF/BCF files.")(
     handle_exceptions(cmd.import_vcf_command)
 )
+app.command(name="import-batch", help="Import data from several sources declared in a manifest file.")(
+    handle_exceptions(cmd.import_batch_command)
+)
 app.command(name="import-ids", help="Import system identifiers.")(handle_exceptions(cmd.import_ids_command))
 app.command(name="import-ids-map", help="Import identifiers mappings.")(handle_exceptions(cmd.import_ids_map_command))
 
@@ -112,6 +116,12 @@ app.command(name="export-xml", help="Export data to a zip of Opal XML files.")(
     handle_exceptions(cmd.export_xml_command)
 )
 app.command(name="export-csv", help="Export data to a folder of CSV files.")(handle_exceptions(cmd.export_csv_command))
+app.command(name="export-local", help="Export data to local CSV or Parquet files, streamed from the value sets.")(
+    handle_exceptions(cmd.export_local_command)
+)
+app.command(name="export-sync", help="Export the tables that have changed since the last export.")(
+    handle_exceptions(cmd.export_sync_command)
+)
 app.command(
     name="export-r-sas",
     help="Export data to a SAS or SAS Transport file (using R).",
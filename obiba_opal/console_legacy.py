@@ -24,10 +24,12 @@ from obiba_opal.dictionary import (
 )
 from obiba_opal.data import DataService, EntityService
 from obiba_opal.analysis import AnalysisCommand, ExportAnalysisService
-from obiba_opal.file import FileService
+from obiba_opal.file import FileService, FileDownloadCommand
 from obiba_opal.exports import (
     ExportPluginCommand,
     ExportCSVCommand,
+    ExportLocalCommand,
+    ExportSyncCommand,
     ExportXMLCommand,
     ExportRSASCommand,
     ExportRSPSSCommand,
@@ -49,6 +51,7 @@ from obiba_opal.perm import (
     SystemPermService,
 )
 from obiba_opal.imports import (
+    ImportBatchCommand,
     ImportPluginCommand,
     ImportCSVCommand,
     ImportIDMapService,
@@ -182,6 +185,13 @@ def run():
         FileService.add_arguments,
         FileService.do_command,
     )
+    add_subcommand(
+        subparsers,
+        "file-download",
+        "Download files in parallel.",
+        FileDownloadCommand.add_arguments,
+        FileDownloadCommand.do_command,
+    )
     add_subcommand(
         subparsers,
         "taxonomy",
@@ -294,6 +304,13 @@ def run():
         ImportVCFCommand.add_arguments,
         ImportVCFCommand.do_command,
     )
+    add_subcommand(
+        subparsers,
+        "import-batch",
+        "Import data from several sources declared in a manifest file.",
+        ImportBatchCommand.add_arguments,
+        ImportBatchCommand.do_command,
+    )
     add_subcommand(
         subparsers,
         "import-ids",
@@ -329,6 +346,20 @@ def run():
         ExportCSVCommand.add_arguments,
         ExportCSVCommand.do_command,
     )
+    add_subcommand(
+        subparsers,
+        "export-local",
+        "Export data to local CSV or Parquet files, streamed from the value sets.",
+        ExportLocalCommand.add_arguments,
+        ExportLocalCommand.do_command,
+    )
+    add_subcommand(
+        subparsers,
+        "export-sync",
+        "Export the tables that have changed since the last export.",
+        ExportSyncCommand.add_arguments,
+        ExportSyncCommand.do_command,
+    )
     add_subcommand(
         subparsers,
         "export-r-sas",
@@ -6,7 +6,13 @@ import base64
 import getpass
 import json
 import os
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import Future
 from requests import Session, Request, Response
+from requests.exceptions import ChunkedEncodingError, ConnectionError, Timeout
 import urllib.parse
 import urllib3
 from functools import reduce
@@ -19,7 +25,11 @@ class OpalClient:
     OpalClient holds the configuration for connecting to Opal.
     """
 
-    def __init__(self, server=None):
+    def __init__(self, server=None, coalesce: bool = False):
+        """
+        :param server - Opal server address
+        :param coalesce - share the response of identical concurrent GET requests, see enable_coalescing()
+        """
         self.session = Session()
         self.headers = {}
         self.base_url = self.__ensure_entry("Opal address", server)
@@ -27,6 +37,7 @@ class OpalClient:
         self.rid = None
         self.profile = None
         self.version = None
+        self.coalescer = RequestCoalescer() if coalesce else None
 
     def __del__(self):
         self.close()
@@ -235,6 +246,29 @@ class OpalClient:
     def new_request(self):
         return OpalRequest(self)
 
+    def enable_coalescing(self, enabled: bool = True):
+        """
+        Enable or disable the coalescing of identical concurrent GET requests: while a GET request is in-flight,
+        an identical one waits for it and shares its response. Useful when many workers read the same resources.
+
+        :param enabled - whether the GET requests are coalesced
+        """
+        if not enabled:
+            self.coalescer = None
+        elif self.coalescer is None:
+            self.coalescer = RequestCoalescer()
+
+    def metrics(self) -> dict:
+        """
+        Get the client's request metrics, such as the GET coalescing hit ratio.
+
+        :return: The metrics as a dictionary
+        """
+        metrics = {}
+        if self.coalescer is not None:
+            metrics["coalescing"] = self.coalescer.metrics()
+        return metrics
+
     def close(self):
         if self.id is not None:
             # request to close session
@@ -308,6 +342,8 @@ class OpalRequest:
         self.data = None
         self._method = "GET"
         self._resource = None
+        self._stream = False
+        self._chunk_size = 1024 * 1024
 
     def timeout(self, value):
         """
@@ -332,6 +368,19 @@ class OpalRequest:
         self._fail_on_error = True
         return self
 
+    def stream(self, chunk_size: int = 1024 * 1024):
+        """
+        Enables the streaming of the response body: when sent with a file object, the
+        response body is written chunk by chunk instead of being fully loaded in memory.
+        When sent without a file object, the response must be closed once read, e.g. with
+        "with request.stream().send() as response:".
+
+        :param chunk_size - size in bytes of the chunks
+        """
+        self._stream = True
+        self._chunk_size = chunk_size
+        return self
+
     def header(self, key, value):
         """
         Adds a header to session headers used by the request
@@ -427,6 +476,34 @@ class OpalRequest:
         self._upload_file = filename
         return self
 
+    def content_upload_stream(self, filename: str, chunks):
+        """
+        Sets the content of the file to upload, generated chunk by chunk: the multi-part body is sent with a
+        chunked transfer encoding, without the file content being held in memory.
+
+        :param filename - the name of the uploaded file
+        :param chunks - an iterable of bytes
+        """
+        if self._verbose:
+            print("* File Content:")
+            print("[file=" + filename + ", size=streamed]")
+        boundary = uuid.uuid4().hex
+
+        def body():
+            yield (
+                f"--{boundary}\r\n"
+                f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+                "Content-Type: application/octet-stream\r\n\r\n"
+            ).encode()
+            for chunk in chunks:
+                if chunk:
+                    yield chunk
+            yield f"\r\n--{boundary}--\r\n".encode()
+
+        self.content_type(f"multipart/form-data; boundary={boundary}")
+        self.data = body()
+        return self
+
     def __build_request(self):
         request = Request()
         request.method = self._method if self._method else "GET"
@@ -469,27 +546,182 @@ class OpalRequest:
                         file_handle,
                     )
                 }
-                request = self.__build_request()
-                response = OpalResponse(self.client.session.send(request.prepare()))
+                return self.__send(fp)
+        else:
+            return self.__send(fp)
+
+    def __send(self, fp=None):
+        request = self.__build_request()
+        prepared = request.prepare()
+        coalescer = getattr(self.client, "coalescer", None)
+        if coalescer is not None and prepared.method != "GET":
+            # a GET that is already in-flight may not see the effect of this request, it cannot be shared anymore
+            coalescer.invalidate(prepared.url)
+        if self._stream:
+            response = OpalResponse(self.client.session.send(prepared, stream=True))
+        elif coalescer is not None and prepared.method == "GET" and prepared.body is None:
+            # identical concurrent GETs (same url, headers and so identity) share one network call
+            key = RequestCoalescer.make_key(prepared)
+            response = OpalResponse(coalescer.send(key, lambda: self.client.session.send(prepared)))
+        else:
+            response = OpalResponse(self.client.session.send(prepared))
+
+        if self._fail_on_error and response.code >= 400:
+            error = HTTPError(response)
+            if self._stream:
+                # the error body was read, the connection is released
+                response.close()
+            raise error
+
+        if fp is not None:
+            if self._stream:
+                # write the response body chunk by chunk, memory usage is bounded by the chunk size
+                try:
+                    for chunk in response.response.iter_content(chunk_size=self._chunk_size):
+                        fp.write(chunk)
+                finally:
+                    response.response.close()
+            else:
+                fp.write(response.content)
 
-                if self._fail_on_error and response.code >= 400:
-                    raise HTTPError(response)
+        return response
 
-                if fp is not None:
-                    fp.write(response.content)
 
-                return response
-        else:
-            request = self.__build_request()
-            response = OpalResponse(self.client.session.send(request.prepare()))
+class RequestCoalescer:
+    """
+    Coalesce identical concurrent GET requests: while a request is in-flight, any identical
+    request waits for it and shares its response instead of being sent again.
+    """
 
-            if self._fail_on_error and response.code >= 400:
-                raise HTTPError(response)
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight = {}
+        self._requests = 0
+        self._coalesced = 0
 
-            if fp is not None:
-                fp.write(response.content)
+    @classmethod
+    def make_key(cls, prepared) -> tuple:
+        """
+        Make the key identifying a prepared request: method, url and headers (which include
+        the authorization ones, i.e. the identity).
+        """
+        headers = tuple(sorted((k.lower(), str(v)) for k, v in prepared.headers.items()))
+        return (prepared.method, prepared.url, headers)
+
+    def send(self, key: tuple, func):
+        """
+        Call func unless an identical call is in-flight, in which case its result is shared.
+
+        :param key: The request key, see make_key()
+        :param func: The function sending the request
+        :return: The response
+        """
+        with self._lock:
+            self._requests += 1
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self._inflight[key] = future
+            else:
+                self._coalesced += 1
+        if leader:
+            try:
+                future.set_result(func())
+            except BaseException as e:
+                future.set_exception(e)
+            finally:
+                with self._lock:
+                    # the entry may have been invalidated, and replaced by a newer request
+                    if self._inflight.get(key) is future:
+                        del self._inflight[key]
+        return future.result()
+
+    def invalidate(self, url: str):
+        """
+        Stop sharing the in-flight requests that are related to a modified resource: same resource, one of its
+        sub-resources or one of its parents. Their current waiters still get their response, but the
+        subsequent identical requests are sent again.
+
+        :param url: The url of the modified resource
+        """
+        path = urllib.parse.urlsplit(url).path.rstrip("/")
+        with self._lock:
+            for key in list(self._inflight):
+                other = urllib.parse.urlsplit(key[1]).path.rstrip("/")
+                if other == path or other.startswith(f"{path}/") or path.startswith(f"{other}/"):
+                    del self._inflight[key]
+
+    def metrics(self) -> dict:
+        with self._lock:
+            requests = self._requests
+            coalesced = self._coalesced
+        return {
+            "requests": requests,
+            "coalesced": coalesced,
+            "sent": requests - coalesced,
+            "hitRatio": coalesced / requests if requests > 0 else 0.0,
+        }
+
+
+class AdaptiveBackoff:
+    """
+    Retry operations with a delay shared by concurrent workers: each retriable failure (connection
+    error, timeout, server overload or error) doubles the delay applied before the next calls, and each
+    success halves it, so that the load adapts to what the server can sustain.
+    """
+
+    def __init__(self, retries: int = 3, initial_delay: float = 0.5, max_delay: float = 30.0):
+        self.retries = retries
+        self.initial_delay = initial_delay
+        self.max_delay = max_delay
+        self._delay = 0.0
+        self._lock = threading.Lock()
 
-            return response
+    def call(self, func, *args, **kwargs):
+        """
+        Call func with the provided arguments, retrying on retriable failures.
+
+        :param func: The function to call
+        :return: The function result
+        :raises Exception: The last failure if all the attempts failed or if it is not retriable
+        """
+        attempt = 0
+        while True:
+            self._wait()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                if attempt >= self.retries or not self.is_retriable(e):
+                    raise
+                attempt += 1
+                self._on_failure()
+            else:
+                self._on_success()
+                return result
+
+    def is_retriable(self, error: Exception) -> bool:
+        if isinstance(error, HTTPError):
+            return error.code == 429 or error.is_server_error()
+        return isinstance(error, (ConnectionError, ChunkedEncodingError, Timeout))
+
+    @property
+    def delay(self) -> float:
+        return self._delay
+
+    def _wait(self):
+        delay = self._delay
+        if delay > 0:
+            # add some jitter so that the workers do not retry all at once
+            time.sleep(delay * random.uniform(0.5, 1.0))
+
+    def _on_failure(self):
+        with self._lock:
+            self._delay = min(self.max_delay, max(self.initial_delay, self._delay * 2))
+
+    def _on_success(self):
+        with self._lock:
+            self._delay = self._delay / 2 if self._delay >= self.initial_delay else 0.0
 
 
 class OpalResponse:
@@ -502,6 +734,19 @@ class OpalResponse:
             response = Response()
         self.response = response
 
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """
+        Release the connection of a streamed response, when its body is not fully read.
+        """
+        if self.response.raw is not None:
+            self.response.close()
+
     @property
     def code(self):
         return self.response.status_code
@@ -4,10 +4,19 @@ Opal data dictionary and annotations.
 
 import obiba_opal.core as core
 import argparse
+import copy
 import csv
+import hashlib
+import json
+import os
+import shutil
 import sys
 import pprint
+import tempfile
+import threading
 import urllib.parse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 
 class DictionaryService:
@@ -18,6 +27,8 @@ class DictionaryService:
     def __init__(self, client: core.OpalClient, verbose: bool = False):
         self.client = client
         self.verbose = verbose
+        # whether tables can be deleted by batches, detected at first use
+        self._bulk_delete = None
 
     @classmethod
     def add_arguments(cls, parser):
@@ -26,6 +37,7 @@ class DictionaryService:
         """
         parser.add_argument(
             "name",
+            nargs="?",
             help="Fully qualified name of a datasource/project or a table or "
             "a variable, for instance: opal-data or opal-data.questionnaire "
             "or opal-data.questionnaire:Q1. Wild cards can also be used, "
@@ -41,7 +53,37 @@ class DictionaryService:
             "--excel",
             "-xls",
             required=False,
-            help="Full path of the target data dictionary Excel file.",
+            help="Full path of the target data dictionary Excel file. When the name is a project or "
+            "all the tables of a project (<project> or <project>.*), full path of the target folder, or of the "
+            "target zip file if it ends with '.zip', of the Excel data dictionaries of the tables.",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of concurrent requests (default is 4).",
+        )
+        parser.add_argument(
+            "--diff",
+            "-df",
+            nargs=2,
+            metavar=("SRC", "DST"),
+            required=False,
+            help="Compare the data dictionaries of two projects or two tables, for instance: "
+            "opal-data opal-data-prod or opal-data.questionnaire opal-data-prod.questionnaire.",
+        )
+        parser.add_argument(
+            "--diff-opal",
+            "-do",
+            required=False,
+            help="Opal server base url of the DST data dictionary, using the same credentials "
+            "(default is the same Opal server).",
+        )
+        parser.add_argument(
+            "--csv",
+            action="store_true",
+            help="CSV formatting of the data dictionaries comparison report (default is JSON).",
         )
 
     @classmethod
@@ -51,19 +93,40 @@ class DictionaryService:
         """
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
+        diff_client = None
         try:
             service = DictionaryService(client, args.verbose)
 
-            if args.excel:
-                res = service._get_dictionary_as_excel(args.name)
-                with open(args.excel, mode="wb") as excelFile:
-                    excelFile.write(res)
+            if getattr(args, "diff", None):
+                if getattr(args, "diff_opal", None):
+                    diff_args = argparse.Namespace(**vars(args))
+                    diff_args.opal = args.diff_opal
+                    diff_client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(diff_args))
+                res = service.diff(args.diff[0], args.diff[1], diff_client, args.max_workers)
+                if args.csv:
+                    service.write_diff_csv(res, sys.stdout)
+                else:
+                    core.Formatter.print_json(res, args.json)
+            elif not args.name:
+                raise ValueError("A dictionary item name is required.")
+            elif args.excel:
+                resolver = core.MagmaNameResolver(args.name)
+                if resolver.is_datasource() or resolver.is_tables():
+                    res = service.download_excel_dictionaries(
+                        resolver.datasource, output=args.excel, max_workers=args.max_workers
+                    )
+                    core.Formatter.print_json(res, args.json)
+                else:
+                    with open(args.excel, mode="wb") as excelFile:
+                        service._download_dictionary_as_excel(args.name, excelFile)
             else:
                 res = service._get_dictionary(args.name)
 
                 # format response
                 core.Formatter.print_json(res, args.json)
         finally:
+            if diff_client:
+                diff_client.close()
             client.close()
 
     def get_datasources(self) -> list:
@@ -116,27 +179,346 @@ class DictionaryService:
         """
         return self._get_dictionary(f"{project}.{table}:{variable}")
 
-    def delete_tables(self, project: str, tables: list = None):
+    def create_table(self, project: str, table: str, entityType: str = "Participant", variables: list = None):
+        """
+        Create a table in a datasource, with its variables.
+
+        :param project: The project name associated to the datasource
+        :param table: The table name
+        :param entityType: The entity type of the table
+        :param variables: The list of variables of the table
+        """
+        request = self.client.new_request()
+        request.fail_on_error().accept_json().content_type_json()
+
+        if self.verbose:
+            request.verbose()
+
+        tbl = {"name": table, "entityType": entityType, "variables": variables if variables else []}
+        uri = core.UriBuilder(["datasource", project, "tables"]).build()
+        request.post().resource(uri).content(json.dumps(tbl)).send()
+
+    def delete_tables(
+        self,
+        project: str,
+        tables: list = None,
+        max_workers: int = 4,
+        batch_size: int = 100,
+        retries: int = 3,
+        raise_on_error: bool = True,
+    ) -> dict:
         """
-        Delete provided or all tables.
+        Delete provided or all tables. Tables are deleted concurrently, with a retry and an adaptive backoff
+        on server errors. When supported by the Opal server, tables are deleted by batches in a single request:
+        the first batch is tried with the bulk deletion, and the tables are deleted one by one if the server
+        does not support it. A failure does not stop the deletion of the other tables.
 
-        :param client: Opal connection object
         :param project: The project name
         :param tables: List of table names to be deleted (default is all)
-        :param verbose: Verbose requests
+        :param max_workers: The maximum number of concurrent requests
+        :param batch_size: The maximum number of tables per request, when bulk deletion is supported
+        :param retries: The number of retries of a failed deletion
+        :param raise_on_error: Raise the first failure, once all the deletions were attempted
+        :return: The summary of the deleted and failed tables
         """
         tables_ = tables
         if not tables:
             tables_ = self.get_tables(project)
             tables_ = [x["name"] for x in tables_]
 
-        for table in tables_:
-            request = self.client.new_request()
-            if self.verbose:
-                request.verbose()
-            request.fail_on_error().delete().resource(
-                core.UriBuilder(["datasource", project, "table", table]).build()
-            ).send()
+        backoff = core.AdaptiveBackoff(retries=retries)
+        summary = {"deleted": [], "failed": []}
+        errors = []
+
+        def record(batch: list, error: Exception = None):
+            if error is None:
+                summary["deleted"].extend(batch)
+            else:
+                errors.append(error)
+                message = error.error if isinstance(error, core.HTTPError) else str(error)
+                summary["failed"].extend([{"table": table, "error": message} for table in batch])
+
+        batches = [tables_[i : i + batch_size] for i in range(0, len(tables_), batch_size)]
+        if self._bulk_delete is not False and batches:
+            try:
+                backoff.call(self._delete_tables_batch, project, batches[0])
+                self._bulk_delete = True
+                record(batches[0])
+                batches = batches[1:]
+            except core.HTTPError as e:
+                if e.code in [404, 405] and self._bulk_delete is None:
+                    # no bulk deletion endpoint
+                    self._bulk_delete = False
+                else:
+                    record(batches[0], e)
+                    batches = batches[1:]
+        if not self._bulk_delete:
+            batches = [[table] for batch in batches for table in batch]
+        delete_func = self._delete_tables_batch if self._bulk_delete else self._delete_table
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {executor.submit(backoff.call, delete_func, project, batch): batch for batch in batches}
+            for future in as_completed(futures):
+                try:
+                    future.result()
+                    record(futures[future])
+                except Exception as e:
+                    record(futures[future], e)
+        if raise_on_error and errors:
+            raise errors[0]
+        summary["deleted"] = sorted(summary["deleted"])
+        summary["failed"] = sorted(summary["failed"], key=lambda x: x["table"])
+        return summary
+
+    def _delete_table(self, project: str, tables: list):
+        request = self.client.new_request()
+        if self.verbose:
+            request.verbose()
+        request.fail_on_error().delete().resource(
+            core.UriBuilder(["datasource", project, "table", tables[0]]).build()
+        ).send()
+
+    def _delete_tables_batch(self, project: str, tables: list):
+        request = self.client.new_request()
+        if self.verbose:
+            request.verbose()
+        # the table query parameter is repeated, which is not supported by the UriBuilder
+        query = urllib.parse.urlencode([("table", table) for table in tables])
+        request.fail_on_error().delete().resource(
+            f"{core.UriBuilder(['datasource', project, 'tables']).build()}?{query}"
+        ).send()
+
+    def diff(
+        self,
+        source: str,
+        destination: str,
+        destination_client: core.OpalClient = None,
+        max_workers: int = 4,
+    ) -> dict:
+        """
+        Compare the data dictionaries of two projects or two tables, possibly from different Opal servers.
+        Both dictionaries are fetched concurrently and compared locally: variables are compared by content
+        hash and only the changed ones are compared field by field.
+
+        :param source: The source project name or table fully qualified name (<project>.<table>)
+        :param destination: The destination project name or table fully qualified name
+        :param destination_client: The Opal connection object of the destination (default is the source one)
+        :param max_workers: The maximum number of concurrent requests per dictionary
+        :return: The change report, with the added/removed tables and the variable changes
+        """
+        source_resolver = core.MagmaNameResolver(source)
+        destination_resolver = core.MagmaNameResolver(destination)
+        if source_resolver.is_datasources() or destination_resolver.is_datasources():
+            raise ValueError("Wildcard not allowed for datasources/projects")
+        if source_resolver.is_datasource() != destination_resolver.is_datasource():
+            raise ValueError("Compare a project with a project, or a table with a table")
+        if source_resolver.variable or destination_resolver.variable:
+            raise ValueError("Data dictionaries can only be compared at the project or table level")
+
+        destination_service = (
+            DictionaryService(destination_client, self.verbose) if destination_client is not None else self
+        )
+        with ThreadPoolExecutor(max_workers=2) as executor:
+            source_future = executor.submit(self._get_variables_by_table, source_resolver, max_workers)
+            destination_future = executor.submit(
+                destination_service._get_variables_by_table, destination_resolver, max_workers
+            )
+            source_tables = source_future.result()
+            destination_tables = destination_future.result()
+
+        if not source_resolver.is_datasource():
+            # compare the two tables whatever their names
+            source_tables = {source_resolver.table: source_tables[source_resolver.table]}
+            destination_tables = {source_resolver.table: destination_tables[destination_resolver.table]}
+
+        report = {
+            "source": source,
+            "destination": destination,
+            "tables": {
+                "added": sorted(set(source_tables) - set(destination_tables)),
+                "removed": sorted(set(destination_tables) - set(source_tables)),
+                "modified": [],
+                "unchanged": [],
+            },
+            "changes": [],
+        }
+        for table in sorted(set(source_tables) & set(destination_tables)):
+            changes = self._diff_variables(table, source_tables[table], destination_tables[table])
+            report["tables"]["modified" if changes else "unchanged"].append(table)
+            report["changes"].extend(changes)
+        return report
+
+    def write_diff_csv(self, report: dict, output):
+        """
+        Write a data dictionaries comparison report in CSV format.
+
+        :param report: The report, see diff()
+        :param output: The output stream
+        """
+        writer = csv.writer(output)
+        writer.writerow(["table", "variable", "change", "fields"])
+        for table in report["tables"]["added"]:
+            writer.writerow([table, "", "added", ""])
+        for table in report["tables"]["removed"]:
+            writer.writerow([table, "", "removed", ""])
+        for change in report["changes"]:
+            writer.writerow([change["table"], change["variable"], change["change"], ";".join(change["fields"])])
+
+    def apply(
+        self,
+        project: str,
+        table: str,
+        source,
+        batch_size: int = 100,
+        max_workers: int = 4,
+        dry_run: bool = False,
+    ) -> dict:
+        """
+        Create or update the variables of a table from a local data dictionary. The local dictionary is
+        compared with the table's one and only the new or modified variables are sent, by batches of
+        variables sent concurrently. Table's variables that are not in the local dictionary are left
+        untouched, as are the attributes of a variable that are not in the local dictionary.
+
+        :param project: The project name associated to the datasource
+        :param table: The table name
+        :param source: The data dictionary file path (CSV, Excel or JSON), or the list of variables
+        :param batch_size: The maximum number of variables per request
+        :param max_workers: The maximum number of concurrent requests
+        :param dry_run: Report the changes without applying them
+        :return: The report of the added, modified, unchanged and missing variable names
+        """
+        variables = source if isinstance(source, list) else DictionaryReader(source).read()
+        current = {v["name"]: v for v in self.get_variables(project, table)}
+        entity_type = None
+
+        report = {"added": [], "modified": [], "unchanged": [], "missing": []}
+        updates = []
+        for variable in variables:
+            name = variable["name"]
+            if name in current:
+                if "attributes" in variable:
+                    attributes = self._merge_attributes(current[name].get("attributes"), variable["attributes"])
+                    variable = {**variable, "attributes": attributes}
+                fields = self._diff_variable_fields(variable, current[name])
+                if fields:
+                    report["modified"].append(name)
+                    updates.append({**self._normalize_variable(current[name]), **variable})
+                else:
+                    report["unchanged"].append(name)
+            else:
+                if "entityType" not in variable and entity_type is None:
+                    entity_type = self.get_table(project, table)["entityType"]
+                report["added"].append(name)
+                updates.append({"entityType": entity_type, "valueType": "text", "isRepeatable": False, **variable})
+        names = {v["name"] for v in variables}
+        report["missing"] = [name for name in current if name not in names]
+
+        batches = [updates[i : i + batch_size] for i in range(0, len(updates), batch_size)]
+        report["batches"] = len(batches)
+        if not dry_run and batches:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # consume the results to raise the first error, if any
+                list(executor.map(lambda batch: self._post_variables(project, table, batch), batches))
+        return report
+
+    def _post_variables(self, project: str, table: str, variables: list):
+        request = self.client.new_request()
+        request.fail_on_error().accept_json().content_type_json()
+
+        if self.verbose:
+            request.verbose()
+
+        uri = core.UriBuilder(["datasource", project, "table", table, "variables"]).build()
+        request.post().resource(uri).content(json.dumps(variables)).send()
+
+    def _merge_attributes(self, current: list, local: list) -> list:
+        """
+        Merge the local attributes of a variable into the current ones: an attribute is identified by its
+        namespace, name and locale, the local value replaces the current one.
+        """
+
+        def key(attribute):
+            return attribute.get("namespace") or "", attribute["name"], attribute.get("locale") or ""
+
+        merged = {key(a): a for a in current or []}
+        merged.update({key(a): a for a in local or []})
+        return list(merged.values())
+
+    def _diff_variable_fields(self, variable: dict, current: dict) -> list:
+        """
+        Get the fields of the variable that differ from the current one, ignoring the fields that
+        are not specified.
+        """
+        return [
+            key
+            for key, value in variable.items()
+            if self._comparable_value(key, value) != self._comparable_value(key, current.get(key))
+        ]
+
+    def _comparable_value(self, key: str, value):
+        """
+        Make a variable field value comparable: the order of the attributes, including the categories' ones,
+        is not significant.
+        """
+
+        def attributes_key(attributes):
+            return sorted(
+                [a.get("namespace", ""), a["name"], a.get("locale", ""), a.get("value", "")] for a in attributes or []
+            )
+
+        if key == "attributes":
+            return attributes_key(value)
+        if key == "categories":
+            return [[c["name"], c.get("isMissing", False), attributes_key(c.get("attributes"))] for c in value or []]
+        return value
+
+    def _get_variables_by_table(self, resolver: core.MagmaNameResolver, max_workers: int = 4) -> dict:
+        """
+        Get the variables of a project's tables or of a single table, by table name and by variable name.
+        """
+        if resolver.is_datasource():
+            tables = [x["name"] for x in self.get_tables(resolver.datasource)]
+        else:
+            tables = [resolver.table]
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            variables = executor.map(lambda t: self.get_variables(resolver.datasource, t), tables)
+            return {table: {v["name"]: v for v in vars_} for table, vars_ in zip(tables, variables, strict=True)}
+
+    def _diff_variables(self, table: str, source: dict, destination: dict) -> list:
+        changes = []
+        for name in sorted(set(source) - set(destination)):
+            changes.append({"table": table, "variable": name, "change": "added", "fields": []})
+        for name in sorted(set(destination) - set(source)):
+            changes.append({"table": table, "variable": name, "change": "removed", "fields": []})
+        for name in sorted(set(source) & set(destination)):
+            source_variable = self._comparable_variable(source[name])
+            destination_variable = self._comparable_variable(destination[name])
+            if self._hash_variable(source_variable) != self._hash_variable(destination_variable):
+                fields = sorted(
+                    key
+                    for key in set(source_variable) | set(destination_variable)
+                    if source_variable.get(key) != destination_variable.get(key)
+                )
+                changes.append({"table": table, "variable": name, "change": "modified", "fields": fields})
+        return changes
+
+    def _normalize_variable(self, variable: dict) -> dict:
+        """
+        Remove the variable properties that depend on its location.
+        """
+        normalized = copy.copy(variable)
+        for key in ["link", "parentLink"]:
+            normalized.pop(key, None)
+        return normalized
+
+    def _comparable_variable(self, variable: dict) -> dict:
+        """
+        Normalize a variable and make its fields comparable, see _comparable_value().
+        """
+        return {key: self._comparable_value(key, value) for key, value in self._normalize_variable(variable).items()}
+
+    def _hash_variable(self, variable: dict) -> str:
+        return hashlib.sha256(json.dumps(variable, sort_keys=True).encode("utf-8")).hexdigest()
 
     def _get_dictionary(self, name: str) -> any:
         """
@@ -169,14 +551,83 @@ class DictionaryService:
                     Wild cards can also be used, for instance: "*",
                     "opal-data.*", etc.
         """
+        response = self._make_excel_request(name).send()
+        return response.content
+
+    def _download_dictionary_as_excel(self, name: str, fp) -> int:
+        """
+        Download the Excel data dictionary of a table, streamed to a file object.
+
+        :param name: Fully qualified name of the table's variables: '<datasource>.<table>:*'
+        :param fp: The destination file object
+        :return: The number of bytes written
+        """
+        start = fp.tell()
+        self._make_excel_request(name).stream().send(fp)
+        return fp.tell() - start
+
+    def download_excel_dictionaries(
+        self, project: str, tables: list = None, output: str = None, max_workers: int = 4
+    ) -> list:
+        """
+        Download the Excel data dictionaries of several tables concurrently. Each of them is streamed
+        to its own file in the output folder, or to its own entry of the output zip file.
+
+        :param project: The project name
+        :param tables: List of table names (default is all)
+        :param output: The output folder path, or the output zip file path if it ends with '.zip'
+        :param max_workers: The maximum number of concurrent downloads
+        :return: The list of the downloaded data dictionaries, with their table name, path and size, or the
+            error message if the download of a table failed
+        """
+        if not output:
+            raise ValueError("The output folder or zip file path is required.")
+        tables_ = tables if tables else [x["name"] for x in self.get_tables(project)]
+
+        if output.endswith(".zip"):
+            lock = threading.Lock()
+            with (
+                zipfile.ZipFile(output, mode="w", compression=zipfile.ZIP_DEFLATED) as archive,
+                ThreadPoolExecutor(max_workers=max_workers) as executor,
+            ):
+                return list(executor.map(lambda t: self._download_excel_to_zip(project, t, archive, lock), tables_))
+        else:
+            os.makedirs(output, exist_ok=True)
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                return list(executor.map(lambda t: self._download_excel_to_folder(project, t, output), tables_))
+
+    def _download_excel_to_folder(self, project: str, table: str, folder: str) -> dict:
+        path = os.path.join(folder, f"{table}.xlsx")
+        try:
+            with open(path, mode="wb") as excelFile:
+                size = self._download_dictionary_as_excel(f"{project}.{table}:*", excelFile)
+        except Exception as e:
+            # a partial file is not kept
+            if os.path.exists(path):
+                os.remove(path)
+            return {"table": table, "error": str(e)}
+        return {"table": table, "path": path, "size": size}
+
+    def _download_excel_to_zip(self, project: str, table: str, archive: zipfile.ZipFile, lock) -> dict:
+        # spool the download (in memory up to a bounded size, then on disk), as zip entries can only be
+        # written one at a time
+        with tempfile.SpooledTemporaryFile(max_size=8 * 1024 * 1024) as spool:
+            try:
+                size = self._download_dictionary_as_excel(f"{project}.{table}:*", spool)
+            except Exception as e:
+                return {"table": table, "error": str(e)}
+            spool.seek(0)
+            with lock, archive.open(f"{table}.xlsx", mode="w") as entry:
+                shutil.copyfileobj(spool, entry)
+        return {"table": table, "path": f"{archive.filename}:{table}.xlsx", "size": size}
+
+    def _make_excel_request(self, name: str) -> core.OpalRequest:
         request = self.client.new_request()
         request.fail_on_error().accept("application/vnd.ms-excel")
 
         if self.verbose:
             request.verbose()
 
-        # send request
-
         resolver = core.MagmaNameResolver(name)
 
         if not resolver.is_variables():
@@ -184,10 +635,135 @@ class DictionaryService:
                 "Excel data dictionaries must be for all variables, use '<datasource>.<table>:*' format for resource."
             )
 
-        request.get().resource(f"{resolver.get_ws()}/excel")
-        response = request.send()
+        return request.get().resource(f"{resolver.get_ws()}/excel")
 
-        return response.content
+
+class DictionaryReader:
+    """
+    Read a data dictionary from a local file, as a list of variables. Supported formats are:
+
+    * JSON: the list of variables, as returned by DictionaryService.get_variables()
+    * CSV/TSV: one variable per row, with the columns of the "Variables" sheet of the Excel format
+    * Excel: the Opal Excel data dictionary, with a "Variables" sheet and an optional "Categories" sheet
+      (requires openpyxl)
+
+    Attribute columns are named "[<namespace>::]<name>[:<locale>]", for instance "label:en".
+    """
+
+    PROPERTIES = {
+        "name": "name",
+        "entityType": "entityType",
+        "valueType": "valueType",
+        "referencedEntityType": "referencedEntityType",
+        "mimeType": "mimeType",
+        "unit": "unit",
+        "repeatable": "isRepeatable",
+        "occurrenceGroup": "occurrenceGroup",
+        "index": "index",
+    }
+
+    CATEGORY_PROPERTIES = {"table": None, "variable": None, "name": "name", "missing": "isMissing"}
+
+    def __init__(self, path: str, sep: str = None):
+        self.path = path
+        self.sep = sep
+
+    def read(self) -> list:
+        lower_path = self.path.lower()
+        if lower_path.endswith(".json"):
+            with open(self.path) as f:
+                return json.load(f)
+        elif lower_path.endswith(".xlsx") or lower_path.endswith(".xls"):
+            return self._read_excel()
+        else:
+            sep = self.sep if self.sep else ("\t" if lower_path.endswith(".tsv") else ",")
+            with open(self.path, newline="") as f:
+                return [self._make_variable(row) for row in csv.DictReader(f, delimiter=sep) if row.get("name")]
+
+    def _read_excel(self) -> list:
+        try:
+            import openpyxl
+        except ImportError:
+            raise Exception("Reading Excel data dictionaries requires openpyxl: pip install openpyxl") from None
+        workbook = openpyxl.load_workbook(self.path, read_only=True)
+        try:
+            variables = [self._make_variable(row) for row in self._sheet_rows(workbook, "Variables") if row.get("name")]
+            by_name = {v["name"]: v for v in variables}
+            if "Categories" in workbook.sheetnames:
+                for row in self._sheet_rows(workbook, "Categories"):
+                    variable = by_name.get(row.get("variable"))
+                    if variable is not None and row.get("name"):
+                        variable.setdefault("categories", []).append(self._make_category(row))
+            return variables
+        finally:
+            workbook.close()
+
+    def _sheet_rows(self, workbook, name: str):
+        rows = workbook[name].iter_rows(values_only=True)
+        header = [str(h) if h is not None else "" for h in next(rows, [])]
+        for values in rows:
+            yield {h: ("" if v is None else str(v)) for h, v in zip(header, values, strict=False) if h}
+
+    def _make_variable(self, row: dict) -> dict:
+        variable = {}
+        attributes = []
+        for column, value in row.items():
+            if column is None or value is None or value == "" or column == "table":
+                continue
+            if column == "categories":
+                variable["categories"] = self._parse_categories(value)
+            elif column in self.PROPERTIES:
+                variable[self.PROPERTIES[column]] = self._parse_property(column, value)
+            else:
+                attributes.append(self._make_attribute(column, value))
+        if attributes:
+            variable["attributes"] = attributes
+        return variable
+
+    def _make_category(self, row: dict) -> dict:
+        category = {"name": row["name"], "isMissing": self._parse_bool(row.get("missing", ""))}
+        attributes = [
+            self._make_attribute(column, value)
+            for column, value in row.items()
+            if column not in self.CATEGORY_PROPERTIES and value
+        ]
+        if attributes:
+            category["attributes"] = attributes
+        return category
+
+    def _parse_categories(self, value: str) -> list:
+        """
+        Parse categories expressed as "<name>=<label>" items separated by ";".
+        """
+        categories = []
+        for item in value.split(";"):
+            name, _, label = item.strip().partition("=")
+            if name:
+                category = {"name": name.strip(), "isMissing": False}
+                if label:
+                    category["attributes"] = [{"name": "label", "value": label.strip()}]
+                categories.append(category)
+        return categories
+
+    def _make_attribute(self, column: str, value: str) -> dict:
+        namespace, _, remain = column.rpartition("::")
+        name, _, locale = remain.partition(":")
+        attribute = {"name": name, "value": value}
+        if namespace:
+            attribute["namespace"] = namespace
+        if locale:
+            attribute["locale"] = locale
+        return attribute
+
+    def _parse_property(self, column: str, value: str):
+        if column == "repeatable":
+            return self._parse_bool(value)
+        if column == "index":
+            return int(float(value))
+        return value
+
+    def _parse_bool(self, value: str) -> bool:
+        return str(value).strip().lower() in ["1", "true", "yes", "y"]
 
 
 class ExportAnnotationsService:
@@ -2,9 +2,173 @@
 Data export in many different formats.
 """
 
+import csv
 import json
+import os
+import threading
+import time
+from datetime import datetime
 import obiba_opal.core as core
 import obiba_opal.io as io
+from obiba_opal.dictionary import DictionaryService
+from obiba_opal.file import FileService
+from obiba_opal.identifiers import IdentifierMap
+from obiba_opal.system import TaskService
+from concurrent.futures import ThreadPoolExecutor
+
+
+def add_fetch_arguments(parser):
+    """
+    Add export fetch arguments
+    """
+    parser.add_argument(
+        "--fetch-to",
+        "-ft",
+        required=False,
+        help="Local folder where the exported files are downloaded, once the export task is completed.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        "-mw",
+        type=int,
+        default=4,
+        help="Maximum number of files downloaded concurrently, when fetching (default is 4).",
+    )
+
+
+def fetch_export(
+    client: core.OpalClient,
+    task: dict,
+    output: str,
+    local: str,
+    max_workers: int = 4,
+    verbose: bool = False,
+    max_interval: float = 5,
+) -> dict:
+    """
+    Download the files produced by an export task as soon as they are written, while the task is running. The
+    output is polled and a file is downloaded once its size and modification time have not changed between two
+    polls. Only the files modified since the task started are downloaded (files of a previous export in the same
+    output are not). Once the task has succeeded, the files that were not downloaded yet, or that have changed
+    since they were, are downloaded.
+
+    :param client: Opal connection object
+    :param task: The export task
+    :param output: The export output (file or folder) path in the Opal file system
+    :param local: The local folder where the output is downloaded
+    :param max_workers: The maximum number of concurrent downloads
+    :param verbose: Verbose requests
+    :param max_interval: The maximum number of seconds between two polls of the task status and of the output
+    :return: The fetch report, with the task status and the downloaded files
+    """
+    task_service = TaskService(client, verbose)
+    file_service = FileService(client, verbose)
+    parent = os.path.dirname(output.rstrip("/"))
+    fetched = {}
+    previous = {}
+    interval = min(0.5, max_interval)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        while True:
+            state = task_service.get_task(task["id"])
+            completed = state["status"] in ["SUCCEEDED", "CANCELED", "FAILED", "CANCEL_PENDING"]
+            files = {f["path"]: f for f in _list_output(file_service, output, get_start_time(state))}
+            versions = {path: (f.get("size"), f.get("lastModifiedTime")) for path, f in files.items()}
+            ready = [
+                path
+                for path, version in versions.items()
+                if fetched.get(path, (None,))[0] != version
+                and (state["status"] == "SUCCEEDED" if completed else previous.get(path) == version)
+            ]
+            futures = {path: executor.submit(_fetch_file, file_service, files[path], parent, local) for path in ready}
+            for path, future in futures.items():
+                fetched[path] = (versions[path], future.result())
+            if completed:
+                break
+            previous = versions
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
+    report = {"task": task["id"], "status": state["status"], "files": [result for _, result in fetched.values()]}
+    if not all(f["verified"] for f in report["files"]):
+        report["status"] = "FAILED"
+    return report
+
+
+def get_start_time(task: dict) -> int:
+    """
+    Get the start time of a task, in milliseconds since epoch, rounded down to the second as the files
+    last modification time can be.
+
+    :param task: The task
+    :return: The start time, or None if it is not known
+    """
+    value = task.get("startTime")
+    if isinstance(value, (int, float)):
+        return int(value) // 1000 * 1000
+    for format in ["%Y-%m-%dT%H:%M:%S.%f%z", "%Y-%m-%dT%H:%M:%S%z"]:
+        try:
+            return int(datetime.strptime(value, format).timestamp()) * 1000
+        except (TypeError, ValueError):
+            pass
+    return None
+
+
+def fetch_files(
+    client: core.OpalClient,
+    output: str,
+    local: str,
+    max_workers: int = 4,
+    verbose: bool = False,
+    since: int = None,
+) -> list:
+    """
+    Download the files of an export output. The files are streamed to disk concurrently and their size is
+    verified.
+
+    :param client: Opal connection object
+    :param output: The export output (file or folder) path in the Opal file system
+    :param local: The local folder where the output is downloaded
+    :param max_workers: The maximum number of concurrent downloads
+    :param verbose: Verbose requests
+    :param since: Download only the files modified since this time, in milliseconds since epoch (e.g. the
+        export task start time)
+    :return: The downloaded files
+    """
+    file_service = FileService(client, verbose)
+    parent = os.path.dirname(output.rstrip("/"))
+    files = _list_output(file_service, output, since)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        return list(executor.map(lambda file: _fetch_file(file_service, file, parent, local), files))
+
+
+def _list_output(file_service: FileService, output: str, since: int = None) -> list:
+    """
+    List the files of an export output modified since a time, if any, none if the output does not exist (yet).
+    """
+    try:
+        files = file_service.list_files(output)
+    except core.HTTPError as e:
+        if e.code != 404:
+            raise
+        return []
+    if since is not None:
+        files = [f for f in files if f.get("lastModifiedTime", since) >= since]
+    return files
+
+
+def _fetch_file(file_service: FileService, file: dict, parent: str, local: str) -> dict:
+    """
+    Download an export output file, in the local folder with its path relative to the output parent folder.
+    """
+    path = os.path.join(local, os.path.relpath(file["path"], parent))
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # partial file is renamed once the download is completed
+    with open(f"{path}.part", "wb") as fp:
+        file_service.download_file(file["path"], fp)
+    size = os.path.getsize(f"{path}.part")
+    verified = "size" not in file or size == file["size"]
+    if verified:
+        os.replace(f"{path}.part", path)
+    return {"path": file["path"], "local": path, "size": size, "verified": verified}
 
 
 class ExportPluginCommand:
@@ -119,6 +283,22 @@ class ExportCSVCommand:
             action="store_true",
             help="Do not write value sequences as multiple lines",
         )
+        parser.add_argument(
+            "--shards",
+            "-sd",
+            type=int,
+            required=False,
+            help="Split the export in this number of jobs, running concurrently, each one covering a subset of "
+            "the tables balanced by their number of value sets.",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            "-mj",
+            type=int,
+            required=False,
+            help="Maximum number of export jobs running concurrently, when split (default is the number of jobs).",
+        )
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -134,6 +314,26 @@ class ExportCSVCommand:
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            if getattr(args, "shards", None):
+                res = cls(client, args.verbose).export_data_sharded(
+                    args.datasource,
+                    args.tables,
+                    args.output,
+                    args.id_name,
+                    args.identifiers,
+                    not args.no_multilines,
+                    shards=args.shards,
+                    max_workers=args.max_jobs,
+                )
+                if getattr(args, "fetch_to", None) and res["status"] == "SUCCEEDED":
+                    task_service = TaskService(client, args.verbose)
+                    starts = [get_start_time(task_service.get_task(shard["task"])) for shard in res["shards"]]
+                    since = min(starts) if starts and None not in starts else None
+                    res["files"] = fetch_files(
+                        client, args.output, args.fetch_to, args.max_workers, args.verbose, since
+                    )
+                core.Formatter.print_json(res, args.json)
+                return
             res = cls(client, args.verbose).export_data(
                 args.datasource,
                 args.tables,
@@ -142,6 +342,8 @@ class ExportCSVCommand:
                 args.identifiers,
                 not args.no_multilines,
             )
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -179,6 +381,44 @@ class ExportCSVCommand:
         response = exporter.submit("csv")
         return response.from_json()
 
+    def export_data_sharded(
+        self,
+        project: str,
+        tables: list,
+        output: str,
+        id_name: str = None,
+        identifiers: str = None,
+        multilines: bool = True,
+        shards: int = 2,
+        max_workers: int = None,
+    ) -> dict:
+        """
+        Export tables in CSV files, with several export jobs running concurrently, and wait for them to complete.
+        Each job covers a subset of the tables, balanced by their number of value sets, and writes in the same
+        output directory.
+
+        :param project: The project name
+        :param tables: The table names to export (default is all)
+        :param output: The output directory path
+        :param id_name: The name of the ID column name
+        :param identifiers: The name of the ID mapping
+        :param multilines: Write value sequences as multiple lines
+        :param shards: The number of export jobs
+        :param max_workers: The maximum number of jobs running concurrently (default is all of them)
+        :return: The export report, with the tables, the task and the status of each job
+        """
+        exporter = io.OpalExporter.build(
+            client=self.client,
+            datasource=project,
+            tables=tables,
+            entityIdNames=id_name,
+            identifiers=identifiers,
+            output=output,
+            multilines=multilines,
+            verbose=self.verbose,
+        )
+        return exporter.submit_sharded("csv", shards, max_workers)
+
 
 class ExportRDSCommand:
     """
@@ -211,6 +451,7 @@ class ExportRDSCommand:
             action="store_true",
             help="Do not write value sequences as multiple lines",
         )
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -234,6 +475,8 @@ class ExportRDSCommand:
                 args.identifiers,
                 not args.no_multilines,
             )
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -311,6 +554,7 @@ class ExportRSASCommand:
             action="store_true",
             help="Do not write value sequences as multiple lines",
         )
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -334,6 +578,8 @@ class ExportRSASCommand:
                 args.identifiers,
                 not args.no_multilines,
             )
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -411,6 +657,7 @@ class ExportRSPSSCommand:
             action="store_true",
             help="Do not write value sequences as multiple lines",
         )
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -434,6 +681,8 @@ class ExportRSPSSCommand:
                 args.identifiers,
                 not args.no_multilines,
             )
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -506,6 +755,7 @@ class ExportRSTATACommand:
             action="store_true",
             help="Do not write value sequences as multiple lines",
         )
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -529,6 +779,8 @@ class ExportRSTATACommand:
                 args.identifiers,
                 not args.no_multilines,
             )
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -666,6 +918,7 @@ class ExportXMLCommand:
             help="Output zip file name that will be exported",
         )
         parser.add_argument("--identifiers", "-id", required=False, help="Name of the ID mapping")
+        add_fetch_arguments(parser)
         parser.add_argument(
             "--json",
             "-j",
@@ -682,6 +935,8 @@ class ExportXMLCommand:
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
             res = cls(client, args.verbose).export_data(args.datasource, args.tables, args.output, args.identifiers)
+            if getattr(args, "fetch_to", None):
+                res = fetch_export(client, res, args.output, args.fetch_to, args.max_workers, args.verbose)
             # format response
             core.Formatter.print_json(res, args.json)
         finally:
@@ -714,6 +969,509 @@ class ExportXMLCommand:
         return response.from_json()
 
 
+class ExportLocalCommand:
+    """
+    Export some tables to local CSV or Parquet files, streamed from the value sets.
+    """
+
+    # parquet column types of the variable value types, others are strings
+    ARROW_TYPES = {"integer": "int64", "decimal": "float64", "boolean": "bool_"}
+
+    def __init__(self, client: core.OpalClient, verbose: bool = False):
+        self.client = client
+        self.verbose = verbose
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """
+        Add data command specific options
+        """
+        parser.add_argument("--datasource", "-d", required=True, help="Project name")
+        parser.add_argument(
+            "--tables",
+            "-t",
+            nargs="+",
+            required=True,
+            help="The list of tables to be exported",
+        )
+        parser.add_argument("--output", "-out", required=True, help="Local output directory name")
+        parser.add_argument(
+            "--format",
+            "-f",
+            required=False,
+            default="csv",
+            choices=["csv", "parquet"],
+            help="Output file format: csv (default) or parquet (requires pyarrow)",
+        )
+        parser.add_argument("--id-name", "-in", required=False, help="Name of the ID column name")
+        parser.add_argument("--identifiers", "-id", required=False, help="Name of the ID mapping")
+        parser.add_argument(
+            "--no-multilines",
+            "-nl",
+            action="store_true",
+            help="Do not write value sequences as multiple lines",
+        )
+        parser.add_argument(
+            "--batch-size",
+            "-bs",
+            type=int,
+            default=1000,
+            help="Number of value sets per request (default is 1000).",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of tables exported concurrently (default is 4).",
+        )
+        parser.add_argument(
+            "--json",
+            "-j",
+            action="store_true",
+            help="Pretty JSON formatting of the response",
+        )
+
+    @classmethod
+    def do_command(cls, args):
+        """
+        Execute export data command
+        """
+        # Build and send request
+        client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
+        try:
+            res = cls(client, args.verbose).export_data(
+                args.datasource,
+                args.tables,
+                args.output,
+                args.format,
+                args.id_name,
+                args.identifiers,
+                not args.no_multilines,
+                args.batch_size,
+                args.max_workers,
+            )
+            # format response
+            core.Formatter.print_json(res, args.json)
+        finally:
+            client.close()
+
+    def export_data(
+        self,
+        project: str,
+        tables: list,
+        output: str,
+        format: str = "csv",
+        id_name: str = None,
+        identifiers: str = None,
+        multilines: bool = True,
+        batch_size: int = 1000,
+        max_workers: int = 4,
+    ) -> dict:
+        """
+        Export tables in local CSV or Parquet files, one per table. The value sets are requested by batches and
+        written as soon as they are received, without any file written in the Opal file system.
+
+        :param project: The project name
+        :param tables: The table names to export
+        :param output: The local output directory path
+        :param format: The file format: csv or parquet (requires pyarrow)
+        :param id_name: The name of the ID column name (default is "_id")
+        :param identifiers: The name of the ID mapping, the value sets of the identifiers that are not mapped
+            are not exported
+        :param multilines: Write value sequences as multiple lines (CSV only, Parquet has list columns)
+        :param batch_size: The number of value sets per request
+        :param max_workers: The maximum number of tables exported concurrently
+        :return: The export report, with the file, the number of value sets and the duration of each table
+        """
+        if format not in ["csv", "parquet"]:
+            raise ValueError(f"Not a supported format: {format}")
+        os.makedirs(output, exist_ok=True)
+        dictionary = DictionaryService(self.client, self.verbose)
+        # identifiers mappings, by entity type, downloaded once
+        maps = {}
+        lock = threading.Lock()
+
+        def get_map(entity_type: str) -> IdentifierMap:
+            with lock:
+                if entity_type not in maps:
+                    maps[entity_type] = IdentifierMap(self.client, identifiers, entity_type, verbose=self.verbose)
+                    maps[entity_type].download()
+                return maps[entity_type]
+
+        def export(table: str) -> dict:
+            start = time.time()
+            variables = dictionary.get_variables(project, table)
+            entity_type = (
+                variables[0]["entityType"] if variables else dictionary.get_table(project, table)["entityType"]
+            )
+            mapping = get_map(entity_type) if identifiers else None
+            value_sets = self._iter_value_sets(project, table, batch_size, mapping)
+            path = os.path.join(output, f"{table}.{format}")
+            if format == "csv":
+                count = self._write_csv(path, variables, value_sets, id_name, multilines)
+            else:
+                count = self._write_parquet(path, variables, value_sets, id_name)
+            return {"table": table, "file": path, "valueSets": count, "duration": time.time() - start}
+
+        try:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                results = list(executor.map(export, tables))
+        finally:
+            for mapping in maps.values():
+                mapping.close()
+        return {"output": output, "format": format, "tables": results}
+
+    def _iter_value_sets(self, project: str, table: str, batch_size: int, mapping: IdentifierMap = None):
+        """
+        Iterate over the value sets of a table, requested by batches: yields (identifier, {variable: values})
+        tuples, values being a list (empty for a missing value).
+        """
+        offset = 0
+        while True:
+            request = self.client.new_request()
+            request.fail_on_error().accept_json()
+            if self.verbose:
+                request.verbose()
+            uri = (
+                core
+                .UriBuilder(["datasource", project, "table", table, "valueSets"])
+                .query("offset", offset)
+                .query("limit", batch_size)
+                .build()
+            )
+            dto = request.get().resource(uri).send().from_json()
+            names = dto.get("variables", [])
+            batch = dto.get("valueSets", [])
+            ids = [vs["identifier"] for vs in batch]
+            if mapping is not None:
+                # unknown identifiers are not exported
+                ids = [mapped for _, mapped in mapping.resolve(ids)]
+            for id, vs in zip(ids, batch, strict=True):
+                if id is None:
+                    continue
+                values = {}
+                for name, value in zip(names, vs.get("values", []), strict=False):
+                    if "values" in value:
+                        values[name] = [v.get("value") for v in value["values"]]
+                    else:
+                        values[name] = [value["value"]] if "value" in value else []
+                yield id, values
+            if len(batch) < batch_size:
+                break
+            offset += batch_size
+
+    def _write_csv(self, path: str, variables: list, value_sets, id_name: str, multilines: bool) -> int:
+        names = [v["name"] for v in variables]
+        count = 0
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            writer.writerow([id_name if id_name else "_id"] + names)
+            for id, values in value_sets:
+                count += 1
+                columns = [values.get(name, []) for name in names]
+                if multilines:
+                    # one line per value of the sequences
+                    for i in range(max([len(c) for c in columns if len(c) > 1], default=1)):
+                        writer.writerow([id] + [c[i] if i < len(c) else None for c in columns])
+                else:
+                    writer.writerow(
+                        [id]
+                        + [
+                            ",".join(v if v is not None else "" for v in c) if len(c) > 1 else (c[0] if c else None)
+                            for c in columns
+                        ]
+                    )
+        return count
+
+    def _write_parquet(self, path: str, variables: list, value_sets, id_name: str, batch_size: int = 10000) -> int:
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Writing Parquet files requires pyarrow: pip install pyarrow") from None
+
+        def convert(value: str, value_type: str):
+            if value is None:
+                return None
+            if value_type == "integer":
+                return int(value)
+            if value_type == "decimal":
+                return float(value)
+            if value_type == "boolean":
+                return value.lower() == "true"
+            return value
+
+        fields = [pa.field(id_name if id_name else "_id", pa.string())]
+        for variable in variables:
+            type_ = getattr(pa, self.ARROW_TYPES.get(variable["valueType"], "string"))()
+            fields.append(pa.field(variable["name"], pa.list_(type_) if variable.get("isRepeatable") else type_))
+        schema = pa.schema(fields)
+        count = 0
+        with pq.ParquetWriter(path, schema) as writer:
+            rows = []
+
+            def flush():
+                columns = list(zip(*rows, strict=True)) if rows else [[] for _ in fields]
+                writer.write_table(
+                    pa.Table.from_arrays(
+                        [pa.array(c, f.type) for c, f in zip(columns, fields, strict=True)], schema=schema
+                    )
+                )
+
+            for id, values in value_sets:
+                count += 1
+                row = [id]
+                for variable in variables:
+                    vals = [convert(v, variable["valueType"]) for v in values.get(variable["name"], [])]
+                    row.append(vals if variable.get("isRepeatable") else (vals[0] if vals else None))
+                rows.append(row)
+                if len(rows) == batch_size:
+                    flush()
+                    rows = []
+            if rows or count == 0:
+                flush()
+        return count
+
+
+class ExportSyncCommand:
+    """
+    Export the tables that have changed since the last export, the export state being kept in a local file.
+    """
+
+    # format names and their exporter format and file extension (None for a folder output)
+    FORMATS = {
+        "csv": ("csv", None),
+        "xml": ("xml", ".zip"),
+        "rds": ("RDS", ".rds"),
+        "sas": ("RSAS", ".sas7bdat"),
+        "xpt": ("RXPT", ".xpt"),
+        "spss": ("RSPSS", ".sav"),
+        "zspss": ("RZSPSS", ".zsav"),
+        "stata": ("RSTATA", ".dta"),
+    }
+
+    def __init__(self, client: core.OpalClient, verbose: bool = False):
+        self.client = client
+        self.verbose = verbose
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """
+        Add data command specific options
+        """
+        parser.add_argument("--datasource", "-d", required=True, help="Project name")
+        parser.add_argument(
+            "--tables",
+            "-t",
+            nargs="+",
+            required=False,
+            help="The list of tables to be exported (default is all)",
+        )
+        parser.add_argument(
+            "--output",
+            "-out",
+            required=True,
+            help="Output directory name (in Opal file system), '{timestamp}' is replaced by the time of the run",
+        )
+        parser.add_argument(
+            "--format",
+            "-f",
+            required=False,
+            default="csv",
+            choices=list(cls.FORMATS),
+            help="Export format (default is csv)",
+        )
+        parser.add_argument("--state", "-s", required=True, help="Local state file of the previous exports")
+        parser.add_argument("--id-name", "-in", required=False, help="Name of the ID column name")
+        parser.add_argument("--identifiers", "-id", required=False, help="Name of the ID mapping")
+        parser.add_argument(
+            "--no-multilines",
+            "-nl",
+            action="store_true",
+            help="Do not write value sequences as multiple lines",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of export jobs running concurrently (default is 4).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            "-dr",
+            action="store_true",
+            help="Report the tables that have changed, without exporting them.",
+        )
+        parser.add_argument(
+            "--json",
+            "-j",
+            action="store_true",
+            help="Pretty JSON formatting of the response",
+        )
+
+    @classmethod
+    def do_command(cls, args):
+        """
+        Execute export data command
+        """
+        # Build and send request
+        client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
+        try:
+            res = cls(client, args.verbose).sync(
+                args.datasource,
+                args.output,
+                args.state,
+                args.tables,
+                args.format,
+                args.id_name,
+                args.identifiers,
+                args.max_workers,
+                args.dry_run,
+                not args.no_multilines,
+            )
+            # format response
+            core.Formatter.print_json(res, args.json)
+        finally:
+            client.close()
+
+    def sync(
+        self,
+        project: str,
+        output: str,
+        state: str,
+        tables: list = None,
+        format: str = "csv",
+        id_name: str = None,
+        identifiers: str = None,
+        max_workers: int = 4,
+        dry_run: bool = False,
+        multilines: bool = True,
+    ) -> dict:
+        """
+        Export the tables that have changed since their last export: the last update timestamp of each table is
+        compared with the one recorded in the state file at its last successful export, with the same output,
+        format and options. One incremental export job per changed table is submitted, the jobs running
+        concurrently, and the state file is updated as soon as each of them completes. A failed export does not
+        stop the others.
+
+        :param project: The project name
+        :param output: The output directory path (in Opal file system), '{timestamp}' is replaced by the time of
+            the run (e.g. to keep the exports of each run)
+        :param state: The local state file path
+        :param tables: The table names to export (default is all)
+        :param format: The export format: csv, xml, rds, sas, xpt, spss, zspss, stata
+        :param id_name: The name of the ID column name
+        :param identifiers: The name of the ID mapping
+        :param max_workers: The maximum number of export jobs running concurrently
+        :param dry_run: Report the tables that have changed, without exporting them
+        :param multilines: Write value sequences as multiple lines
+        :return: The sync report, with the exported and the unchanged tables
+        """
+        if format not in self.FORMATS:
+            raise ValueError(f"Not a supported format: {format}")
+        exporter_format, extension = self.FORMATS[format]
+        output_ = output.replace("{timestamp}", time.strftime("%Y%m%dT%H%M%S", time.gmtime()))
+        # the output is compared before the timestamp replacement, which would make every table changed
+        options = {
+            "output": output,
+            "format": format,
+            "idName": id_name,
+            "identifiers": identifiers,
+            "multilines": multilines,
+        }
+        current = self._read_state(state)
+        entries = current.setdefault("tables", {})
+        lock = threading.Lock()
+
+        last_updates = self._get_last_updates(project, tables, max_workers)
+        changed = []
+        unchanged = []
+        for table, last_update in last_updates.items():
+            entry = entries.get(f"{project}.{table}")
+            if (
+                entry is None
+                or entry.get("status") != "SUCCEEDED"
+                or entry.get("lastUpdate") != last_update
+                or entry.get("options") != options
+            ):
+                changed.append(table)
+            else:
+                unchanged.append(table)
+        report = {"output": output_, "changed": changed, "unchanged": unchanged, "exports": []}
+        if dry_run or not changed:
+            return report
+
+        task_service = TaskService(self.client, self.verbose)
+
+        def export(table: str) -> dict:
+            start = time.time()
+            path = output_ if extension is None else f"{output_.rstrip('/')}/{table}{extension}"
+            exporter = io.OpalExporter.build(
+                client=self.client,
+                datasource=project,
+                tables=[table],
+                entityIdNames=id_name,
+                identifiers=identifiers,
+                output=path,
+                incremental=True,
+                multilines=multilines,
+                verbose=self.verbose,
+            )
+            result = {"table": table, "output": path, "task": None}
+            try:
+                task = exporter.submit(exporter_format).from_json()
+                result["task"] = task["id"]
+                status = task_service.wait_task(task["id"], True, max_interval=5)
+            except Exception as e:
+                status = "FAILED"
+                result["error"] = e.error if isinstance(e, core.HTTPError) else str(e)
+            result["status"] = status
+            if status == "SUCCEEDED":
+                with lock:
+                    entries[f"{project}.{table}"] = {
+                        "lastUpdate": last_updates[table],
+                        "exported": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                        "output": path,
+                        "options": options,
+                        "task": task["id"],
+                        "status": status,
+                    }
+                    self._write_state(state, current)
+            result["duration"] = time.time() - start
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            report["exports"] = list(executor.map(export, changed))
+        return report
+
+    def _get_last_updates(self, project: str, tables: list, max_workers: int) -> dict:
+        """
+        Get the last update timestamp of each table.
+        """
+        dictionary = DictionaryService(self.client, self.verbose)
+        if tables:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                dtos = list(executor.map(lambda table: dictionary.get_table(project, table), tables))
+        else:
+            dtos = dictionary.get_tables(project)
+        return {dto["name"]: dto.get("timestamps", {}).get("lastUpdate") for dto in dtos}
+
+    def _read_state(self, path: str) -> dict:
+        if not os.path.exists(path):
+            return {}
+        with open(path) as f:
+            return json.load(f)
+
+    def _write_state(self, path: str, state: dict):
+        # atomic replacement, the state file is never partially written
+        tmp = f"{path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, path)
+
+
 class ExportVCFCommand:
     """
     Export some VCF/BCF files.
@@ -755,6 +1513,7 @@ class ExportVCFCommand:
             action="store_true",
             help="Do not include case control samples (only relevant if there is a sample-participant mapping defined)",
         )
+        io.add_vcf_shard_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -764,6 +1523,18 @@ class ExportVCFCommand:
         # Build and send requests
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            if getattr(args, "shard", False):
+                res = ExportVCFCommand(client, args.verbose).export_data_sharded(
+                    args.project,
+                    args.vcf,
+                    args.destination,
+                    not args.no_case_controls,
+                    args.filter_table,
+                    args.max_workers,
+                    args.retries,
+                )
+                core.Formatter.print_json(res, args.json)
+                return
             ExportVCFCommand(client, args.verbose).export_data(
                 args.project,
                 args.vcf,
@@ -812,3 +1583,50 @@ class ExportVCFCommand:
         uri = core.UriBuilder(["project", project, "commands", "_export_vcf"]).build()
         response = request.resource(uri).post().content(json.dumps(options)).send()
         return response.from_json()
+
+    def export_data_sharded(
+        self,
+        project: str,
+        vcf: list,
+        destination: str,
+        case_controls: bool = True,
+        filter_table: str = None,
+        max_workers: int = 2,
+        retries: int = 1,
+        silently: bool = False,
+    ) -> dict:
+        """
+        Export VCF/BCF files, in one task per file. The tasks are run concurrently and the failed ones are
+        retried.
+
+        :param project: The project name
+        :param vcf: The list of VCF/BCF file names
+        :param destination: The output folder path
+        :param case_controls: Include case control samples (only relevant if
+                             there is a sample-participant mapping defined)
+        :param filter_table: Participant table name to be used to filter the
+                            samples by participant ID (only relevant if there
+                            is a sample-participant mapping defined)
+        :param max_workers: The maximum number of tasks running concurrently
+        :param retries: The number of retries of a failed file export
+        :param silently: Do not print the progress
+        :return: The export report, with the status and the duration of each file export
+        """
+
+        def submit(name: str) -> str:
+            request = self.client.new_request()
+            request.fail_on_error().accept_json().content_type_json()
+            if self.verbose:
+                request.verbose()
+            options = {"project": project, "names": [name], "destination": destination, "caseControl": case_controls}
+            if filter_table:
+                options["table"] = filter_table
+            uri = core.UriBuilder(["project", project, "commands", "_export_vcf"]).build()
+            response = request.resource(uri).post().content(json.dumps(options)).send()
+            id = TaskService.get_task_id(response)
+            if id is None:
+                raise Exception("No VCF export task was launched")
+            return id
+
+        results = TaskService(self.client, self.verbose).run_tasks(submit, vcf, max_workers, retries, silently)
+        return io.make_vcf_shards_report(results)
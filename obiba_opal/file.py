@@ -2,9 +2,18 @@
 Opal file management.
 """
 
+import fnmatch
+import hashlib
 import json
 import sys
 import os
+import posixpath
+import struct
+import tempfile
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
 
 import obiba_opal.core as core
 from obiba_opal.system import TaskService
@@ -12,12 +21,20 @@ from obiba_opal.system import TaskService
 
 class FileService:
     """
-    File management service.
+    File management service. The file metadata can be cached for a short time (opt-in), the cache entries of a
+    file being invalidated when it is uploaded or deleted by this service. The changes made by other clients are
+    not seen until the entries expire.
     """
 
-    def __init__(self, client: core.OpalClient, verbose: bool = False):
+    def __init__(self, client: core.OpalClient, verbose: bool = False, cache_ttl: float = 0):
+        """
+        :param client: Opal connection object
+        :param verbose: Verbose requests
+        :param cache_ttl: The time-to-live in seconds of the cached file metadata, 0 (default) to disable the cache
+        """
         self.client = client
         self.verbose = verbose
+        self.cache = FileService.MetadataCache(cache_ttl) if cache_ttl > 0 else None
 
     @classmethod
     def add_arguments(self, parser):
@@ -32,12 +49,50 @@ class FileService:
             help="Download file, or folder (as a zip file).",
         )
         parser.add_argument("--download-password", "-dlp", help="Password to encrypt the file content.")
+        parser.add_argument(
+            "--extract-to",
+            "-x",
+            required=False,
+            help="Download a folder, or a password protected file, as a zip archive that is extracted in a local directory while it is streamed.",
+        )
+        parser.add_argument(
+            "--output",
+            "-out",
+            required=False,
+            help="Local file path of the download (default is the standard output). A file download is resumed if it was interrupted.",
+        )
+        parser.add_argument(
+            "--segments",
+            "-sg",
+            type=int,
+            default=1,
+            help="Number of ranged segments of a file download, downloaded in parallel (default is 1).",
+        )
+        parser.add_argument(
+            "--retries",
+            "-rs",
+            type=int,
+            default=3,
+            help="Maximum number of retries of a file download, after an interruption (default is 3).",
+        )
         parser.add_argument(
             "--upload",
             "-up",
             required=False,
             help="Upload a local file to a folder in Opal file system.",
         )
+        parser.add_argument(
+            "--skip-unchanged",
+            "-su",
+            action="store_true",
+            help="Do not upload the file if the file in Opal is identical.",
+        )
+        parser.add_argument(
+            "--hash-cache",
+            "-hc",
+            required=False,
+            help="Local file of the content hashes of the uploaded, downloaded or synchronized files, to compare them by content.",
+        )
         parser.add_argument(
             "--delete",
             "-dt",
@@ -45,6 +100,44 @@ class FileService:
             help="Delete a file on Opal file system.",
         )
         parser.add_argument("--force", "-f", action="store_true", help="Skip confirmation.")
+        parser.add_argument(
+            "--sync",
+            "-sy",
+            required=False,
+            help="Synchronize a local folder with the folder in Opal file system, only the files that differ are transferred.",
+        )
+        parser.add_argument(
+            "--direction",
+            "-di",
+            choices=["up", "down"],
+            default="up",
+            help="Synchronization direction: 'up' to upload the local folder (default), 'down' to download the Opal folder.",
+        )
+        parser.add_argument(
+            "--checksum",
+            "-cs",
+            action="store_true",
+            help="Compare the content of the files of same size, instead of their modification time.",
+        )
+        parser.add_argument(
+            "--delete-extra",
+            "-de",
+            action="store_true",
+            help="Delete the files of the synchronized folder that are not in the source folder.",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of concurrent file transfers (default is 4).",
+        )
+        parser.add_argument(
+            "--dry-run",
+            "-dr",
+            action="store_true",
+            help="Report the files to be transferred or deleted, without synchronizing them.",
+        )
         parser.add_argument(
             "--json",
             "-j",
@@ -60,13 +153,41 @@ class FileService:
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
-            service = FileService(client, args.verbose)
+            # a sync walks the folders, their metadata are listed once for the command duration
+            service = FileService(client, args.verbose, cache_ttl=30 if args.sync else 0)
+            hashes = FileService.HashCache(args.hash_cache) if args.hash_cache else None
 
             # send request
-            if args.download or args.download_password:
-                service.download_file(args.path, sys.stdout.fileno(), args.download_password)
+            if args.sync:
+                res = service.sync(
+                    args.sync,
+                    args.path,
+                    args.direction == "down",
+                    args.checksum,
+                    args.delete_extra,
+                    args.max_workers,
+                    args.dry_run,
+                    hashes,
+                )
+                core.Formatter.print_json(res, args.json)
+            elif args.extract_to:
+                res = service.extract_file(args.path, args.extract_to, args.download_password)
+                core.Formatter.print_json(res, args.json)
+            elif args.download or args.download_password:
+                if not args.output:
+                    service.download_file(args.path, sys.stdout.fileno(), args.download_password)
+                elif args.download_password or service.file_info(args.path)["type"] == "FOLDER":
+                    # zip archive, made on demand
+                    with open(args.output, "wb") as fp:
+                        service.download_file(args.path, fp, args.download_password)
+                else:
+                    res = service.download_file_resumable(args.path, args.output, args.segments, args.retries)
+                    core.Formatter.print_json(res, args.json)
             else:
-                if args.upload:
+                if args.upload and (args.skip_unchanged or hashes):
+                    res = service.upload_files([args.upload], args.path, hashes)
+                    core.Formatter.print_json(res, args.json)
+                elif args.upload:
                     service.upload_file(args.upload, args.path)
                 elif args.delete:
                     # confirm
@@ -109,40 +230,339 @@ class FileService:
 
         if self.client.compare_version("5.7.0") < 0:
             # File download before Opal 5.7.0
-            request.get().resource(file.get_ws()).accept("*/*").header("X-File-Key", download_password).send(fp)
+            request.get().resource(file.get_ws()).accept("*/*").header("X-File-Key", download_password)
+            request.stream().send(fp)
             fp.flush()
         else:
             # File download with Opal 5.7.0 or later
             if download_password or info["type"] == "FOLDER":
                 # File to be bundled as zip archive
-                options = file.make_bundle_options(download_password)
-                bundle_request = self.client.new_request().fail_on_error()
+                self._download_bundle(file, download_password, lambda request: request.stream().send(fp))
+                fp.flush()
+            else:
+                # File to be downloaded as is
+                request.get().resource(file.get_ws()).accept("*/*").header("X-File-Key", download_password)
+                request.stream().send(fp)
+                fp.flush()
+
+    def _download_bundle(self, file, download_password: str, send):
+        """
+        Make a zip archive of a file or folder with a file bundle task, and download it.
+
+        :param file: The OpalFile to be bundled
+        :param download_password: The password to use to encrypt the zip archive
+        :param send: The function that sends the download request of the zip archive
+        :return: The result of the send function
+        """
+        options = file.make_bundle_options(download_password)
+        bundle_request = self.client.new_request().fail_on_error()
+        if self.verbose:
+            bundle_request.verbose()
+        response = (
+            bundle_request
+            .post()
+            .resource("/shell/commands/_file-bundle")
+            .accept_json()
+            .content_type_json()
+            .content(json.dumps(options))
+            .send()
+        )
+        task = response.from_json()
+        task_service = TaskService(self.client)
+        try:
+            status = task_service.wait_task(task["id"], True)
+            if status == "SUCCEEDED":
+                # Task succeeded, downloading file
+                download_request = self.client.new_request().fail_on_error()
                 if self.verbose:
-                    bundle_request.verbose()
-                response = bundle_request.post().resource("/shell/commands/_file-bundle").accept_json().content_type_json().content(json.dumps(options)).send()
-                task = response.from_json()
-                task_service = TaskService(self.client)
+                    download_request.verbose()
+                return send(download_request.get().resource(f"/shell/command/{task['id']}/_result").accept("*/*"))
+            else:
+                raise Exception(f"File bundle task failed with status: {status}")
+        finally:
+            # Ensure task is deleted in any case to avoid leaving pending tasks on the server
+            delete_request = self.client.new_request().fail_on_error()
+            if self.verbose:
+                delete_request.verbose()
+            delete_request.delete().resource(f"/shell/command/{task['id']}").send()
+
+    def extract_file(self, path: str, directory: str, download_password: str = None) -> list:
+        """
+        Download a folder, or a password protected file, as a zip archive that is extracted while it is streamed:
+        the archive is not written on disk. The password protected entries are decrypted on the fly, if they are
+        encrypted with the traditional zip encryption (AES encrypted entries are not supported). A file that is not
+        password protected is simply downloaded in the directory.
+
+        :param path: The file or folder path in Opal
+        :param directory: The local directory where the files are extracted
+        :param download_password: The password used to encrypt the zip archive content
+        :return: The extracted files (name and size)
+        :raises Exception: If the file is not readable, or if the archive cannot be extracted
+        """
+        info = self.file_info(path)
+        if not info["readable"]:
+            raise Exception(f"File {path} is not readable")
+        os.makedirs(directory, exist_ok=True)
+        if not download_password and info["type"] != "FOLDER":
+            local = os.path.join(directory, os.path.basename(path))
+            result = self.download_file_resumable(path, local)
+            return [{"name": os.path.basename(path), "size": result["size"]}]
+
+        extractor = ZipStreamExtractor(directory, download_password)
+
+        def extract(request):
+            with request.stream().send() as response:
+                return extractor.extract(response.response.iter_content(chunk_size=1024 * 1024))
+
+        file = FileService.OpalFile(path)
+        if self.client.compare_version("5.7.0") < 0:
+            # File download before Opal 5.7.0
+            request = self.client.new_request().fail_on_error()
+            if self.verbose:
+                request.verbose()
+            return extract(request.get().resource(file.get_ws()).accept("*/*").header("X-File-Key", download_password))
+        return self._download_bundle(file, download_password, extract)
+
+    def download_file_resumable(
+        self, path: str, local: str, segments: int = 1, retries: int = 3, progress=None
+    ) -> dict:
+        """
+        Download a file to a local file, with HTTP range requests. The content is written in a '.part' file that is
+        renamed once the download is completed and its size is verified. An interrupted download is retried and
+        resumed where it stopped, including from a previous call, unless the Opal file size or last modification time
+        have changed since. The file can be split in ranged segments that are downloaded in parallel, their progress
+        being kept with the file version in a '.part.json' file. If the server does not support range requests, the
+        file is downloaded from the start, in one piece.
+
+        :param path: The file path in Opal
+        :param local: The local file path
+        :param segments: The number of ranged segments downloaded in parallel
+        :param retries: The maximum number of retries of a segment download
+        :param progress: The function called with the number of bytes written, after each written chunk
+        :return: The download report: path, local, size, resumed (bytes already downloaded) and segments
+        :raises Exception: If the file is not readable or if the downloaded size does not match the file size
+        """
+        info = self.file_info(path)
+        if info["type"] == "FOLDER" or not info["readable"]:
+            raise Exception(f"File {path} is not a readable file")
+        size = info["size"]
+        version = {"size": size, "lastModifiedTime": info.get("lastModifiedTime")}
+        part = f"{local}.part"
+        ranges = self._load_ranges(part, version, segments)
+        resumed = sum(written for _, _, written in ranges)
+        lock = threading.Lock()
+        backoff = core.AdaptiveBackoff(retries)
+
+        def save():
+            # when the part file is written sequentially, its size is the progress
+            with lock, open(f"{part}.json", "w") as fp:
+                json.dump({**version, "ranges": ranges}, fp)
+
+        def download(range: list):
+            nonlocal resumed
+            if len(ranges) == 1:
+                # sequential download, the part file size is the progress
+                range[2] = os.path.getsize(part)
+            start = range[0] + range[2]
+            if start > range[1]:
+                return
+            request = self.client.new_request().fail_on_error()
+            if self.verbose:
+                request.verbose()
+            file = FileService.OpalFile(path)
+            request.get().resource(file.get_ws()).accept("*/*").header("Range", f"bytes={start}-{range[1]}")
+            with request.stream().send() as response:
                 try:
-                    status = task_service.wait_task(task["id"], True)
-                    if status == "SUCCEEDED":
-                        # Task succeeded, downloading file
-                        download_request = self.client.new_request().fail_on_error()
-                        if self.verbose:
-                            download_request.verbose()
-                        download_request.get().resource(f"/shell/command/{task['id']}/_result").accept("*/*").send(fp)
+                    if response.code != 206:
+                        if len(ranges) > 1:
+                            raise FileService.RangeNotSupportedError(f"Range requests are not supported for {path}")
+                        # the whole content is sent, the download restarts
+                        start = 0
+                        range[2] = 0
+                        resumed = 0
+                    with open(part, "r+b") as fp:
+                        fp.seek(start)
+                        if len(ranges) == 1:
+                            fp.truncate()
+                        # progress only accounts for the flushed content
+                        unsaved = 0
+                        for chunk in response.response.iter_content(chunk_size=1024 * 1024):
+                            fp.write(chunk)
+                            unsaved += len(chunk)
+                            if progress:
+                                progress(len(chunk))
+                            if unsaved >= 16 * 1024 * 1024:
+                                fp.flush()
+                                range[2] += unsaved
+                                unsaved = 0
+                                save()
                         fp.flush()
-                    else:
-                        raise Exception(f"File bundle task failed with status: {status}")
+                        range[2] += unsaved
                 finally:
-                    # Ensure task is deleted in any case to avoid leaving pending tasks on the server
-                    delete_request = self.client.new_request().fail_on_error()
-                    if self.verbose:
-                        delete_request.verbose()
-                    delete_request.delete().resource(f"/shell/command/{task['id']}").send()
-            else:
-                # File to be downloaded as is
-                request.get().resource(file.get_ws()).accept("*/*").header("X-File-Key", download_password).send(fp)
-                fp.flush()
+                    save()
+
+        # the part file must exist to be written at any position
+        open(part, "ab").close()
+        save()
+        try:
+            with ThreadPoolExecutor(max_workers=len(ranges)) as executor:
+                list(executor.map(lambda range: backoff.call(download, range), ranges))
+        except FileService.RangeNotSupportedError:
+            # the segments already written are discarded
+            open(part, "wb").close()
+            ranges = [[0, size - 1, 0]]
+            resumed = 0
+            save()
+            backoff.call(download, ranges[0])
+
+        downloaded = os.path.getsize(part)
+        if downloaded != size:
+            # the cached file size may be outdated
+            self._invalidate(path)
+            raise Exception(f"Downloaded size of {path} is {downloaded} bytes, expected {size} bytes")
+        os.replace(part, local)
+        if os.path.exists(f"{part}.json"):
+            os.remove(f"{part}.json")
+        return {"path": path, "local": local, "size": size, "resumed": resumed, "segments": len(ranges)}
+
+    def download_files(
+        self, paths: list, local: str, max_workers: int = 4, segments: int = 1, retries: int = 3, silently: bool = False
+    ) -> dict:
+        """
+        Download files concurrently, each one being streamed to a local file (see download_file_resumable), with
+        an aggregated progress view: downloaded bytes, throughput and estimated time to completion. The files are
+        written in the local directory with their path relative to the common folder of all the downloaded files.
+
+        :param paths: The file or folder paths in Opal, or glob patterns (e.g. /projects/*/export/*.csv), the folders
+            are downloaded recursively
+        :param local: The local directory
+        :param max_workers: The maximum number of concurrent downloads
+        :param segments: The number of ranged segments downloaded in parallel, per file
+        :param retries: The maximum number of retries of a file download
+        :param silently: Do not print the progress
+        :return: The downloads report: the files (path, local, size, status, duration and throughput), total size,
+            duration and throughput
+        """
+        files = {}
+        for path in paths:
+            for file in self.glob_files(path):
+                files[file["path"]] = file
+        files = list(files.values())
+        parent = posixpath.commonpath([posixpath.dirname(file["path"]) for file in files]) if files else "/"
+        total = sum(file.get("size", 0) for file in files)
+        lock = threading.Lock()
+        stats = {"bytes": 0, "completed": 0, "shown": 0.0}
+        start = time.time()
+
+        def show(force: bool = False):
+            if silently:
+                return
+            with lock:
+                now = time.time()
+                if not force and now - stats["shown"] < 0.5:
+                    return
+                stats["shown"] = now
+                rate = stats["bytes"] / (now - start) if now > start else 0
+                eta = f"{(total - stats['bytes']) / rate:.0f}s" if rate > 0 else "-"
+                sys.stdout.write(
+                    f"\r\033[K[{stats['completed']}/{len(files)}] {stats['bytes'] / 1e6:.1f}/{total / 1e6:.1f} MB "
+                    f"{rate / 1e6:.1f} MB/s ETA {eta}"
+                )
+                sys.stdout.flush()
+
+        def progress(size: int):
+            with lock:
+                stats["bytes"] += size
+            show()
+
+        def download(file: dict) -> dict:
+            file_start = time.time()
+            target = os.path.join(local, *posixpath.relpath(file["path"], parent).split("/"))
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            result = {"path": file["path"], "local": target, "size": file.get("size", 0)}
+            try:
+                self.download_file_resumable(file["path"], target, segments, retries, progress)
+                result["status"] = "SUCCEEDED"
+            except Exception as e:
+                result.update({"status": "FAILED", "error": str(e)})
+            result["duration"] = time.time() - file_start
+            result["bytesPerSecond"] = result["size"] / result["duration"] if result["duration"] > 0 else 0
+            with lock:
+                stats["completed"] += 1
+            show(True)
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(download, files))
+        if not silently:
+            sys.stdout.write("\r\033[K")
+            sys.stdout.flush()
+        duration = time.time() - start
+        size = sum(result["size"] for result in results if result["status"] == "SUCCEEDED")
+        return {
+            "files": results,
+            "failed": len([result for result in results if result["status"] == "FAILED"]),
+            "size": size,
+            "duration": duration,
+            "bytesPerSecond": size / duration if duration > 0 else 0,
+        }
+
+    def glob_files(self, pattern: str) -> list:
+        """
+        List the files matching a path pattern in Opal, recursively for the matching folders. The wildcards
+        (*, ? and [...]) do not match the path separator.
+
+        :param pattern: The file or folder path in Opal, that can include wildcards (e.g. /projects/*/export/*.csv)
+        :return: The list of the matching file descriptions
+        """
+        if not any(c in pattern for c in "*?["):
+            return self.list_files(pattern)
+        paths = ["/"]
+        for part in [part for part in pattern.split("/") if part]:
+            matches = []
+            for path in paths:
+                if not any(c in part for c in "*?["):
+                    matches.append(posixpath.join(path, part))
+                    continue
+                try:
+                    info = self.file_info(path)
+                except core.HTTPError as e:
+                    if e.code != 404:
+                        raise
+                    continue
+                children = info.get("children") or []
+                matches.extend(child["path"] for child in children if fnmatch.fnmatchcase(child["name"], part))
+            paths = matches
+        files = []
+        for path in paths:
+            try:
+                files.extend(self.list_files(path))
+            except core.HTTPError as e:
+                if e.code != 404:
+                    raise
+        return files
+
+    def _load_ranges(self, part: str, version: dict, segments: int) -> list:
+        """
+        Get the byte ranges to be downloaded, as [start, end, written] lists, from the previous download if any and
+        if it was of the same file version (size and last modification time).
+        """
+        size = version["size"]
+        if os.path.exists(f"{part}.json") and os.path.exists(part):
+            with open(f"{part}.json") as fp:
+                progress = json.load(fp)
+            same = all(progress.get(key) == value for key, value in version.items())
+            if same and len(progress["ranges"]) > 1:
+                return progress["ranges"]
+            if same and os.path.getsize(part) <= size:
+                # sequential download, the part file size is the progress
+                return [[0, size - 1, os.path.getsize(part)]]
+        if os.path.exists(part):
+            os.remove(part)
+        # segments smaller than 1MB are not worth it
+        count = max(1, min(segments, size // (1024 * 1024)))
+        bounds = [size * i // count for i in range(count + 1)]
+        return [[bounds[i], bounds[i + 1] - 1, 0] for i in range(count)]
 
     def upload_file(self, upload: str, path: str):
         """
@@ -161,6 +581,137 @@ class FileService:
 
         request.content_upload(upload).accept("text/html")
         request.post().resource(file.get_ws()).send()
+        self._invalidate(f"{path.rstrip('/')}/{os.path.basename(upload)}")
+
+    def upload_file_if_changed(self, upload: str, path: str, hashes: "FileService.HashCache" = None) -> dict:
+        """
+        Upload a file to Opal, unless the Opal file is identical: same size and, if the content hash of the
+        uploaded file is known (see HashCache), same content, otherwise not older than the local file.
+
+        :param upload: The source file path to upload
+        :param path: The destination folder path in Opal
+        :param hashes: The content hashes cache
+        :return: The upload report: file, path, size and status (uploaded or skipped)
+        """
+        remote_path = f"{path.rstrip('/')}/{os.path.basename(upload)}"
+        size = os.path.getsize(upload)
+        try:
+            info = self.file_info(remote_path)
+        except core.HTTPError as e:
+            if e.code != 404:
+                raise
+            info = None
+        if info is not None and info["type"] != "FOLDER" and info.get("size") == size:
+            remote_hash = hashes.remote_hash(info) if hashes else None
+            if remote_hash is not None:
+                unchanged = hashes.local_hash(upload) == remote_hash
+            else:
+                # modification times are compared with a tolerance, as file systems do not have the same resolution
+                unchanged = os.path.getmtime(upload) <= info.get("lastModifiedTime", 0) / 1000 + 1
+            if unchanged:
+                return {"file": upload, "path": remote_path, "size": size, "status": "skipped"}
+        if hashes:
+            self._upload_hashed(upload, path, hashes)
+        else:
+            self.upload_file(upload, path)
+        return {"file": upload, "path": remote_path, "size": size, "status": "uploaded"}
+
+    def upload_files(self, uploads: list, path: str, hashes: "FileService.HashCache" = None) -> dict:
+        """
+        Upload files to Opal, skipping the ones that are unchanged (see upload_file_if_changed).
+
+        :param uploads: The source file paths to upload
+        :param path: The destination folder path in Opal
+        :param hashes: The content hashes cache, saved after the uploads
+        :return: The uploads report, with the transferred and skipped byte totals
+        """
+        files = []
+        try:
+            for upload in uploads:
+                files.append(self.upload_file_if_changed(upload, path, hashes))
+        finally:
+            if hashes:
+                hashes.save()
+        return {
+            "files": files,
+            "uploaded": len([f for f in files if f["status"] == "uploaded"]),
+            "skipped": len([f for f in files if f["status"] == "skipped"]),
+            "transferredBytes": sum(f["size"] for f in files if f["status"] == "uploaded"),
+            "skippedBytes": sum(f["size"] for f in files if f["status"] == "skipped"),
+        }
+
+    def _upload_hashed(self, upload: str, path: str, hashes: "FileService.HashCache"):
+        """
+        Upload a file to Opal, its content hash being computed while it is streamed, and recorded with the
+        description of the uploaded file.
+        """
+        digest = hashlib.sha256()
+        stat = os.stat(upload)
+
+        def chunks():
+            with open(upload, "rb") as fp:
+                for chunk in iter(lambda: fp.read(1024 * 1024), b""):
+                    digest.update(chunk)
+                    yield chunk
+
+        self.upload_stream(chunks(), os.path.basename(upload), path)
+        hashes.set_local(upload, stat, digest.hexdigest())
+        hashes.set_remote(self.file_info(f"{path.rstrip('/')}/{os.path.basename(upload)}"), digest.hexdigest())
+
+    def upload_stream(self, chunks, filename: str, path: str):
+        """
+        Upload a file to Opal, which content is generated on the fly.
+
+        :param chunks: An iterable of bytes, the file content
+        :param filename: The name of the uploaded file
+        :param path: The destination folder path in Opal
+        """
+        request = self.client.new_request()
+        request.fail_on_error().accept_json()
+
+        if self.verbose:
+            request.verbose()
+
+        file = FileService.OpalFile(path)
+
+        request.content_upload_stream(filename, chunks).accept("text/html")
+        request.post().resource(file.get_ws()).send()
+        self._invalidate(f"{path.rstrip('/')}/{filename}")
+
+    def create_folder(self, path: str, parents: bool = False):
+        """
+        Create a folder in Opal.
+
+        :param path: The folder path in Opal, its parent folder must exist
+        :param parents: Create the missing parent folders too, parents before their children
+        """
+        if parents:
+            missing = []
+            folder = path.rstrip("/")
+            while folder and folder != "/":
+                try:
+                    self.file_info(folder)
+                    break
+                except core.HTTPError as e:
+                    if e.code != 404:
+                        raise
+                    missing.append(folder)
+                    folder = posixpath.dirname(folder)
+            for folder in reversed(missing):
+                self.create_folder(folder)
+            return
+
+        request = self.client.new_request()
+        request.fail_on_error().accept_json().content_type_text_plain()
+
+        if self.verbose:
+            request.verbose()
+
+        parent, name = os.path.split(path.rstrip("/"))
+        file = FileService.OpalFile(parent if parent else "/")
+
+        request.post().resource(file.get_ws()).content(name).send()
+        self._invalidate(path)
 
     def delete_file(self, path: str):
         """
@@ -177,13 +728,35 @@ class FileService:
         file = FileService.OpalFile(path)
 
         request.delete().resource(file.get_ws()).send()
+        self._invalidate(path)
 
     def file_info(self, path) -> dict:
         """
-        Get information about a file in Opal.
+        Get information about a file in Opal. The information is read from the cache if the file, or the folder
+        containing it, was recently described.
 
         :param path: The destination file path in Opal
         """
+        if self.cache is not None:
+            info = self.cache.get(path)
+            if info is None:
+                info = self._get_file_info(path)
+                self.cache.put(info)
+            return info
+        return self._get_file_info(path)
+
+    def clear_cache(self):
+        """
+        Clear the cached file metadata.
+        """
+        if self.cache is not None:
+            self.cache.clear()
+
+    def _invalidate(self, path: str):
+        if self.cache is not None:
+            self.cache.invalidate(path)
+
+    def _get_file_info(self, path) -> dict:
         request = self.client.new_request()
         request.fail_on_error().accept_json()
 
@@ -195,6 +768,338 @@ class FileService:
         response = request.get().resource(file.get_meta_ws()).send()
         return response.from_json()
 
+    def list_files(self, path: str) -> list:
+        """
+        List the files of a folder in Opal, recursively. If the path is a file, it is the only one listed.
+
+        :param path: The file or folder path in Opal
+        :return: The list of file descriptions (path, size, last modification time...)
+        """
+        info = self.file_info(path)
+        if info["type"] != "FOLDER":
+            return [info]
+        files = []
+        for child in info.get("children", []):
+            if child["type"] == "FOLDER":
+                files.extend(self.list_files(child["path"]))
+            else:
+                files.append(child)
+        return files
+
+    def sync(
+        self,
+        local: str,
+        path: str,
+        download: bool = False,
+        checksum: bool = False,
+        delete: bool = False,
+        max_workers: int = 4,
+        dry_run: bool = False,
+        hashes: "FileService.HashCache" = None,
+    ) -> dict:
+        """
+        Synchronize a local folder with a folder in Opal, in one direction. Both trees are listed once and the
+        files that are missing or that differ in the synchronized folder are transferred concurrently. Files
+        differ when their sizes differ or, when the sizes are equal, when the source file is more recent (or
+        when their contents differ, if checksum is requested: the Opal files are then read to be compared, also
+        concurrently). A missing Opal folder is created, with its missing parents, when uploading.
+
+        :param local: The local folder path
+        :param path: The folder path in Opal
+        :param download: Download the Opal folder into the local folder, instead of uploading the local folder
+        :param checksum: Compare the content of the files of same size, instead of their modification time
+        :param delete: Delete the files of the synchronized folder that are not in the source folder
+        :param max_workers: The maximum number of concurrent file transfers
+        :param dry_run: Report the files to be transferred or deleted, without synchronizing them
+        :param hashes: The content hashes cache, to compare the files without reading the Opal files when they
+            were transferred by a previous synchronization
+        :return: The synchronization report
+        :raises Exception: If the local folder to upload does not exist, so that it is not taken for an empty one
+        """
+        if not download and not os.path.isdir(local):
+            raise Exception(f"Local folder {local} does not exist")
+        path = path.rstrip("/")
+        local_files = self._list_local_tree(local)
+        tree = self._list_remote_tree(path, not download)
+        remote_files, remote_folders = tree if tree else ({}, set())
+        source, destination = (remote_files, local_files) if download else (local_files, remote_files)
+
+        transfers = [name for name in source if name not in destination]
+        compared = [name for name in source if name in destination]
+
+        def differs(name: str) -> bool:
+            return self._differs(local, name, local_files[name], remote_files[name], download, checksum, hashes)
+
+        if checksum:
+            # the Opal files without a cached hash are read, concurrently
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                differences = list(executor.map(differs, compared))
+        else:
+            differences = [differs(name) for name in compared]
+        transfers.extend(name for name, different in zip(compared, differences, strict=True) if different)
+        unchanged = differences.count(False)
+        extras = sorted(set(destination) - set(source)) if delete else []
+        report = {"transferred": sorted(transfers), "unchanged": unchanged, "deleted": extras, "failed": [], "size": 0}
+        if dry_run:
+            return report
+
+        if not download:
+            if tree is None:
+                self.create_folder(path, parents=True)
+            # missing folders are created, parents before their children
+            folders = set()
+            for name in transfers:
+                parts = name.split("/")[:-1]
+                folders.update("/".join(parts[: i + 1]) for i in range(len(parts)))
+            for folder in sorted(folders - remote_folders, key=lambda f: f.count("/")):
+                self.create_folder(f"{path}/{folder}")
+
+        def transfer(name: str) -> int:
+            local_path = os.path.join(local, *name.split("/"))
+            if download:
+                os.makedirs(os.path.dirname(local_path), exist_ok=True)
+                self.download_file_resumable(remote_files[name]["path"], local_path)
+                if "lastModifiedTime" in remote_files[name]:
+                    mtime = remote_files[name]["lastModifiedTime"] / 1000
+                    os.utime(local_path, (mtime, mtime))
+                if hashes:
+                    hashes.set_remote(remote_files[name], hashes.local_hash(local_path))
+            else:
+                folder = os.path.dirname(name)
+                if hashes:
+                    self._upload_hashed(local_path, f"{path}/{folder}" if folder else path, hashes)
+                else:
+                    self.upload_file(local_path, f"{path}/{folder}" if folder else path)
+            return os.path.getsize(local_path)
+
+        def remove(name: str):
+            if download:
+                os.remove(os.path.join(local, *name.split("/")))
+            else:
+                self.delete_file(remote_files[name]["path"])
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for action, names in [(transfer, report["transferred"]), (remove, extras)]:
+                futures = {name: executor.submit(action, name) for name in names}
+                for name, future in futures.items():
+                    try:
+                        size = future.result()
+                        report["size"] += size if size else 0
+                    except Exception as e:
+                        names.remove(name)
+                        report["failed"].append({"path": name, "error": str(e)})
+        if hashes:
+            hashes.save()
+        return report
+
+    def _list_local_tree(self, local: str) -> dict:
+        """
+        List the files of a local folder, recursively, by their relative path (with '/' separators).
+        """
+        files = {}
+        for root, _, names in os.walk(local):
+            for name in names:
+                if name.endswith(".part"):
+                    continue
+                stat = os.stat(os.path.join(root, name))
+                relpath = os.path.relpath(os.path.join(root, name), local).replace(os.sep, "/")
+                files[relpath] = {"size": stat.st_size, "mtime": stat.st_mtime}
+        return files
+
+    def _list_remote_tree(self, path: str, missing_ok: bool = False) -> tuple:
+        """
+        List the files and the folders of an Opal folder, recursively, by their relative path. None is returned
+        if the folder does not exist and it is ok.
+        """
+        files = {}
+        folders = set()
+        try:
+            info = self.file_info(path)
+        except core.HTTPError as e:
+            if not missing_ok or e.code != 404:
+                raise
+            return None
+
+        def walk(children: list):
+            for child in children:
+                name = child["path"][len(path) + 1 :]
+                if child["type"] == "FOLDER":
+                    folders.add(name)
+                    walk(self.file_info(child["path"]).get("children", []))
+                else:
+                    files[name] = child
+
+        walk(info.get("children", []))
+        return files, folders
+
+    def _differs(
+        self,
+        local: str,
+        name: str,
+        local_file: dict,
+        remote_file: dict,
+        download: bool,
+        checksum: bool,
+        hashes: "FileService.HashCache" = None,
+    ) -> bool:
+        """
+        Compare a local file with an Opal file.
+        """
+        if local_file["size"] != remote_file.get("size"):
+            return True
+        if checksum:
+            local_path = os.path.join(local, *name.split("/"))
+            local_hash = hashes.local_hash(local_path) if hashes else FileService.HashCache.hash_file(local_path)
+            remote_hash = hashes.remote_hash(remote_file) if hashes else None
+            if remote_hash is None:
+                # no server side checksum, the Opal file is read to be hashed
+                with tempfile.TemporaryFile() as fp:
+                    self.download_file(remote_file["path"], fp)
+                    fp.seek(0)
+                    remote_hash = FileService.HashCache.hash_file(fp)
+                if hashes:
+                    hashes.set_remote(remote_file, remote_hash)
+            return local_hash != remote_hash
+        # modification times are compared with a tolerance, as file systems do not have the same resolution
+        remote_mtime = remote_file.get("lastModifiedTime", 0) / 1000
+        if download:
+            return remote_mtime > local_file["mtime"] + 1
+        return local_file["mtime"] > remote_mtime + 1
+
+    class MetadataCache:
+        """
+        In-memory cache of the file metadata, by path. A folder description includes the description of its
+        children, the files are then cached with their folder. Entries expire after a time-to-live.
+        """
+
+        def __init__(self, ttl: float):
+            self.ttl = ttl
+            self._entries = {}
+            self._lock = threading.Lock()
+
+        def get(self, path: str) -> dict | None:
+            path = self._normalize(path)
+            with self._lock:
+                entry = self._entries.get(path)
+                if entry is None:
+                    return None
+                if entry[0] < time.monotonic():
+                    del self._entries[path]
+                    return None
+                return entry[1]
+
+        def put(self, info: dict):
+            expiry = time.monotonic() + self.ttl
+            with self._lock:
+                self._entries[self._normalize(info["path"])] = (expiry, info)
+                # sub-folders are described without their children, they cannot be cached
+                for child in info.get("children") or []:
+                    if child["type"] != "FOLDER":
+                        self._entries[self._normalize(child["path"])] = (expiry, child)
+
+        def invalidate(self, path: str):
+            """
+            Remove a file, its children and its parent folder from the cache.
+            """
+            path = self._normalize(path)
+            parent = posixpath.dirname(path)
+            with self._lock:
+                for key in [key for key in self._entries if key in (path, parent) or key.startswith(f"{path}/")]:
+                    del self._entries[key]
+
+        def clear(self):
+            with self._lock:
+                self._entries.clear()
+
+        def _normalize(self, path: str) -> str:
+            return path.rstrip("/") or "/"
+
+    class HashCache:
+        """
+        Content hashes of files, kept in a local JSON file: the hashes of the local files, that are valid while their
+        size and modification time are unchanged, and the hashes of the files transferred to or from Opal, that are
+        valid while their size and modification time in Opal are unchanged.
+        """
+
+        def __init__(self, path: str = None):
+            """
+            :param path: The JSON file path, None for a cache that is not persisted
+            """
+            self.path = path
+            self._lock = threading.Lock()
+            self._data = {"local": {}, "remote": {}}
+            if path and os.path.exists(path):
+                with open(path) as fp:
+                    self._data.update(json.load(fp))
+
+        @classmethod
+        def hash_file(cls, file) -> str:
+            """
+            Compute the SHA-256 hash of a file content, read by chunks.
+
+            :param file: The file path or binary file object
+            """
+            if isinstance(file, str):
+                with open(file, "rb") as fp:
+                    return cls.hash_file(fp)
+            digest = hashlib.sha256()
+            for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                digest.update(chunk)
+            return digest.hexdigest()
+
+        def local_hash(self, file: str) -> str:
+            """
+            Get the content hash of a local file, computed only if the file changed since it was last hashed.
+            """
+            stat = os.stat(file)
+            with self._lock:
+                entry = self._data["local"].get(os.path.abspath(file))
+            if entry and entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+                return entry["sha256"]
+            digest = self.hash_file(file)
+            self.set_local(file, stat, digest)
+            return digest
+
+        def set_local(self, file: str, stat: os.stat_result, digest: str):
+            with self._lock:
+                self._data["local"][os.path.abspath(file)] = {
+                    "size": stat.st_size,
+                    "mtime": stat.st_mtime,
+                    "sha256": digest,
+                }
+
+        def remote_hash(self, info: dict) -> str | None:
+            """
+            Get the content hash of an Opal file, if it is unchanged since it was transferred.
+            """
+            with self._lock:
+                entry = self._data["remote"].get(info["path"])
+            if entry and (entry["size"], entry["lastModifiedTime"]) == (info.get("size"), info.get("lastModifiedTime")):
+                return entry["sha256"]
+            return None
+
+        def set_remote(self, info: dict, digest: str):
+            with self._lock:
+                self._data["remote"][info["path"]] = {
+                    "size": info.get("size"),
+                    "lastModifiedTime": info.get("lastModifiedTime"),
+                    "sha256": digest,
+                }
+
+        def save(self):
+            if not self.path:
+                return
+            with self._lock:
+                # atomic replacement, the cache file is never partially written
+                with open(f"{self.path}.tmp", "w") as fp:
+                    json.dump(self._data, fp)
+                os.replace(f"{self.path}.tmp", self.path)
+
+    class RangeNotSupportedError(Exception):
+        """
+        Range requests are not supported by the server.
+        """
+
     class OpalFile:
         """
         File on Opal file system
@@ -210,9 +1115,263 @@ class FileService:
             return f"/files{self.path}"
 
         def make_bundle_options(self, download_password):
-            options = {
-                "paths": [self.path]
-            }
+            options = {"paths": [self.path]}
             if download_password:
                 options["password"] = download_password
             return options
+
+
+class FileDownloadCommand:
+    """
+    Download files in parallel.
+    """
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """
+        Add file download command specific options
+        """
+        parser.add_argument(
+            "paths",
+            nargs="+",
+            help="File or folder paths in Opal file system, or glob patterns (e.g. '/projects/*/export/*.csv').",
+        )
+        parser.add_argument("--output", "-out", required=True, help="Local directory where the files are downloaded.")
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of concurrent file downloads (default is 4).",
+        )
+        parser.add_argument(
+            "--segments",
+            "-sg",
+            type=int,
+            default=1,
+            help="Number of ranged segments of a file download, downloaded in parallel (default is 1).",
+        )
+        parser.add_argument(
+            "--retries",
+            "-rs",
+            type=int,
+            default=3,
+            help="Maximum number of retries of a file download, after an interruption (default is 3).",
+        )
+        parser.add_argument(
+            "--json",
+            "-j",
+            action="store_true",
+            help="Pretty JSON formatting of the response",
+        )
+
+    @classmethod
+    def do_command(cls, args):
+        """
+        Execute file download command
+        """
+        # Build and send request
+        client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
+        try:
+            res = FileService(client, args.verbose).download_files(
+                args.paths, args.output, args.max_workers, args.segments, args.retries
+            )
+            core.Formatter.print_json(res, args.json)
+        finally:
+            client.close()
+
+
+class ZipStreamExtractor:
+    """
+    Extract the entries of a zip archive while it is read, from its local file headers, without seeking the
+    central directory at the end of the archive. Stored and deflated entries are supported, including the ones
+    which sizes are written after their content (data descriptor) if deflated, as well as the entries encrypted
+    with the traditional zip encryption.
+    """
+
+    LOCAL_HEADER = b"PK\x03\x04"
+    DATA_DESCRIPTOR = b"PK\x07\x08"
+
+    def __init__(self, directory: str, password: str = None):
+        """
+        :param directory: The local directory where the entries are extracted
+        :param password: The password of the encrypted entries
+        """
+        self.directory = directory
+        self.password = password.encode("utf-8") if password else None
+        self._chunks = None
+        self._buffer = b""
+
+    def extract(self, chunks) -> list:
+        """
+        Extract the zip archive entries.
+
+        :param chunks: An iterable of bytes, the zip archive content
+        :return: The extracted files (name and size)
+        :raises Exception: If an entry cannot be extracted
+        """
+        self._chunks = iter(chunks)
+        self._buffer = b""
+        files = []
+        while self._read(4) == self.LOCAL_HEADER:
+            entry = self._extract_entry()
+            if entry is not None:
+                files.append(entry)
+        # central directory is not needed, drain the stream
+        for _ in self._chunks:
+            pass
+        return files
+
+    def _extract_entry(self) -> dict | None:
+        _, flags, method, mtime, mdate, crc, csize, usize, name_len, extra_len = struct.unpack(
+            "<HHHHHIIIHH", self._read(26)
+        )
+        name = self._read(name_len).decode("utf-8" if flags & 0x800 else "cp437")
+        extra = self._read(extra_len)
+        zip64 = False
+        # zip64 sizes are in the extra field
+        pos = 0
+        while pos + 4 <= len(extra):
+            tag, size = struct.unpack("<HH", extra[pos : pos + 4])
+            if tag == 0x0001:
+                zip64 = True
+                values = list(struct.unpack(f"<{size // 8}Q", extra[pos + 4 : pos + 4 + size // 8 * 8]))
+                if usize == 0xFFFFFFFF and values:
+                    usize = values.pop(0)
+                if csize == 0xFFFFFFFF and values:
+                    csize = values.pop(0)
+            pos += 4 + size
+
+        target = os.path.realpath(os.path.join(self.directory, name))
+        if os.path.commonpath([target, os.path.realpath(self.directory)]) != os.path.realpath(self.directory):
+            raise Exception(f"Zip entry is outside of the extraction directory: {name}")
+        if name.endswith("/"):
+            os.makedirs(target, exist_ok=True)
+            return None
+        if method == 99:
+            raise Exception(f"AES encrypted zip entry cannot be extracted while streamed: {name}")
+        if method not in (0, 8):
+            raise Exception(f"Unsupported compression method {method} of zip entry: {name}")
+        descriptor = flags & 0x08
+        # sizes may be known even if a data descriptor follows the content
+        unknown_size = descriptor and csize == 0 and usize == 0
+        if unknown_size and method == 0:
+            raise Exception(f"Stored zip entry of unknown size cannot be extracted while streamed: {name}")
+
+        decrypter = None
+        if flags & 0x01:
+            if not self.password:
+                raise Exception(f"Zip entry is encrypted, a password is required: {name}")
+            decrypter = _ZipDecrypter(self.password)
+            header = decrypter.decrypt(self._read(12))
+            # the last byte of the encryption header is a password check value
+            if header[11] != ((mtime >> 8) if descriptor else (crc >> 24)):
+                raise Exception(f"Bad password for zip entry: {name}")
+            csize -= 12
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        decompressor = zlib.decompressobj(-zlib.MAX_WBITS) if method == 8 else None
+        remaining = None if unknown_size else csize
+        checksum = 0
+        size = 0
+        with open(f"{target}.part", "wb") as fp:
+            while remaining is None or remaining > 0:
+                raw = self._read_chunk(remaining)
+                if not raw:
+                    raise Exception(f"Zip archive is truncated: {name}")
+                if remaining is not None:
+                    remaining -= len(raw)
+                data = decrypter.decrypt(raw) if decrypter else raw
+                if decompressor:
+                    data = decompressor.decompress(data)
+                    if decompressor.eof:
+                        # bytes read beyond the entry content are given back, before being decrypted
+                        unused = len(decompressor.unused_data)
+                        if unused:
+                            self._buffer = raw[-unused:] + self._buffer
+                        remaining = 0
+                fp.write(data)
+                checksum = zlib.crc32(data, checksum)
+                size += len(data)
+            if decompressor:
+                data = decompressor.flush()
+                fp.write(data)
+                checksum = zlib.crc32(data, checksum)
+                size += len(data)
+        if descriptor:
+            # the data descriptor signature is optional
+            value = self._read(4)
+            if value == self.DATA_DESCRIPTOR:
+                value = self._read(4)
+            crc = struct.unpack("<I", value)[0]
+            self._read(16 if zip64 else 8)
+        if checksum != crc:
+            os.remove(f"{target}.part")
+            raise Exception(f"Bad CRC-32 for zip entry: {name}")
+        os.replace(f"{target}.part", target)
+        # MS-DOS date and time, in local time
+        date = ((mdate >> 9) + 1980, (mdate >> 5) & 0xF, mdate & 0x1F)
+        timestamp = time.mktime(date + (mtime >> 11, (mtime >> 5) & 0x3F, (mtime & 0x1F) * 2, 0, 0, -1))
+        os.utime(target, (timestamp, timestamp))
+        return {"name": name, "size": size}
+
+    def _read_chunk(self, limit: int = None) -> bytes:
+        """
+        Read the next chunk of bytes, at most limit bytes if provided.
+        """
+        if not self._buffer:
+            self._buffer = next(self._chunks, b"")
+        if limit is None or limit >= len(self._buffer):
+            chunk, self._buffer = self._buffer, b""
+        else:
+            chunk, self._buffer = self._buffer[:limit], self._buffer[limit:]
+        return chunk
+
+    def _read(self, size: int) -> bytes:
+        """
+        Read exactly size bytes, or less if the end of the stream is reached.
+        """
+        while len(self._buffer) < size:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                break
+            self._buffer += chunk
+        data, self._buffer = self._buffer[:size], self._buffer[size:]
+        return data
+
+
+class _ZipDecrypter:
+    """
+    Traditional PKWARE zip decryption.
+    """
+
+    CRC_TABLE = None
+
+    def __init__(self, password: bytes):
+        if _ZipDecrypter.CRC_TABLE is None:
+            table = []
+            for i in range(256):
+                crc = i
+                for _ in range(8):
+                    crc = (crc >> 1) ^ 0xEDB88320 if crc & 1 else crc >> 1
+                table.append(crc)
+            _ZipDecrypter.CRC_TABLE = table
+        self.keys = [0x12345678, 0x23456789, 0x34567890]
+        for c in password:
+            self._update(c)
+
+    def _update(self, c: int):
+        table = self.CRC_TABLE
+        key0 = (self.keys[0] >> 8) ^ table[(self.keys[0] ^ c) & 0xFF]
+        key1 = ((self.keys[1] + (key0 & 0xFF)) * 134775813 + 1) & 0xFFFFFFFF
+        key2 = (self.keys[2] >> 8) ^ table[(self.keys[2] ^ (key1 >> 24)) & 0xFF]
+        self.keys = [key0, key1, key2]
+
+    def decrypt(self, data: bytes) -> bytes:
+        result = bytearray(len(data))
+        for i, c in enumerate(data):
+            k = self.keys[2] | 2
+            c ^= ((k * (k ^ 1)) >> 8) & 0xFF
+            self._update(c)
+            result[i] = c
+        return bytes(result)
@@ -0,0 +1,188 @@
+"""
+Opal identifiers mappings, resolved locally.
+"""
+
+import obiba_opal.core as core
+import csv
+import io
+import itertools
+import sqlite3
+import tempfile
+import threading
+
+
+class IdentifierMap:
+    """
+    Local copy of an identifiers mapping, downloaded in bulk, to resolve many identifiers without
+    requesting Opal for each of them. The mapping is stored in a SQLite database, in memory or in a
+    file that can be reused between runs, and can be shared between threads.
+    """
+
+    def __init__(
+        self, client: core.OpalClient, map: str, type: str = "Participant", path: str = None, verbose: bool = False
+    ):
+        """
+        :param client: Opal connection object
+        :param map: The mapping name
+        :param type: Entity type (e.g. Participant)
+        :param path: The SQLite database file of the local mapping (default is in memory)
+        :param verbose: Verbose requests
+        """
+        self.client = client
+        self.map = map
+        self.type = type
+        self.verbose = verbose
+        self._lock = threading.RLock()
+        self.db = sqlite3.connect(path if path else ":memory:", check_same_thread=False)
+        self.db.execute("CREATE TABLE IF NOT EXISTS mapping (id TEXT PRIMARY KEY, mapped TEXT NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS mapping_mapped ON mapping (mapped)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+
+    def close(self):
+        with self._lock:
+            self.db.close()
+
+    def __len__(self):
+        with self._lock:
+            return self.db.execute("SELECT COUNT(*) FROM mapping").fetchone()[0]
+
+    def download(self) -> int:
+        """
+        Download the whole mapping, streamed into the local store which content is replaced. A header row
+        in the export (first column named 'ID', or second column named after the mapping) is skipped.
+
+        :return: The number of identifiers in the mapping
+        """
+        last_update = self._get_last_update()
+        uri = core.UriBuilder(["identifiers", "mapping", self.map, "_export"]).query("type", self.type).build()
+        request = self.client.new_request()
+        request.fail_on_error().accept_text_csv()
+        if self.verbose:
+            request.verbose()
+
+        with tempfile.TemporaryFile() as spool:
+            request.get().resource(uri).stream().send(spool)
+            spool.seek(0)
+            reader = csv.reader(io.TextIOWrapper(spool, encoding="utf-8", newline=""))
+            first = next(reader, None)
+            rows = reader if first is None or self._is_header(first) else itertools.chain([first], reader)
+            with self._lock, self.db:
+                # the mapping is loaded aside, only the differences are applied to the local store
+                self.db.execute("CREATE TEMP TABLE IF NOT EXISTS export (id TEXT PRIMARY KEY, mapped TEXT NOT NULL)")
+                self.db.execute("DELETE FROM export")
+                self.db.executemany(
+                    "INSERT OR REPLACE INTO export (id, mapped) VALUES (?, ?)",
+                    ((row[0], row[1]) for row in rows if len(row) >= 2 and row[1]),
+                )
+                self.db.execute("DELETE FROM mapping WHERE id NOT IN (SELECT id FROM export)")
+                self.db.execute(
+                    "INSERT OR REPLACE INTO mapping (id, mapped) SELECT id, mapped FROM export "
+                    "EXCEPT SELECT id, mapped FROM mapping"
+                )
+                self.db.execute("DELETE FROM export")
+                self.db.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('lastUpdate', ?)", (last_update,))
+        return len(self)
+
+    def _is_header(self, row: list) -> bool:
+        return len(row) >= 2 and (row[0].upper() == "ID" or row[1] == self.map)
+
+    def refresh(self) -> bool:
+        """
+        Download the mapping only if the identifiers table was updated since the last download. Opal does not
+        export the identifiers changed since a given time, then the whole mapping is downloaded again, but only the
+        added, modified and removed identifiers are written in the local store.
+
+        :return: True if the mapping was downloaded
+        """
+        with self._lock:
+            row = self.db.execute("SELECT value FROM meta WHERE key = 'lastUpdate'").fetchone()
+        if row is not None and row[0] is not None and row[0] == self._get_last_update():
+            return False
+        self.download()
+        return True
+
+    def resolve(self, ids, reverse: bool = False, batch_size: int = 500):
+        """
+        Resolve identifiers by batches.
+
+        :param ids: An iterable of identifiers
+        :param reverse: Resolve the mapped identifiers into system identifiers
+        :param batch_size: The number of identifiers looked up at once
+        :return: A generator of (identifier, resolved identifier) tuples, the resolved identifier being
+            None when the identifier is not in the mapping
+        """
+        source, target = ("mapped", "id") if reverse else ("id", "mapped")
+        batch = []
+        for id in ids:
+            batch.append(id)
+            if len(batch) == batch_size:
+                yield from self._resolve_batch(batch, source, target)
+                batch = []
+        if batch:
+            yield from self._resolve_batch(batch, source, target)
+
+    def resolve_to_csv(self, ids, output, reverse: bool = False, sep: str = ","):
+        """
+        Resolve identifiers and write them in CSV format.
+
+        :param ids: An iterable of identifiers
+        :param output: The output stream
+        :param reverse: Resolve the mapped identifiers into system identifiers
+        :param sep: The CSV separator
+        """
+        writer = csv.writer(output, delimiter=sep)
+        writer.writerow(["mapped", "id"] if reverse else ["id", "mapped"])
+        writer.writerows(self.resolve(ids, reverse))
+
+    def resolve_to_parquet(self, ids, path: str, reverse: bool = False, batch_size: int = 100000):
+        """
+        Resolve identifiers and write them in a Parquet file (requires pyarrow).
+
+        :param ids: An iterable of identifiers
+        :param path: The Parquet file path
+        :param reverse: Resolve the mapped identifiers into system identifiers
+        :param batch_size: The number of identifiers per row group
+        """
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError:
+            raise Exception("Writing Parquet files requires pyarrow: pip install pyarrow") from None
+        names = ["mapped", "id"] if reverse else ["id", "mapped"]
+        schema = pa.schema([(names[0], pa.string()), (names[1], pa.string())])
+        with pq.ParquetWriter(path, schema) as writer:
+            rows = []
+            for row in self.resolve(ids, reverse):
+                rows.append(row)
+                if len(rows) == batch_size:
+                    writer.write_table(self._to_arrow(pa, schema, rows))
+                    rows = []
+            if rows:
+                writer.write_table(self._to_arrow(pa, schema, rows))
+
+    def _to_arrow(self, pa, schema, rows: list):
+        return pa.Table.from_arrays(
+            [pa.array([r[0] for r in rows], pa.string()), pa.array([r[1] for r in rows], pa.string())],
+            schema=schema,
+        )
+
+    def _resolve_batch(self, batch: list, source: str, target: str):
+        placeholders = ",".join("?" * len(batch))
+        # source and target are column names, not user input
+        query = f"SELECT {source}, {target} FROM mapping WHERE {source} IN ({placeholders})"
+        with self._lock:
+            resolved = dict(self.db.execute(query, batch).fetchall())
+        for id in batch:
+            yield id, resolved.get(id)
+
+    def _get_last_update(self) -> str:
+        """
+        Get the last update timestamp of the identifiers table of the entity type.
+        """
+        request = self.client.new_request()
+        request.fail_on_error().accept_json()
+        if self.verbose:
+            request.verbose()
+        table = request.get().resource(core.UriBuilder(["identifiers", "table", self.type]).build()).send().from_json()
+        timestamps = table.get("timestamps", {}) if table else {}
+        return timestamps.get("lastUpdate")
@@ -4,8 +4,21 @@ Opal datasource plugin import.
 
 import obiba_opal.core as core
 import obiba_opal.io as io
+from obiba_opal.dictionary import DictionaryService
+from obiba_opal.file import FileService
+from obiba_opal.system import TaskService
+import codecs
+import csv
+import hashlib
+import itertools
+import os
+import re
 import sys
 import json
+import tempfile
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 
 
 class ImportPluginCommand:
@@ -156,6 +169,36 @@ class ImportCSVCommand:
             'When not specified, "text" is the default.',
         )
         parser.add_argument("--type", "-ty", required=True, help="Entity type (e.g. Participant)")
+        parser.add_argument(
+            "--local",
+            "-lo",
+            required=False,
+            help="Local CSV file to import: it is split in chunks of rows that are uploaded into the --path "
+            "folder of the Opal filesystem and imported in parallel into the same table.",
+        )
+        parser.add_argument(
+            "--chunk-rows",
+            "-cr",
+            type=int,
+            default=100000,
+            help="Number of rows per chunk of the local CSV file (default is 100000).",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=2,
+            help="Maximum number of chunks being uploaded or imported concurrently (default is 2).",
+        )
+        parser.add_argument(
+            "--validate",
+            "-va",
+            action="store_true",
+            help="Validate the --local CSV file and report the inferred column value types and the suggested "
+            "import configuration, without importing it.",
+        )
+        # resume an interrupted import of the --local CSV file
+        io.add_checkpoint_arguments(parser)
 
         # non specific import arguments
         io.add_import_arguments(parser)
@@ -165,9 +208,38 @@ class ImportCSVCommand:
         """
         Execute import data command
         """
+        if getattr(args, "validate", False):
+            # local validation, no request
+            if not args.local:
+                raise ValueError("A local CSV file is required for validation.")
+            res = CSVValidator(args.local, args.characterSet, args.separator, args.quote, args.firstRow).validate()
+            core.Formatter.print_json(res, args.json)
+            return
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            if getattr(args, "local", None):
+                res = cls(client, args.verbose).import_local_data(
+                    args.local,
+                    args.path,
+                    args.destination,
+                    args.characterSet,
+                    args.separator,
+                    args.quote,
+                    args.firstRow,
+                    args.valueType,
+                    args.type,
+                    args.tables[0] if args.tables else None,
+                    args.incremental,
+                    args.identifiers,
+                    args.policy,
+                    args.merge,
+                    chunk_rows=args.chunk_rows,
+                    max_workers=args.max_workers,
+                    checkpoint=io.ImportCheckpoint.from_args(args, f"{args.local}.checkpoint.json"),
+                )
+                core.Formatter.print_json(res, args.json)
+                return
             res = cls(client, args.verbose).import_data(
                 args.path,
                 args.destination,
@@ -248,6 +320,170 @@ class ImportCSVCommand:
         response = importer.submit(extension_factory)
         return response.from_json()
 
+    def import_local_data(
+        self,
+        local: str,
+        folder: str,
+        destination: str,
+        characterSet: str = None,
+        separator: str = None,
+        quote: str = None,
+        firstRow: int = None,
+        valueType: str = None,
+        type: str = None,
+        table: str = None,
+        incremental: bool = None,
+        identifiers: str = None,
+        policy: str = None,
+        merge: bool = None,
+        chunk_rows: int = 100000,
+        max_workers: int = 2,
+        retries: int = 2,
+        keep_chunks: bool = False,
+        checkpoint: io.ImportCheckpoint = None,
+    ) -> dict:
+        """
+        Import a local CSV file: it is split in chunks of rows (each with the header), that are uploaded
+        and imported into the same destination table as soon as they are ready, so that the splitting,
+        the uploads and the imports overlap. The first chunk is imported alone, as it creates the destination
+        table. Failed uploads and chunk imports are retried, a chunk that still fails is reported as failed.
+
+        :param local: The local CSV file path
+        :param folder: The Opal file system folder where the chunks are uploaded
+        :param destination: The destination project
+        :param characterSet: The character set
+        :param separator: The separator char
+        :param quote: The quote char
+        :param firstRow: The row of the header in the local file
+        :param valueType: Default value type (text, integer, decimal, boolean
+                         etc.). When not specified, "text" is the default
+        :param type: Entity type (e.g. Participant)
+        :param table: The destination table name (default is the local file name)
+        :param incremental: Incremental import (new and updated value sets)
+        :param identifiers: The name of the ID mapping
+        :param policy: The ID mapping policy: "required" (each identifiers must
+                      be mapped prior importation, default), "ignore" (ignore
+                      unknown identifiers), "generate" (generate a system
+                      identifier for each unknown identifier)
+        :param merge: Merge imported data dictionary with the destination one
+                     (default is false, i.e. data dictionary is overridden)
+        :param chunk_rows: The number of rows per chunk
+        :param max_workers: The maximum number of chunks being uploaded or imported concurrently
+        :param retries: The number of retries of a failed chunk upload or import
+        :param keep_chunks: Keep the uploaded chunks in the Opal file system
+        :param checkpoint: The checkpoint of the chunk imports, to resume an interrupted import: a chunk is
+            identified by the local file size and modification time, the chunk size and its index
+        :return: The import report, with the status of each chunk
+        """
+        table_ = table if table else os.path.splitext(os.path.basename(local))[0]
+        # a modified local file is not resumed from the chunks of its previous version
+        stat = os.stat(local)
+        source = f"{stat.st_size}:{stat.st_mtime_ns}:{chunk_rows}"
+        file_service = FileService(self.client, self.verbose)
+        task_service = TaskService(self.client, self.verbose)
+        backoff = core.AdaptiveBackoff(retries=retries)
+        # bounds the number of chunks in-flight, and then the local disk usage
+        slots = threading.BoundedSemaphore(max_workers)
+
+        def process(index: int, chunk: str, rows: int) -> dict:
+            start = time.time()
+            try:
+                return import_chunk(index, chunk, rows)
+            except Exception as e:
+                error = e.error if isinstance(e, core.HTTPError) else str(e)
+                return {
+                    "index": index,
+                    "rows": rows,
+                    "status": "FAILED",
+                    "error": error,
+                    "duration": time.time() - start,
+                }
+            finally:
+                slots.release()
+
+        def import_chunk(index: int, chunk: str, rows: int) -> dict:
+            start = time.time()
+            remote = f"{folder.rstrip('/')}/{os.path.basename(chunk)}"
+            key = f"{table_}:{source}:{index}:{rows}"
+            resumed = checkpoint.attach(key, task_service) if checkpoint else None
+            if resumed is not None:
+                os.remove(chunk)
+                if resumed["resumed"] == "attached" and not keep_chunks:
+                    # the chunk was uploaded by the interrupted import
+                    file_service.delete_file(remote)
+                return {
+                    "index": index,
+                    "path": remote,
+                    "rows": rows,
+                    "task": resumed["task"],
+                    "status": resumed["status"],
+                    "attempts": 0,
+                    "duration": time.time() - start,
+                    "resumed": resumed["resumed"],
+                }
+            try:
+                backoff.call(file_service.upload_file, chunk, folder)
+            finally:
+                os.remove(chunk)
+            try:
+                attempt = 0
+                status = None
+                while status != "SUCCEEDED" and attempt <= retries:
+                    attempt += 1
+                    task = backoff.call(
+                        self.import_data,
+                        remote,
+                        destination,
+                        characterSet=characterSet,
+                        separator=separator,
+                        quote=quote,
+                        valueType=valueType,
+                        type=type,
+                        tables=[table_],
+                        incremental=incremental,
+                        identifiers=identifiers,
+                        policy=policy,
+                        merge=merge,
+                    )
+                    if checkpoint:
+                        checkpoint.update(key, task=task["id"], status=None)
+                    status = task_service.wait_task(task["id"], True)
+                    if checkpoint:
+                        checkpoint.update(key, status=status)
+                return {
+                    "index": index,
+                    "path": remote,
+                    "rows": rows,
+                    "task": task["id"],
+                    "status": status,
+                    "attempts": attempt,
+                    "duration": time.time() - start,
+                }
+            finally:
+                if not keep_chunks:
+                    file_service.delete_file(remote)
+
+        with tempfile.TemporaryDirectory() as workdir, ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = []
+            created = False
+            chunks = CSVChunker(local, characterSet, separator, quote, firstRow).split(workdir, table_, chunk_rows)
+            for index, (chunk, rows) in enumerate(chunks):
+                slots.acquire()
+                futures.append(executor.submit(process, index, chunk, rows))
+                if not created:
+                    # the destination table is created by the first imported chunk, the others are imported after
+                    created = futures[-1].result()["status"] == "SUCCEEDED"
+            results = [future.result() for future in futures]
+
+        failed = [r for r in results if r["status"] != "SUCCEEDED"]
+        return {
+            "destination": destination,
+            "table": table_,
+            "rows": sum(r["rows"] for r in results),
+            "status": "FAILED" if failed else "SUCCEEDED",
+            "chunks": results,
+        }
+
     class OpalExtensionFactory(io.OpalImporter.ExtensionFactoryInterface):
         def __init__(
             self,
@@ -312,6 +548,421 @@ class ImportCSVCommand:
             factory["Magma.CsvDatasourceFactoryDto.params"] = csv_factory
 
 
+class CSVChunker:
+    """
+    Split a CSV file in chunks of rows, each chunk having the header row.
+    """
+
+    def __init__(
+        self, path: str, characterSet: str = None, separator: str = None, quote: str = None, firstRow: int = None
+    ):
+        self.path = path
+        self.encoding = characterSet if characterSet else "utf-8"
+        self.separator = separator if separator else ","
+        self.quote = quote if quote else '"'
+        self.firstRow = firstRow if firstRow else 1
+
+    def split(self, folder: str, name: str, rows: int):
+        """
+        Write the chunks in a folder, one at a time. Parsing the CSV rows ensures that multi-line
+        quoted values are not split.
+
+        :param folder: The folder where the chunk files are written
+        :param name: The chunk file name prefix
+        :param rows: The maximum number of rows per chunk
+        :return: A generator of the chunk file path and number of rows, yielded when the chunk is complete
+        """
+        with open(self.path, newline="", encoding=self.encoding) as f:
+            reader = csv.reader(f, delimiter=self.separator, quotechar=self.quote)
+            for _ in range(self.firstRow - 1):
+                next(reader, None)
+            header = next(reader, None)
+            if header is None:
+                return
+            index = 0
+            while True:
+                batch = itertools.islice(reader, rows)
+                first = next(batch, None)
+                if first is None:
+                    return
+                path = os.path.join(folder, f"{name}-{index:05d}.csv")
+                with open(path, "w", newline="", encoding=self.encoding) as chunk:
+                    writer = csv.writer(chunk, delimiter=self.separator, quotechar=self.quote)
+                    writer.writerow(header)
+                    writer.writerow(first)
+                    count = 1
+                    for row in batch:
+                        writer.writerow(row)
+                        count += 1
+                yield path, count
+                index += 1
+
+
+class CSVValidator:
+    """
+    Validate a local CSV file before importing it: character set, separator and quote, header row,
+    number of fields per row, duplicate entity identifiers (first column). The value type of each
+    column is inferred. The file is streamed twice: the character set is checked first, then the rows
+    are parsed. Memory usage grows with the number of entities, as an 8 bytes digest of each identifier
+    is kept to detect the duplicates (a digest collision, very unlikely, would be reported as a duplicate).
+    """
+
+    VALUE_TYPES = {
+        "integer": re.compile(r"^[-+]?\d+$"),
+        "decimal": re.compile(r"^[-+]?(\d+\.?\d*|\.\d+)([eE][-+]?\d+)?$"),
+        "boolean": re.compile(r"^(true|false|TRUE|FALSE|True|False)$"),
+        "date": re.compile(r"^\d{4}-\d{2}-\d{2}$"),
+        "datetime": re.compile(r"^\d{4}-\d{2}-\d{2}[T ]\d{2}:\d{2}(:\d{2}(\.\d+)?)?(Z|[-+]\d{2}:?\d{2})?$"),
+    }
+
+    def __init__(
+        self, path: str, characterSet: str = None, separator: str = None, quote: str = None, firstRow: int = None
+    ):
+        self.path = path
+        self.characterSet = characterSet
+        self.separator = separator
+        self.quote = quote
+        self.firstRow = firstRow if firstRow else 1
+
+    def validate(self, max_errors: int = 100) -> dict:
+        """
+        Validate the CSV file.
+
+        :param max_errors: The maximum number of reported errors
+        :return: The validation report, with the inferred columns value types and the suggested
+            import configuration
+        """
+        errors = []
+        warnings = []
+
+        def error(line, message):
+            if len(errors) < max_errors:
+                errors.append({"line": line, "message": message})
+
+        encoding = self._check_encoding(error, warnings)
+        separator, quote = self._check_dialect(encoding, warnings)
+
+        columns = []
+        rows = 0
+        duplicates = 0
+        ids = set()
+        with open(self.path, newline="", encoding=encoding, errors="replace") as f:
+            reader = csv.reader(f, delimiter=separator, quotechar=quote)
+            for _ in range(self.firstRow - 1):
+                next(reader, None)
+            header = next(reader, None)
+            if not header:
+                error(self.firstRow, "Header row is missing")
+                header = []
+            if len(header) < 2:
+                error(self.firstRow, f"Header has less than 2 columns, check the separator: {separator!r}")
+            for name in [n for n in set(header) if header.count(n) > 1]:
+                error(self.firstRow, f"Duplicate column name: {name}")
+            if "" in header:
+                error(self.firstRow, "Empty column name")
+            columns = [
+                {"name": name, "valueType": None, "empty": 0, "types": list(self.VALUE_TYPES)} for name in header
+            ]
+
+            for row in reader:
+                rows += 1
+                line = reader.line_num
+                if len(row) != len(header):
+                    error(line, f"Expected {len(header)} fields, found {len(row)}")
+                    continue
+                if not row[0]:
+                    error(line, "Empty entity identifier")
+                else:
+                    digest = hashlib.blake2b(row[0].encode("utf-8"), digest_size=8).digest()
+                    if digest in ids:
+                        duplicates += 1
+                        error(line, f"Duplicate entity identifier: {row[0]}")
+                    else:
+                        ids.add(digest)
+                for column, value in zip(columns[1:], row[1:], strict=True):
+                    if value == "":
+                        column["empty"] += 1
+                    elif column["types"]:
+                        column["types"] = [t for t in column["types"] if self.VALUE_TYPES[t].match(value)]
+
+        for column in columns:
+            types = column.pop("types")
+            column["valueType"] = types[0] if types and column["empty"] < rows else "text"
+        if columns:
+            # entity identifiers
+            columns[0]["valueType"] = "text"
+
+        value_types = {c["valueType"] for c in columns[1:]}
+        return {
+            "path": self.path,
+            "valid": len(errors) == 0,
+            "rows": rows,
+            "entities": len(ids),
+            "duplicates": duplicates,
+            "columns": columns,
+            "errors": errors,
+            "warnings": warnings,
+            "config": {
+                "characterSet": encoding,
+                "separator": separator,
+                "quote": quote,
+                "firstRow": self.firstRow,
+                "valueType": value_types.pop() if len(value_types) == 1 else "text",
+            },
+        }
+
+    def _check_encoding(self, error, warnings) -> str:
+        """
+        Check that the file can be decoded with the character set, or guess it. The line of the first
+        invalid character is counted on the decoded text, not on the raw bytes.
+        """
+        with open(self.path, "rb") as f:
+            head = f.read(4)
+        if self.characterSet:
+            encoding = self.characterSet
+        elif head.startswith(codecs.BOM_UTF8):
+            encoding = "utf-8-sig"
+        elif head.startswith(codecs.BOM_UTF16_LE) or head.startswith(codecs.BOM_UTF16_BE):
+            encoding = "utf-16"
+        else:
+            encoding = "utf-8"
+        decoder = codecs.getincrementaldecoder(encoding)()
+        line = 1
+        with open(self.path, "rb") as f:
+            # the last empty block flushes an incomplete character sequence
+            for block in itertools.chain(iter(lambda: f.read(1024 * 1024), b""), [b""]):
+                try:
+                    text = decoder.decode(block, final=not block)
+                except UnicodeDecodeError as e:
+                    # the failing input includes the bytes left undecoded from the previous block
+                    line += e.object[: e.start].decode(e.encoding, errors="replace").count("\n")
+                    if self.characterSet:
+                        error(line, f"Invalid {encoding} character: {e.reason}")
+                        return encoding
+                    warnings.append(f"Not a {encoding} file (line {line}: {e.reason}), ISO-8859-1 is assumed")
+                    return "ISO-8859-1"
+                line += text.count("\n")
+        return encoding
+
+    def _check_dialect(self, encoding: str, warnings) -> tuple:
+        """
+        Check the separator and quote characters against the sniffed ones, or guess them.
+        """
+        with open(self.path, newline="", encoding=encoding, errors="replace") as f:
+            sample = f.read(64 * 1024)
+        try:
+            dialect = csv.Sniffer().sniff(sample, delimiters=",;\t|")
+            sniffed = (dialect.delimiter, dialect.quotechar)
+        except csv.Error:
+            # inconsistent sample, use the most frequent delimiter of the header
+            lines = sample.splitlines()
+            header = lines[self.firstRow - 1] if len(lines) >= self.firstRow else ""
+            sniffed = (max(",;\t|", key=header.count), '"')
+        separator = self.separator if self.separator else sniffed[0]
+        quote = self.quote if self.quote else sniffed[1]
+        if self.separator and self.separator != sniffed[0]:
+            warnings.append(f"Separator {self.separator!r} differs from the detected one: {sniffed[0]!r}")
+        return separator, quote
+
+
+class ImportDataFrameCommand:
+    """
+    Import a pandas DataFrame or an Arrow Table, without intermediate local file.
+    """
+
+    # pandas dtype kinds
+    VALUE_TYPES = {"i": "integer", "u": "integer", "f": "decimal", "b": "boolean", "M": "datetime"}
+
+    def __init__(self, client: core.OpalClient, verbose: bool = False):
+        self.client = client
+        self.verbose = verbose
+
+    def import_data(
+        self,
+        data,
+        destination: str,
+        table: str,
+        type: str = "Participant",
+        idColumn: str = None,
+        folder: str = "/tmp",
+        dictionary: bool = True,
+        incremental: bool = None,
+        identifiers: str = None,
+        policy: str = None,
+        merge: bool = None,
+        chunk_rows: int = 10000,
+        keep: bool = False,
+    ) -> dict:
+        """
+        Import a data frame into a table. The data frame is serialized in CSV format, chunk of rows by chunk
+        of rows, while being uploaded in the Opal file system, and the uploaded file is then imported. The
+        table's dictionary is created, or completed, with the value types of the columns inferred from their
+        data types, before the import.
+
+        :param data: The pandas DataFrame or pyarrow Table
+        :param destination: The destination project
+        :param table: The destination table name
+        :param type: Entity type (e.g. Participant)
+        :param idColumn: The column of the entity identifiers (default is the DataFrame index, if it is not a
+            default range index, otherwise the first column)
+        :param folder: The Opal file system folder where the CSV file is uploaded
+        :param dictionary: Create or update the table's dictionary from the data types before importing
+        :param incremental: Incremental import (new and updated value sets)
+        :param identifiers: The name of the ID mapping
+        :param policy: The ID mapping policy: "required" (each identifiers must
+                      be mapped prior importation, default), "ignore" (ignore
+                      unknown identifiers), "generate" (generate a system
+                      identifier for each unknown identifier)
+        :param merge: Merge imported data dictionary with the destination one
+                     (default is false, i.e. data dictionary is overridden)
+        :param chunk_rows: The number of rows serialized at once, that bounds the memory overhead
+        :param keep: Keep the uploaded CSV file in the Opal file system
+        :return: The import report
+        """
+        if hasattr(data, "to_batches"):
+            variables = self.get_arrow_variables(data, type, idColumn)
+            chunks = self._arrow_chunks(data, idColumn, chunk_rows)
+            rows = data.num_rows
+        elif hasattr(data, "to_csv"):
+            variables = self.get_pandas_variables(data, type, idColumn)
+            chunks = self._pandas_chunks(data, idColumn, chunk_rows)
+            rows = len(data)
+        else:
+            raise ValueError("Data must be a pandas DataFrame or a pyarrow Table")
+
+        report = {"destination": destination, "table": table, "rows": rows}
+        if dictionary:
+            report["dictionary"] = self._update_dictionary(destination, table, type, variables)
+
+        file_service = FileService(self.client, self.verbose)
+        filename = f"{table}.csv"
+        remote = f"{folder.rstrip('/')}/{filename}"
+        file_service.upload_stream(chunks, filename, folder)
+        try:
+            task = ImportCSVCommand(self.client, self.verbose).import_data(
+                remote,
+                destination,
+                characterSet="UTF-8",
+                separator=",",
+                quote='"',
+                type=type,
+                tables=[table],
+                incremental=incremental,
+                identifiers=identifiers,
+                policy=policy,
+                merge=merge,
+            )
+            report["task"] = task["id"]
+            report["status"] = TaskService(self.client, self.verbose).wait_task(task["id"], True)
+        finally:
+            if not keep:
+                file_service.delete_file(remote)
+        return report
+
+    def get_pandas_variables(self, data, type: str = "Participant", idColumn: str = None) -> list:
+        """
+        Make the variables of the columns of a pandas DataFrame, with value types inferred from the data types.
+
+        :param data: The pandas DataFrame
+        :param type: Entity type (e.g. Participant)
+        :param idColumn: The column of the entity identifiers, that is not a variable
+        """
+        id_column = self._get_pandas_id_column(data, idColumn)
+        variables = []
+        for name, dtype in data.dtypes.items():
+            if name == id_column:
+                continue
+            variable = {"name": str(name), "entityType": type, "isRepeatable": False}
+            if str(dtype) == "category":
+                variable["valueType"] = self.VALUE_TYPES.get(dtype.categories.dtype.kind, "text")
+                variable["categories"] = [{"name": str(c), "isMissing": False} for c in dtype.categories]
+            else:
+                variable["valueType"] = self.VALUE_TYPES.get(dtype.kind, "text")
+            variables.append(variable)
+        return variables
+
+    def get_arrow_variables(self, data, type: str = "Participant", idColumn: str = None) -> list:
+        """
+        Make the variables of the columns of an Arrow Table, with value types inferred from the data types.
+
+        :param data: The pyarrow Table
+        :param type: Entity type (e.g. Participant)
+        :param idColumn: The column of the entity identifiers, that is not a variable
+        """
+        import pyarrow as pa
+
+        id_column = idColumn if idColumn else data.schema.names[0]
+        variables = []
+        for field in data.schema:
+            if field.name == id_column:
+                continue
+            field_type = field.type.value_type if pa.types.is_dictionary(field.type) else field.type
+            if pa.types.is_integer(field_type):
+                value_type = "integer"
+            elif pa.types.is_floating(field_type) or pa.types.is_decimal(field_type):
+                value_type = "decimal"
+            elif pa.types.is_boolean(field_type):
+                value_type = "boolean"
+            elif pa.types.is_date(field_type):
+                value_type = "date"
+            elif pa.types.is_timestamp(field_type):
+                value_type = "datetime"
+            else:
+                value_type = "text"
+            variables.append({"name": field.name, "entityType": type, "valueType": value_type, "isRepeatable": False})
+        return variables
+
+    def _get_pandas_id_column(self, data, idColumn: str = None):
+        if idColumn:
+            return idColumn
+        if type(data.index).__name__ != "RangeIndex":
+            # the index is the identifiers column, not a variable
+            return None
+        return data.columns[0] if len(data.columns) else None
+
+    def _pandas_chunks(self, data, idColumn: str, chunk_rows: int):
+        use_index = not idColumn and type(data.index).__name__ != "RangeIndex"
+        columns = list(data.columns)
+        if idColumn:
+            columns = [idColumn] + [c for c in columns if c != idColumn]
+        reorder = columns != list(data.columns)
+        # at least one chunk, for the header
+        for start in range(0, max(len(data), 1), chunk_rows):
+            frame = data.iloc[start : start + chunk_rows]
+            if reorder:
+                frame = frame[columns]
+            yield frame.to_csv(
+                index=use_index,
+                index_label=data.index.name if data.index.name else "id",
+                header=start == 0,
+                lineterminator="\n",
+            ).encode("utf-8")
+
+    def _arrow_chunks(self, data, idColumn: str, chunk_rows: int):
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        if idColumn and data.schema.names[0] != idColumn:
+            data = data.select([idColumn] + [n for n in data.schema.names if n != idColumn])
+        header = True
+        for batch in data.to_batches(max_chunksize=chunk_rows):
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(batch, sink, pacsv.WriteOptions(include_header=header))
+            header = False
+            yield sink.getvalue().to_pybytes()
+        if header:
+            sink = pa.BufferOutputStream()
+            pacsv.write_csv(data.slice(0, 0), sink)
+            yield sink.getvalue().to_pybytes()
+
+    def _update_dictionary(self, destination: str, table: str, type: str, variables: list) -> dict:
+        dico = DictionaryService(self.client, self.verbose)
+        if table in dico.get_datasource(destination).get("table", []):
+            return dico.apply(destination, table, variables)
+        dico.create_table(destination, table, type, variables)
+        return {"added": [v["name"] for v in variables], "modified": [], "unchanged": [], "missing": []}
+
+
 class ImportLimeSurveyCommand:
     """
     Import from LimeSurvey.
@@ -507,6 +1158,21 @@ class ImportOpalCommand:
             help="Remote personal access token (exclusive from user credentials)",
         )
         parser.add_argument("--rdatasource", "-rd", required=True, help="Remote datasource name")
+        parser.add_argument(
+            "--group-size",
+            "-gs",
+            type=int,
+            required=False,
+            help="Split the import in jobs of at most this number of tables (1 for one job per table), that are "
+            "submitted concurrently and retried independently. The default is a single job for all the tables.",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=2,
+            help="Maximum number of import jobs running concurrently, when split in jobs (default is 2).",
+        )
         # non specific import arguments
         io.add_import_arguments(parser)
 
@@ -520,6 +1186,25 @@ class ImportOpalCommand:
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            if getattr(args, "group_size", None):
+                res = cls(client, args.verbose).import_tables(
+                    args.ropal,
+                    args.rdatasource,
+                    args.ruser,
+                    args.rpassword,
+                    args.rtoken,
+                    args.destination,
+                    args.tables,
+                    args.incremental,
+                    args.limit,
+                    args.identifiers,
+                    args.policy,
+                    args.merge,
+                    group_size=args.group_size,
+                    max_workers=args.max_workers,
+                )
+                core.Formatter.print_json(res, args.json)
+                return
             res = cls(client, args.verbose).import_data(
                 args.ropal,
                 args.rdatasource,
@@ -591,6 +1276,79 @@ class ImportOpalCommand:
         response = importer.submit(extension_factory)
         return response.from_json()
 
+    def import_tables(
+        self,
+        ropal: str,
+        rdatasource: str,
+        ruser: str,
+        rpassword: str,
+        rtoken: str,
+        destination: str,
+        tables: list = None,
+        incremental: bool = None,
+        limit: int = None,
+        identifiers: str = None,
+        policy: str = None,
+        merge: bool = None,
+        group_size: int = 1,
+        max_workers: int = 2,
+        retries: int = 2,
+        checkpoint: io.ImportCheckpoint = None,
+    ) -> dict:
+        """
+        Import tables from a Opal server, with one job per table, or per group of tables. The remote datasource
+        is prepared once and the jobs are submitted concurrently, so that a slow table does not hold up the
+        others. The tables of a failed job, or of a job that could not be submitted, are retried individually.
+
+        :param ropal: Remote Opal server base url
+        :param rdatasource: Remote project's datasource name
+        :param ruser: Remote user name (exclusive from using token)
+        :param rpassword: Remote user password (exclusive from using token)
+        :param rtoken: Remote personal access token (exclusive from user
+            credentials)
+        :param destination: The destination project
+        :param tables: The tables names to be imported (default is all)
+        :param incremental: Incremental import (new and updated value sets)
+        :param limit: Import limit (maximum number of value sets)
+        :param identifiers: The name of the ID mapping
+        :param policy: The ID mapping policy: "required" (each identifiers must
+            be mapped prior importation, default), "ignore" (ignore unknown
+            identifiers), "generate" (generate a system identifier for each
+            unknown identifier)
+        :param merge: Merge imported data dictionary with the destination one
+            (default is false, i.e. data dictionary is overridden)
+        :param group_size: The maximum number of tables per job
+        :param max_workers: The maximum number of jobs running concurrently
+        :param retries: The number of retries of a failed table import
+        :param checkpoint: The checkpoint of the table imports, to resume an interrupted import
+        :return: The import report, with the status, duration and throughput of each table
+        """
+        importer = io.OpalImporter.build(
+            self.client,
+            destination=destination,
+            tables=tables,
+            incremental=incremental,
+            limit=limit,
+            identifiers=identifiers,
+            policy=policy,
+            merge=merge,
+            verbose=self.verbose,
+        )
+        importer.prepare(self.OpalExtensionFactory(ropal, rdatasource, ruser, rpassword, rtoken))
+        try:
+            return import_transient_tables(
+                self.client,
+                importer,
+                f"opal:{ropal}:{rdatasource}",
+                group_size,
+                max_workers,
+                retries,
+                checkpoint,
+                self.verbose,
+            )
+        finally:
+            importer.release()
+
     class OpalExtensionFactory(io.OpalImporter.ExtensionFactoryInterface):
         def __init__(self, ropal, rdatasource, ruser, rpassword, rtoken):
             self.ropal = ropal
@@ -913,6 +1671,7 @@ class ImportRSPSSCommand:
 
         # non specific import arguments
         io.add_import_arguments(parser)
+        io.add_checkpoint_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -926,6 +1685,24 @@ class ImportRSPSSCommand:
 
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            checkpoint = io.ImportCheckpoint.from_args(args, f"{os.path.basename(args.path)}.checkpoint.json")
+            if checkpoint:
+                res = cls(client, args.verbose).import_tables(
+                    args.path,
+                    args.destination,
+                    args.locale,
+                    args.type,
+                    args.idVariable,
+                    args.tables,
+                    args.incremental,
+                    args.limit,
+                    args.identifiers,
+                    args.policy,
+                    args.merge,
+                    checkpoint=checkpoint,
+                )
+                core.Formatter.print_json(res, args.json)
+                return
             res = cls(client, args.verbose).import_data(
                 args.path,
                 args.destination,
@@ -993,6 +1770,68 @@ class ImportRSPSSCommand:
         response = importer.submit(extension_factory)
         return response.from_json()
 
+    def import_tables(
+        self,
+        path: str,
+        destination: str,
+        locale: str = None,
+        entityType: str = None,
+        idVariable: str = None,
+        tables: list = None,
+        incremental: bool = None,
+        limit: int = None,
+        identifiers: str = None,
+        policy: str = None,
+        merge: bool = None,
+        group_size: int = 1,
+        max_workers: int = 2,
+        retries: int = 2,
+        checkpoint: io.ImportCheckpoint = None,
+    ) -> dict:
+        """
+        Import tables from a SPSS file, with one job per table, or per group of tables. The file is parsed
+        once and the import progress can be recorded in a checkpoint, to resume an interrupted import.
+
+        :param path: File to import in Opal file system
+        :param locale: SPSS file locale (e.g. fr, en...)
+        :param entityType: Entity type (e.g. Participant)
+        :param idVariable: R tibble column that provides the entity ID. If not specified, first column
+            values are considered to be the entity identifiers
+        :param destination: The destination project
+        :param tables: The tables names to be imported (default is all)
+        :param incremental: Incremental import (new and updated value sets)
+        :param limit: Import limit (maximum number of value sets)
+        :param identifiers: The name of the ID mapping
+        :param policy: The ID mapping policy: "required" (each identifiers must be mapped prior
+            importation, default), "ignore" (ignore unknown identifiers), "generate" (generate a
+            system identifier for each unknown identifier)
+        :param merge: Merge imported data dictionary with the destination one (default is false, i.e. data
+            dictionary is overridden)
+        :param group_size: The maximum number of tables per job
+        :param max_workers: The maximum number of jobs running concurrently
+        :param retries: The number of retries of a failed table import
+        :param checkpoint: The checkpoint of the table imports, to resume an interrupted import
+        :return: The import report, with the status, duration and throughput of each table
+        """
+        importer = io.OpalImporter.build(
+            self.client,
+            destination,
+            tables,
+            incremental,
+            limit,
+            identifiers,
+            policy,
+            merge,
+            self.verbose,
+        )
+        importer.prepare(self.OpalExtensionFactory(path, locale, entityType, idVariable))
+        try:
+            return import_transient_tables(
+                self.client, importer, f"spss:{path}", group_size, max_workers, retries, checkpoint, self.verbose
+            )
+        finally:
+            importer.release()
+
     class OpalExtensionFactory(io.OpalImporter.ExtensionFactoryInterface):
         def __init__(self, path, locale, entityType, idVariable):
             self.path = path
@@ -1174,6 +2013,7 @@ class ImportSQLCommand:
         parser.add_argument("--database", "-db", required=True, help="Name of the SQL database.")
         # non specific import arguments
         io.add_import_arguments(parser)
+        io.add_checkpoint_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -1183,6 +2023,21 @@ class ImportSQLCommand:
         # Build and send request
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
+            checkpoint = io.ImportCheckpoint.from_args(args, f"{args.database}.checkpoint.json")
+            if checkpoint:
+                res = cls(client, args.verbose).import_tables(
+                    args.database,
+                    args.destination,
+                    args.tables,
+                    args.incremental,
+                    args.limit,
+                    args.identifiers,
+                    args.policy,
+                    args.merge,
+                    checkpoint=checkpoint,
+                )
+                core.Formatter.print_json(res, args.json)
+                return
             res = cls(client, args.verbose).import_data(
                 args.database,
                 args.destination,
@@ -1241,6 +2096,62 @@ class ImportSQLCommand:
         response = importer.submit(extension_factory)
         return response.from_json()
 
+    def import_tables(
+        self,
+        database: str,
+        destination: str,
+        tables: list = None,
+        incremental: bool = None,
+        limit: int = None,
+        identifiers: str = None,
+        policy: str = None,
+        merge: bool = None,
+        group_size: int = 1,
+        max_workers: int = 2,
+        retries: int = 2,
+        checkpoint: io.ImportCheckpoint = None,
+    ) -> dict:
+        """
+        Import tables from a SQL database, with one job per table, or per group of tables. The import
+        progress can be recorded in a checkpoint, to resume an interrupted import.
+
+        :param database: The database name as declared in Opal. See ProjectService.get_databases()
+            for a list of databases with 'import' usage.
+        :param destination: The destination project
+        :param tables: The tables names to be imported (default is all)
+        :param incremental: Incremental import (new and updated value sets)
+        :param limit: Import limit (maximum number of value sets)
+        :param identifiers: The name of the ID mapping
+        :param policy: The ID mapping policy: "required" (each identifiers must be mapped prior
+            importation, default), "ignore" (ignore unknown identifiers), "generate" (generate a
+            system identifier for each unknown identifier)
+        :param merge: Merge imported data dictionary with the destination one (default is false, i.e.
+            data dictionary is overridden)
+        :param group_size: The maximum number of tables per job
+        :param max_workers: The maximum number of jobs running concurrently
+        :param retries: The number of retries of a failed table import
+        :param checkpoint: The checkpoint of the table imports, to resume an interrupted import
+        :return: The import report, with the status, duration and throughput of each table
+        """
+        importer = io.OpalImporter.build(
+            self.client,
+            destination,
+            tables,
+            incremental,
+            limit,
+            identifiers,
+            policy,
+            merge,
+            self.verbose,
+        )
+        importer.prepare(self.OpalExtensionFactory(database))
+        try:
+            return import_transient_tables(
+                self.client, importer, f"sql:{database}", group_size, max_workers, retries, checkpoint, self.verbose
+            )
+        finally:
+            importer.release()
+
     class OpalExtensionFactory(io.OpalImporter.ExtensionFactoryInterface):
         def __init__(self, database):
             self.database = database
@@ -1356,6 +2267,10 @@ class ImportVCFCommand:
     VCF/BCF files import.
     """
 
+    def __init__(self, client: core.OpalClient, verbose: bool = False):
+        self.client = client
+        self.verbose = verbose
+
     @classmethod
     def add_arguments(cls, parser):
         """
@@ -1374,6 +2289,7 @@ class ImportVCFCommand:
             required=True,
             help="List of VCF/BCF (optionally compressed) file paths (in Opal file system)",
         )
+        io.add_vcf_shard_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -1383,23 +2299,61 @@ class ImportVCFCommand:
         # Build and send requests
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
-            request = client.new_request()
-            request.fail_on_error().accept_json().content_type_json()
-            if args.verbose:
-                request.verbose()
-
-            options = {"project": args.project, "files": args.vcf}
-            # send request
-            uri = core.UriBuilder([
-                "project",
-                args.project,
-                "commands",
-                "_import_vcf",
-            ]).build()
-            request.resource(uri).post().content(json.dumps(options)).send()
+            service = cls(client, args.verbose)
+            if getattr(args, "shard", False):
+                res = service.import_data_sharded(args.project, args.vcf, args.max_workers, args.retries)
+                core.Formatter.print_json(res, args.json)
+            else:
+                service.import_data(args.project, args.vcf)
         finally:
             client.close()
 
+    def import_data(self, project: str, vcf: list) -> str:
+        """
+        Import VCF/BCF files, in one task.
+
+        :param project: The project name
+        :param vcf: The list of VCF/BCF file paths (in Opal file system)
+        :return: The task ID
+        """
+        request = self.client.new_request()
+        request.fail_on_error().accept_json().content_type_json()
+        if self.verbose:
+            request.verbose()
+
+        options = {"project": project, "files": vcf}
+        # send request
+        uri = core.UriBuilder([
+            "project",
+            project,
+            "commands",
+            "_import_vcf",
+        ]).build()
+        response = request.resource(uri).post().content(json.dumps(options)).send()
+        id = TaskService.get_task_id(response)
+        if id is None:
+            raise Exception("No VCF import task was launched")
+        return id
+
+    def import_data_sharded(
+        self, project: str, vcf: list, max_workers: int = 2, retries: int = 1, silently: bool = False
+    ) -> dict:
+        """
+        Import VCF/BCF files, in one task per file. The tasks are run concurrently and the failed ones are
+        retried.
+
+        :param project: The project name
+        :param vcf: The list of VCF/BCF file paths (in Opal file system)
+        :param max_workers: The maximum number of tasks running concurrently
+        :param retries: The number of retries of a failed file import
+        :param silently: Do not print the progress
+        :return: The import report, with the status and the duration of each file import
+        """
+        results = TaskService(self.client, self.verbose).run_tasks(
+            lambda file: self.import_data(project, [file]), vcf, max_workers, retries, silently
+        )
+        return io.make_vcf_shards_report(results)
+
 
 class ImportIDService:
     """
@@ -1416,6 +2370,7 @@ class ImportIDService:
         Add import_ids command specific options
         """
         parser.add_argument("--type", "-t", required=True, help="Entity type (e.g. Participant).")
+        add_identifiers_import_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -1426,28 +2381,50 @@ class ImportIDService:
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
             print("Enter identifiers (one identifier per line, Ctrl-D to end input):")
-            ids = sys.stdin.read()
-            cls(client, args.verbose).import_ids(ids.split("\n"), args.type)
+            res = cls(client, args.verbose).import_ids(
+                sys.stdin,
+                args.type,
+                chunk_size=args.chunk_size,
+                max_workers=args.max_workers,
+                progress=print_identifiers_progress,
+                skip=args.skip_chunks,
+            )
+            print()
+            if res["status"] != "SUCCEEDED":
+                # the report lists the sent chunks, to be skipped when importing again
+                core.Formatter.print_json(res)
+                raise Exception(f"Identifiers import failed: {res['error']}")
         finally:
             client.close()
 
-    def import_ids(self, ids: list, type: str):
+    def import_ids(
+        self,
+        ids,
+        type: str,
+        chunk_size: int = 10000,
+        max_workers: int = 4,
+        retries: int = 3,
+        progress=None,
+        skip: list = None,
+    ) -> dict:
         """
-        Import a list of identifiers in the IDs database.
+        Import identifiers in the IDs database. Identifiers are read as a stream, blank and duplicate
+        ones are skipped, and they are sent by chunks, concurrently.
 
-        :param ids: The list of identifiers
+        :param ids: The identifiers: a list, an iterator or a text file (one identifier per line)
         :param type: Entity type (e.g. Participant)
+        :param chunk_size: The maximum number of identifiers per request
+        :param max_workers: The maximum number of concurrent requests
+        :param retries: The number of retries of a failed request
+        :param progress: Function called with the number of imported identifiers and chunks, after each chunk
+        :param skip: The indices of the chunks already sent, to resume a failed import of the same identifiers
+        :return: The import report, with the status, the number of imported identifiers and chunks and the
+            indices of the sent chunks
         """
-        request = self.client.new_request()
-        request.fail_on_error()
-        if self.verbose:
-            request.verbose()
-        request.content_type_text_plain()
-        request.content("\n".join(ids))
-
-        # send request
         uri = core.UriBuilder(["identifiers", "mappings", "entities", "_import"]).query("type", type).build()
-        request.post().resource(uri).send()
+        return send_identifiers_chunks(
+            self.client, uri, ids, chunk_size, max_workers, retries, progress, self.verbose, skip
+        )
 
 
 class ImportIDMapService:
@@ -1467,6 +2444,7 @@ class ImportIDMapService:
         parser.add_argument("--type", "-t", required=True, help="Entity type (e.g. Participant).")
         parser.add_argument("--map", "-m", required=True, help="Mapping name.")
         parser.add_argument("--separator", "-s", required=False, help="Field separator (default is ,).")
+        add_identifiers_import_arguments(parser)
 
     @classmethod
     def do_command(cls, args):
@@ -1477,32 +2455,464 @@ class ImportIDMapService:
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
             print("Enter identifiers (one identifiers mapping per line, Ctrl-D to end input):")
-            ids = sys.stdin.read()
-            cls(client, args.verbose).import_ids(ids.split("\n"), args.type, args.map, args.separator)
+            res = cls(client, args.verbose).import_ids(
+                sys.stdin,
+                args.type,
+                args.map,
+                args.separator,
+                chunk_size=args.chunk_size,
+                max_workers=args.max_workers,
+                progress=print_identifiers_progress,
+                skip=args.skip_chunks,
+            )
+            print()
+            if res["status"] != "SUCCEEDED":
+                # the report lists the sent chunks, to be skipped when importing again
+                core.Formatter.print_json(res)
+                raise Exception(f"Identifiers import failed: {res['error']}")
         finally:
             client.close()
 
-    def import_ids(self, ids: list, type: str, map: str, separator: str = ","):
+    def import_ids(
+        self,
+        ids,
+        type: str,
+        map: str,
+        separator: str = ",",
+        chunk_size: int = 10000,
+        max_workers: int = 4,
+        retries: int = 3,
+        progress=None,
+        skip: list = None,
+    ) -> dict:
         """
-        Import a list of identifiers mappings (each item is a string of separated IDs) in the IDs database.
+        Import identifiers mappings (each item is a string of separated IDs) in the IDs database. Mappings
+        are read as a stream, blank and duplicate ones are skipped, and they are sent by chunks, concurrently.
 
-        :param ids: The list of identifiers
+        :param ids: The identifiers mappings: a list, an iterator or a text file (one mapping per line)
         :param type: Entity type (e.g. Participant)
         :param map: The mapping name
         :param separator: Field separator
+        :param chunk_size: The maximum number of identifiers mappings per request
+        :param max_workers: The maximum number of concurrent requests
+        :param retries: The number of retries of a failed request
+        :param progress: Function called with the number of imported mappings and chunks, after each chunk
+        :param skip: The indices of the chunks already sent, to resume a failed import of the same mappings
+        :return: The import report, with the status, the number of imported identifiers mappings and chunks
+            and the indices of the sent chunks
         """
-        request = self.client.new_request()
-        request.fail_on_error()
-
-        if self.verbose:
-            request.verbose()
-
-        request.content_type_text_plain()
-        request.content("\n".join(ids))
-
-        # send request
         builder = core.UriBuilder(["identifiers", "mapping", map, "_import"]).query("type", type)
         if separator:
             builder.query("separator", separator)
         uri = builder.build()
-        request.post().resource(uri).send()
+        return send_identifiers_chunks(
+            self.client, uri, ids, chunk_size, max_workers, retries, progress, self.verbose, skip
+        )
+
+
+def add_identifiers_import_arguments(parser):
+    """
+    Add identifiers import arguments
+    """
+    parser.add_argument(
+        "--chunk-size",
+        "-cs",
+        type=int,
+        default=10000,
+        help="Maximum number of identifiers per request (default is 10000).",
+    )
+    parser.add_argument(
+        "--max-workers",
+        "-mw",
+        type=int,
+        default=4,
+        help="Maximum number of concurrent requests (default is 4).",
+    )
+    parser.add_argument(
+        "--skip-chunks",
+        type=int,
+        nargs="+",
+        required=False,
+        help="Indices of the chunks already sent, as reported by a failed import of the same input, to resume it.",
+    )
+
+
+def print_identifiers_progress(count: int, chunks: int):
+    sys.stdout.write(f"\r\033[K{count} identifiers imported ({chunks} chunks)")
+    sys.stdout.flush()
+
+
+def chunk_identifiers(ids, chunk_size: int):
+    """
+    Group identifiers in chunks, skipping the blank ones and the duplicates within a chunk. Only the
+    identifiers of the current chunk are kept in memory, the duplicates across chunks are left to the
+    server, for which importing an identifier again has no effect.
+
+    :param ids: An iterable of identifiers (one per line)
+    :param chunk_size: The maximum number of identifiers per chunk
+    :return: A generator of lists of identifiers
+    """
+    seen = set()
+    chunk = []
+    for line in ids:
+        id = line.strip()
+        if not id or id in seen:
+            continue
+        seen.add(id)
+        chunk.append(id)
+        if len(chunk) == chunk_size:
+            yield chunk
+            seen = set()
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def send_identifiers_chunks(
+    client: core.OpalClient,
+    uri: str,
+    ids,
+    chunk_size: int = 10000,
+    max_workers: int = 4,
+    retries: int = 3,
+    progress=None,
+    verbose: bool = False,
+    skip: list = None,
+) -> dict:
+    """
+    Send the identifiers by chunks, concurrently. The number of chunks in-flight is bounded, so
+    that the chunks are not all loaded in memory. No more chunks are sent after a failure: the
+    report then lists the chunks that were sent, to be skipped when sending the same identifiers
+    again.
+
+    :return: The report, with the status, the number of sent identifiers and chunks, the indices of
+        the sent chunks and the error, if any
+    """
+    backoff = core.AdaptiveBackoff(retries=retries)
+    slots = threading.BoundedSemaphore(max_workers * 2)
+    lock = threading.Lock()
+    failed = threading.Event()
+    stats = {"identifiers": 0, "chunks": 0}
+    sent = set(skip) if skip else set()
+
+    def send(index: int, chunk: list):
+        try:
+            if failed.is_set():
+                return
+            request = client.new_request()
+            request.fail_on_error()
+            if verbose:
+                request.verbose()
+            request.content_type_text_plain()
+            request.content("\n".join(chunk))
+            backoff.call(request.post().resource(uri).send)
+            with lock:
+                sent.add(index)
+                stats["identifiers"] += len(chunk)
+                stats["chunks"] += 1
+                if progress:
+                    progress(stats["identifiers"], stats["chunks"])
+        except Exception:
+            failed.set()
+            raise
+        finally:
+            slots.release()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = []
+        for index, chunk in enumerate(chunk_identifiers(ids, chunk_size)):
+            if index in sent:
+                continue
+            slots.acquire()
+            if failed.is_set():
+                slots.release()
+                break
+            futures.append(executor.submit(send, index, chunk))
+        errors = [future.exception() for future in futures if future.exception() is not None]
+    report = {"status": "FAILED" if errors else "SUCCEEDED", **stats, "sent": sorted(sent)}
+    if errors:
+        report["error"] = errors[0].error if isinstance(errors[0], core.HTTPError) else str(errors[0])
+    return report
+
+
+def import_transient_tables(
+    client: core.OpalClient,
+    importer: io.OpalImporter,
+    source: str,
+    group_size: int = 1,
+    max_workers: int = 2,
+    retries: int = 2,
+    checkpoint: io.ImportCheckpoint = None,
+    verbose: bool = False,
+) -> dict:
+    """
+    Import the tables of the transient datasource prepared by an importer, with one job per table, or per group
+    of tables. The jobs are submitted concurrently, so that a slow table does not hold up the others. The tables
+    of a failed job, or of a job that could not be submitted, are retried individually.
+
+    :param client: Opal connection object
+    :param importer: The importer, with a prepared transient datasource
+    :param source: The source identifier (e.g. the database name), that identifies the tables in the checkpoint
+    :param group_size: The maximum number of tables per job
+    :param max_workers: The maximum number of jobs running concurrently
+    :param retries: The number of retries of a failed table import
+    :param checkpoint: The checkpoint of the table imports, to resume an interrupted import: the tables which
+        import has completed are skipped and the in-flight jobs are waited for instead of being submitted again
+    :param verbose: Verbose requests
+    :return: The import report, with the status, duration and throughput of each table
+    """
+    destination = importer.destination
+    transient = importer.transient
+    names = [t for t in importer.tables if t in transient["table"]] if importer.tables else transient["table"]
+    task_service = TaskService(client, verbose)
+
+    def key(table: str) -> str:
+        return f"{source}:{destination}.{table}"
+
+    def record(group: list, **entry):
+        if checkpoint:
+            for table in group:
+                checkpoint.update(key(table), **entry)
+
+    reports = {}
+    if checkpoint:
+        for table in names:
+            resumed = checkpoint.attach(key(table), task_service)
+            if resumed is not None:
+                reports[table] = {
+                    "table": table,
+                    "task": resumed["task"],
+                    "status": resumed["status"],
+                    "attempts": 0,
+                    "duration": 0,
+                    "resumed": resumed["resumed"],
+                }
+    remaining = [t for t in names if t not in reports]
+    size = max(1, group_size)
+    groups = [remaining[i : i + size] for i in range(0, len(remaining), size)]
+
+    def run(group: list) -> tuple:
+        start = time.time()
+        task = None
+        try:
+            task = importer.submit(tables=group).from_json()["id"]
+            record(group, task=task, status=None)
+            status = task_service.wait_task(task, True)
+            record(group, status=status)
+            return task, status, time.time() - start, None
+        except Exception as e:
+            error = e.error if isinstance(e, core.HTTPError) else str(e)
+            return task, "FAILED", time.time() - start, error
+
+    def process(group: list) -> list:
+        task, status, duration, error = run(group)
+        if status == "SUCCEEDED":
+            return [_table_report(client, transient, t, task, status, duration / len(group), 1, verbose) for t in group]
+        # retry each table of the failed job individually
+        results = []
+        for table in group:
+            # a single table job was already attempted once
+            attempt, status = (1, status) if len(group) == 1 else (0, None)
+            while status != "SUCCEEDED" and attempt <= retries:
+                attempt += 1
+                task, status, duration, error = run([table])
+            report = _table_report(client, transient, table, task, status, duration, attempt, verbose)
+            if error is not None:
+                report["error"] = error
+            results.append(report)
+        return results
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for results in executor.map(process, groups):
+            reports.update({r["table"]: r for r in results})
+
+    results = [reports[t] for t in names]
+    failed = [r["table"] for r in results if r["status"] != "SUCCEEDED"]
+    return {
+        "destination": destination,
+        "status": "FAILED" if failed else "SUCCEEDED",
+        "failed": failed,
+        "tables": results,
+    }
+
+
+def _table_report(
+    client: core.OpalClient,
+    transient: dict,
+    table: str,
+    task,
+    status: str,
+    duration: float,
+    attempts: int,
+    verbose: bool = False,
+) -> dict:
+    report = {"table": table, "task": task, "status": status, "attempts": attempts, "duration": duration}
+    if status == "SUCCEEDED":
+        # the imported value sets are the ones of the transient table (subject to the incremental and limit
+        # options), the destination table may have had value sets before the import
+        request = client.new_request()
+        request.fail_on_error().accept_json()
+        if verbose:
+            request.verbose()
+        uri = core.UriBuilder(["datasource", transient["name"], "table", table]).query("counts", True).build()
+        count = request.get().resource(uri).send().from_json().get("valueSetCount", 0)
+        report["valueSets"] = count
+        report["valueSetsPerSecond"] = count / duration if duration > 0 else None
+    return report
+
+
+class ImportBatchCommand:
+    """
+    Import data from several sources, declared in a manifest file.
+    """
+
+    # manifest source names and their import command
+    SOURCES = {
+        "csv": ImportCSVCommand,
+        "xml": ImportXMLCommand,
+        "sas": ImportRSASCommand,
+        "spss": ImportRSPSSCommand,
+        "stata": ImportRSTATACommand,
+        "rds": ImportRDSCommand,
+        "sql": ImportSQLCommand,
+        "opal": ImportOpalCommand,
+        "plugin": ImportPluginCommand,
+        "limesurvey": ImportLimeSurveyCommand,
+    }
+
+    def __init__(self, client: core.OpalClient, verbose: bool = False):
+        self.client = client
+        self.verbose = verbose
+
+    @classmethod
+    def add_arguments(cls, parser):
+        """
+        Add command specific options
+        """
+        parser.add_argument(
+            "manifest",
+            help="Manifest file (JSON or YAML) with the list of imports. Each import has a 'source' "
+            f"({', '.join(cls.SOURCES)}), a 'destination' and the options of the corresponding import command.",
+        )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            required=False,
+            help="Maximum number of concurrent imports (default is the manifest's 'max_workers' or 4).",
+        )
+        io.add_checkpoint_arguments(parser)
+        parser.add_argument(
+            "--json",
+            "-j",
+            action="store_true",
+            help="Pretty JSON formatting of the response",
+        )
+
+    @classmethod
+    def do_command(cls, args):
+        """
+        Execute import batch command
+        """
+        manifest = cls.load_manifest(args.manifest)
+        # Build and send request
+        client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
+        try:
+            checkpoint = io.ImportCheckpoint.from_args(args, f"{args.manifest}.checkpoint.json")
+            res = cls(client, args.verbose).import_batch(manifest, args.max_workers, checkpoint)
+            core.Formatter.print_json(res, args.json)
+        finally:
+            client.close()
+
+    @classmethod
+    def load_manifest(cls, path: str) -> dict:
+        """
+        Load a manifest file, in JSON or YAML (requires PyYAML) format.
+
+        :param path: The manifest file path
+        """
+        with open(path) as f:
+            if path.endswith(".yaml") or path.endswith(".yml"):
+                try:
+                    import yaml
+                except ImportError:
+                    raise Exception("Reading YAML manifests requires PyYAML: pip install pyyaml") from None
+                return yaml.safe_load(f)
+            return json.load(f)
+
+    def import_batch(self, manifest: dict, max_workers: int = None, checkpoint: io.ImportCheckpoint = None) -> dict:
+        """
+        Run the imports declared in a manifest concurrently. Imports into the same project are run one
+        after the other (or up to the manifest's 'project_limit'), imports into different projects are
+        run in parallel: an import is dispatched to a worker only when its project has a free slot, so
+        that the imports waiting for a busy project do not hold the workers. Each import job is submitted
+        and waited for.
+
+        :param manifest: The manifest, with the list of 'imports' and optionally 'max_workers' and
+            'project_limit'. Each import has a 'source' (csv, xml, sas, spss, stata, rds, sql, opal, plugin,
+            limesurvey), a 'destination' and the arguments of the import_data() function of the
+            corresponding import command.
+        :param max_workers: The maximum number of concurrent imports (default is the manifest's one, or 4)
+        :param checkpoint: The checkpoint of the imports, to resume an interrupted batch: an import is
+            identified by its index and its options in the manifest
+        :return: The consolidated report, with the status of each import
+        """
+        imports = manifest.get("imports", [])
+        for index, item in enumerate(imports):
+            if item.get("source") not in self.SOURCES:
+                raise ValueError(f"Import #{index}: unknown source '{item.get('source')}'")
+            if not item.get("destination"):
+                raise ValueError(f"Import #{index}: destination is missing")
+        workers = max_workers if max_workers else manifest.get("max_workers", 4)
+        project_limit = manifest.get("project_limit", 1)
+        if not isinstance(project_limit, int) or project_limit < 1:
+            raise ValueError(f"The project_limit must be a positive integer: {project_limit}")
+        task_service = TaskService(self.client, self.verbose)
+
+        def run(index: int, item: dict) -> dict:
+            options = {k: v for k, v in item.items() if k != "source"}
+            result = {"index": index, "source": item["source"], "destination": item["destination"]}
+            key = f"{index}:{hashlib.sha1(json.dumps(item, sort_keys=True).encode()).hexdigest()[:12]}"
+            start = time.time()
+            try:
+                resumed = checkpoint.attach(key, task_service) if checkpoint else None
+                if resumed is not None:
+                    result.update(task=resumed["task"], status=resumed["status"], resumed=resumed["resumed"])
+                    result["duration"] = time.time() - start
+                    return result
+                command = self.SOURCES[item["source"]](self.client, self.verbose)
+                task = command.import_data(**options)
+                result["task"] = task["id"]
+                if checkpoint:
+                    checkpoint.update(key, task=task["id"], status=None)
+                result["status"] = task_service.wait_task(task["id"], True)
+                if checkpoint:
+                    checkpoint.update(key, status=result["status"])
+            except Exception as e:
+                result["status"] = "FAILED"
+                result["error"] = e.error if isinstance(e, core.HTTPError) else str(e)
+            result["duration"] = time.time() - start
+            return result
+
+        results = [None] * len(imports)
+        pending = list(range(len(imports)))
+        running = {}
+        active = {item["destination"]: 0 for item in imports}
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            while pending or running:
+                # dispatch, in the manifest order, the imports which project has a free slot
+                for index in list(pending):
+                    destination = imports[index]["destination"]
+                    if len(running) < workers and active[destination] < project_limit:
+                        pending.remove(index)
+                        active[destination] += 1
+                        running[executor.submit(run, index, imports[index])] = index
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    index = running.pop(future)
+                    active[imports[index]["destination"]] -= 1
+                    results[index] = future.result()
+        return {
+            "status": "SUCCEEDED" if all(r["status"] == "SUCCEEDED" for r in results) else "FAILED",
+            "imports": results,
+        }
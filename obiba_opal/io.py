@@ -2,9 +2,16 @@
 Opal data importer
 """
 
+import copy
+import heapq
 import json
 import obiba_opal.core as core
+import os
 import re
+import threading
+import time
+from obiba_opal.system import TaskService
+from concurrent.futures import ThreadPoolExecutor
 
 
 def add_import_arguments(parser):
@@ -55,9 +62,155 @@ def add_import_arguments(parser):
     )
 
 
+def add_vcf_shard_arguments(parser):
+    """
+    Add VCF/BCF files sharding arguments
+    """
+    parser.add_argument(
+        "--shard",
+        "-sh",
+        action="store_true",
+        help="One task per VCF/BCF file, tasks are run concurrently and the failed ones are retried. The "
+        "progress is reported until all the tasks are completed.",
+    )
+    parser.add_argument(
+        "--max-workers",
+        "-mw",
+        type=int,
+        default=2,
+        help="Maximum number of tasks running concurrently, when sharded (default is 2).",
+    )
+    parser.add_argument(
+        "--retries",
+        "-rs",
+        type=int,
+        default=1,
+        help="Number of retries of a failed task, when sharded (default is 1).",
+    )
+    parser.add_argument(
+        "--json",
+        "-j",
+        action="store_true",
+        help="Pretty JSON formatting of the response",
+    )
+
+
+def make_vcf_shards_report(results: list) -> dict:
+    """
+    Make the report of the VCF/BCF file tasks.
+    """
+    files = [{"file": r["item"], **{k: v for k, v in r.items() if k != "item"}} for r in results]
+    failed = [f["file"] for f in files if f["status"] != "SUCCEEDED"]
+    return {"status": "FAILED" if failed else "SUCCEEDED", "failed": failed, "files": files}
+
+
+def add_checkpoint_arguments(parser):
+    """
+    Add import checkpoint arguments
+    """
+    parser.add_argument(
+        "--checkpoint",
+        "-cp",
+        required=False,
+        help="Checkpoint file, where the task ID and status of each part of the import are recorded.",
+    )
+    parser.add_argument(
+        "--resume",
+        "-re",
+        action="store_true",
+        help="Resume an interrupted import from its checkpoint file: completed parts are skipped and in-flight "
+        "tasks are waited for instead of being submitted again.",
+    )
+
+
+class ImportCheckpoint:
+    """
+    Checkpoint file of an import made of several tasks (tables, chunks...): the task ID and the status of
+    each part are recorded as soon as they are known, so that an interrupted import can be resumed.
+    """
+
+    # task statuses after which a task will not change
+    FINAL_STATUSES = ["SUCCEEDED", "CANCELED", "FAILED", "CANCEL_PENDING"]
+
+    def __init__(self, path: str, resume: bool = False):
+        """
+        :param path: The checkpoint file path
+        :param resume: Load the checkpoint file, if it exists, instead of starting a new one
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries = {}
+        if resume and os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get("entries", {})
+        with self._lock:
+            self._save()
+
+    @classmethod
+    def from_args(cls, args, default_path: str):
+        """
+        Make the checkpoint from the --checkpoint and --resume command line arguments, if any.
+
+        :param args: The command line arguments
+        :param default_path: The checkpoint file path when resuming without --checkpoint
+        """
+        path = getattr(args, "checkpoint", None)
+        resume = getattr(args, "resume", False)
+        if not path and not resume:
+            return None
+        return cls(path if path else default_path, resume)
+
+    def get(self, key: str) -> dict:
+        with self._lock:
+            entry = self.entries.get(key)
+            return dict(entry) if entry else None
+
+    def update(self, key: str, **entry):
+        """
+        Record the task ID and/or the status of a part of the import.
+        """
+        with self._lock:
+            self.entries[key] = {**self.entries.get(key, {}), **entry}
+            self._save()
+
+    def attach(self, key: str, task_service) -> dict:
+        """
+        Get the recorded task of a part of the import: a completed task is reported as skipped and an
+        in-flight one is waited for.
+
+        :param key: The part identifier
+        :param task_service: The TaskService used to wait for an in-flight task
+        :return: The task entry, with how it was resumed ("skipped" or "attached"), or None if the part has
+            to be (re)submitted
+        """
+        entry = self.get(key)
+        if not entry or entry.get("task") is None:
+            return None
+        if entry.get("status") == "SUCCEEDED":
+            return {**entry, "resumed": "skipped"}
+        if entry.get("status") in self.FINAL_STATUSES:
+            return None
+        try:
+            status = task_service.wait_task(entry["task"], True)
+        except core.HTTPError:
+            # task is unknown (e.g. the server was restarted)
+            return None
+        self.update(key, status=status)
+        return {**entry, "status": status, "resumed": "attached"} if status == "SUCCEEDED" else None
+
+    def _save(self):
+        # atomic replacement, the checkpoint file is never partially written
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump({"entries": self.entries}, f, indent=2)
+        os.replace(tmp, self.path)
+
+
 class OpalImporter:
     """
-    OpalImporter takes care of submitting an import job.
+    OpalImporter takes care of submitting an import job. The transient datasource built from the source
+    can be prepared first, to be previewed and compared with the destination, and then imported (again)
+    without the server having to parse the source once more.
     """
 
     class ExtensionFactoryInterface:
@@ -77,22 +230,48 @@ class OpalImporter:
         merge: bool = None,
         verbose: bool = False,
     ):
-        cls.client = client
-        cls.destination = destination
-        cls.tables = tables
-        cls.incremental = incremental
-        cls.limit = limit
-        cls.identifiers = identifiers
-        cls.policy = policy
-        cls.merge = merge
-        cls.verbose = verbose
-        return cls()
-
-    def submit(self, extension_factory) -> core.OpalResponse:
+        # options are instance attributes, so that importers can be used concurrently
+        importer = cls()
+        importer.client = client
+        importer.destination = destination
+        importer.tables = tables
+        importer.incremental = incremental
+        importer.limit = limit
+        importer.identifiers = identifiers
+        importer.policy = policy
+        importer.merge = merge
+        importer.verbose = verbose
+        importer.transient = None
+        return importer
+
+    def prepare(self, extension_factory) -> dict:
         """
-        Build a specific transient datasource, using extension_factory, and submit import job.
+        Build a specific transient datasource, using extension_factory, without importing it. The
+        transient datasource is kept by the importer until it is released, or replaced by another one.
+
+        :param extension_factory: The source specific datasource factory extension
+        :return: The transient datasource
         """
         transient = self.__create_transient_datasource(extension_factory)
+        self.release()
+        self.transient = transient
+        return self.transient
+
+    def submit(self, extension_factory=None, tables: list = None) -> core.OpalResponse:
+        """
+        Submit import job. A specific transient datasource is built using extension_factory, replacing the
+        one that was prepared, if any. Without extension_factory, the transient datasource that was prepared
+        is reused (e.g. to retry a failed import).
+
+        :param extension_factory: The source specific datasource factory extension
+        :param tables: The tables to be imported, instead of the importer's ones (e.g. to import a prepared
+            transient datasource by parts)
+        """
+        if extension_factory is not None:
+            self.prepare(extension_factory)
+        elif self.transient is None:
+            raise ValueError("No transient datasource was prepared and no extension factory was provided")
+        transient = self.transient
 
         # submit data import job
         request = self.client.new_request()
@@ -105,12 +284,9 @@ class OpalImporter:
         options = {"destination": self.destination}
         # tables must be the ones of the transient
         tables2import = transient["table"]
-        if self.tables:
-
-            def f(t):
-                return any(t in s for s in transient["table"])
-
-            tables2import = list(filter(f, self.tables))
+        tables = tables if tables else self.tables
+        if tables:
+            tables2import = [t for t in tables if t in transient["table"]]
 
         def table_fullname(t):
             return transient["name"] + "." + t
@@ -216,19 +392,22 @@ class OpalImporter:
             print("**")
         return transient
 
-    def compare_datasource(self, transient):
+    def compare_datasource(self, transient: dict = None) -> dict:
+        """
+        Compare the transient datasource with the destination one and fail if there are conflicts.
+
+        :param transient: The transient datasource (default is the prepared one)
+        :return: The datasources comparison
+        """
+        transient = self.__get_transient(transient)
         # Compare datasources : /datasource/<transient_name>/compare/<ds_name>
         uri = core.UriBuilder([
             "datasource",
-            transient["name"].encode("ascii", "ignore"),
+            transient["name"],
             "compare",
             self.destination,
         ]).build()
-        request = self.client.new_request()
-        request.fail_on_error().accept_json().content_type_json()
-        if self.verbose:
-            request.verbose()
-        response = request.get().resource(uri).send()
+        response = self.__new_request().get().resource(uri).send()
         compare = json.loads(response.content)
         for i in compare["tableComparisons"]:
             if i["conflicts"]:
@@ -237,6 +416,80 @@ class OpalImporter:
                     all_conflicts.append(c["code"] + "(" + ", ".join(c["arguments"]) + ")")
 
                 raise Exception("Import conflicts: " + "; ".join(all_conflicts))
+        return compare
+
+    def get_tables(self) -> list:
+        """
+        Get the tables of the prepared transient datasource.
+        """
+        uri = core.UriBuilder(["datasource", self.__get_transient()["name"], "tables"]).build()
+        return self.__new_request().get().resource(uri).send().from_json()
+
+    def get_variables(self, table: str) -> list:
+        """
+        Get the variables of a table of the prepared transient datasource.
+
+        :param table: The table name
+        """
+        uri = core.UriBuilder(["datasource", self.__get_transient()["name"], "table", table, "variables"]).build()
+        return self.__new_request().get().resource(uri).send().from_json()
+
+    def get_value_sets(self, table: str, limit: int = 10, offset: int = 0) -> dict:
+        """
+        Get a sample of the value sets of a table of the prepared transient datasource.
+
+        :param table: The table name
+        :param limit: The maximum number of value sets
+        :param offset: The index of the first value set
+        """
+        uri = (
+            core
+            .UriBuilder(["datasource", self.__get_transient()["name"], "table", table, "valueSets"])
+            .query("limit", limit)
+            .query("offset", offset)
+            .build()
+        )
+        return self.__new_request().get().resource(uri).send().from_json()
+
+    def preview(self, limit: int = 10) -> dict:
+        """
+        Preview the prepared transient datasource: tables, with their variables and a sample of their value sets.
+
+        :param limit: The maximum number of value sets per table
+        """
+        tables = []
+        for table in self.get_tables():
+            tables.append({
+                "name": table["name"],
+                "entityType": table.get("entityType"),
+                "variables": self.get_variables(table["name"]),
+                "valueSets": self.get_value_sets(table["name"], limit) if limit > 0 else None,
+            })
+        return {"name": self.__get_transient()["name"], "tables": tables}
+
+    def release(self):
+        """
+        Remove the prepared transient datasource from the server, if any.
+        """
+        if self.transient is None:
+            return
+        uri = core.UriBuilder(["datasource", self.transient["name"]]).build()
+        self.__new_request().delete().resource(uri).send()
+        self.transient = None
+
+    def __get_transient(self, transient: dict = None) -> dict:
+        if transient is not None:
+            return transient
+        if self.transient is None:
+            raise ValueError("No transient datasource was prepared")
+        return self.transient
+
+    def __new_request(self) -> core.OpalRequest:
+        request = self.client.new_request()
+        request.fail_on_error().accept_json()
+        if self.verbose:
+            request.verbose()
+        return request
 
 
 class OpalExporter:
@@ -257,16 +510,17 @@ class OpalExporter:
         entityIdNames=None,
         verbose: bool = False,
     ):
-        cls.client = client
-        cls.datasource = datasource
-        cls.tables = tables
-        cls.output = output
-        cls.incremental = incremental
-        cls.identifiers = identifiers
-        cls.multilines = multilines
-        cls.entityIdNames = entityIdNames
-        cls.verbose = verbose
-        return cls()
+        exporter = cls()
+        exporter.client = client
+        exporter.datasource = datasource
+        exporter.tables = tables
+        exporter.output = output
+        exporter.incremental = incremental
+        exporter.identifiers = identifiers
+        exporter.multilines = multilines
+        exporter.entityIdNames = entityIdNames
+        exporter.verbose = verbose
+        return exporter
 
     def setClient(self, client):
         self.client = client
@@ -328,6 +582,77 @@ class OpalExporter:
         request.fail_on_error().accept_json()
         return request.get().resource(job_resource).send()
 
+    def submit_sharded(self, format, shards: int = 2, max_workers: int = None) -> dict:
+        """
+        Submit the export as several jobs, each one covering a subset of the tables, and wait for them to
+        complete. The subsets are balanced by the number of value sets of their tables. All the jobs write
+        in the same output, so the format must be one that outputs a folder (e.g. csv).
+
+        :param format: The export format
+        :param shards: The number of export jobs
+        :param max_workers: The maximum number of jobs running concurrently (default is all of them)
+        :return: The export report, with the tables, the task and the status of each job
+        """
+        counts = self.get_value_set_counts()
+        groups = self.balance_tables(counts, shards)
+        task_service = TaskService(self.client, self.verbose)
+
+        def run(tables: list) -> dict:
+            start = time.time()
+            exporter = copy.copy(self)
+            exporter.tables = tables
+            task = exporter.submit(format).from_json()
+            status = task_service.wait_task(task["id"], True, max_interval=5)
+            return {
+                "tables": tables,
+                "valueSets": sum(counts[t] for t in tables),
+                "task": task["id"],
+                "status": status,
+                "duration": time.time() - start,
+            }
+
+        results = []
+        if groups:
+            with ThreadPoolExecutor(max_workers=max_workers if max_workers else len(groups)) as executor:
+                results = list(executor.map(run, groups))
+        return {
+            "status": "SUCCEEDED" if all(r["status"] == "SUCCEEDED" for r in results) else "FAILED",
+            "output": self.output,
+            "shards": results,
+        }
+
+    def get_value_set_counts(self) -> dict:
+        """
+        Get the number of value sets of each table to export.
+        """
+        request = self.client.new_request()
+        request.fail_on_error().accept_json()
+        if self.verbose:
+            request.verbose()
+        uri = core.UriBuilder(["datasource", self.datasource, "tables"]).query("counts", True).build()
+        tables = request.get().resource(uri).send().from_json()
+        counts = {t["name"]: t.get("valueSetCount", 0) for t in tables}
+        if self.tables:
+            return {t: counts.get(t, 0) for t in self.tables}
+        return counts
+
+    @classmethod
+    def balance_tables(cls, counts: dict, shards: int) -> list:
+        """
+        Split tables in subsets of about the same total number of value sets: the largest tables are assigned
+        first, each one to the least loaded subset.
+
+        :param counts: The number of value sets of each table
+        :param shards: The number of subsets
+        :return: The list of non-empty subsets of table names
+        """
+        heap = [(0, i, []) for i in range(max(1, min(shards, len(counts))))]
+        for name, count in sorted(counts.items(), key=lambda item: item[1], reverse=True):
+            load, i, tables = heapq.heappop(heap)
+            tables.append(name)
+            heapq.heappush(heap, (load + count, i, tables))
+        return [tables for _, _, tables in sorted(heap, key=lambda item: item[1]) if tables]
+
 
 class OpalCopier:
     """
@@ -346,15 +671,16 @@ class OpalCopier:
         nulls=False,
         verbose=None,
     ):
-        cls.client = client
-        cls.datasource = datasource
-        cls.tables = tables
-        cls.destination = destination
-        cls.name = name
-        cls.incremental = incremental
-        cls.nulls = nulls
-        cls.verbose = verbose
-        return cls()
+        copier = cls()
+        copier.client = client
+        copier.datasource = datasource
+        copier.tables = tables
+        copier.destination = destination
+        copier.name = name
+        copier.incremental = incremental
+        copier.nulls = nulls
+        copier.verbose = verbose
+        return copier
 
     def setClient(self, client):
         self.client = client
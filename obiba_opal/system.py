@@ -5,8 +5,11 @@ Opal system data
 import obiba_opal.core as core
 import ast
 import json
+import os
 import sys
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 
 class SystemService:
@@ -452,8 +455,16 @@ class TaskService:
         request.content("CANCELED")
         request.put().resource(f"/shell/command/{id}/status").send()
 
-    def wait_task(self, id: str | int, silently: bool = False):
-        """ Wait for the task to complete or being canceled, and return its status. """
+    def wait_task(self, id: str | int, silently: bool = False, max_interval: float = 1):
+        """
+        Wait for the task to complete or being canceled, and return its status.
+
+        :param id: The task ID
+        :param silently: Do not print the task progress
+        :param max_interval: The maximum number of seconds between two polls of the task status: the polling
+            interval starts at 0.5s and is doubled up to this maximum, to query less often long running tasks
+        """
+        interval = min(0.5, max_interval)
         task = self.get_task(id)
         while task["status"] not in ["SUCCEEDED", "CANCELED", "FAILED", "CANCEL_PENDING"]:
             if not silently:
@@ -466,10 +477,86 @@ class TaskService:
                 else:
                     sys.stdout.write(".")
                 sys.stdout.flush()
-            time.sleep(1)
+            time.sleep(interval)
+            interval = min(interval * 2, max_interval)
             task = self.get_task(id)
         return task["status"]
 
+    def run_tasks(self, submit, items: list, max_workers: int = 2, retries: int = 1, silently: bool = False) -> list:
+        """
+        Run one task per item, at most max_workers at the same time, and wait for them to complete, with a
+        combined progress view. A failed task, or a task that could not be submitted, is submitted again, up
+        to retries times.
+
+        :param submit: The function that submits the task of an item and returns the task ID
+        :param items: The items, one task per item (e.g. files)
+        :param max_workers: The maximum number of tasks running concurrently
+        :param retries: The number of retries of a failed task
+        :param silently: Do not print the progress
+        :return: The report of the task of each item: item, task ID, status, attempts, duration and the
+            submission error, if any
+        """
+        lock = threading.Lock()
+        running = {}
+        completed = []
+
+        def show():
+            if silently:
+                return
+            with lock:
+                percents = " ".join(f"{os.path.basename(str(k))}:{v}%" for k, v in running.items())
+                sys.stdout.write(f"\r\033[K[{len(completed)}/{len(items)}] {percents}")
+                sys.stdout.flush()
+
+        def run(item) -> dict:
+            start = time.time()
+            attempts = 0
+            status = None
+            error = None
+            while status is None or (status == "FAILED" and attempts <= retries):
+                attempts += 1
+                try:
+                    id = submit(item)
+                    if id is None:
+                        raise Exception("No task was launched")
+                except Exception as e:
+                    id = None
+                    status = "FAILED"
+                    error = e.error if isinstance(e, core.HTTPError) else str(e)
+                    continue
+                error = None
+                task = self.get_task(id)
+                while task["status"] not in ["SUCCEEDED", "CANCELED", "FAILED", "CANCEL_PENDING"]:
+                    with lock:
+                        running[item] = task["progress"]["percent"] if "progress" in task else 0
+                    show()
+                    time.sleep(1)
+                    task = self.get_task(id)
+                status = task["status"]
+            with lock:
+                running.pop(item, None)
+                completed.append(item)
+            show()
+            result = {"item": item, "task": id, "status": status, "attempts": attempts, "duration": time.time() - start}
+            if error is not None:
+                result["error"] = error
+            return result
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(run, items))
+        if not silently:
+            sys.stdout.write("\r\033[K")
+            sys.stdout.flush()
+        return results
+
+    @classmethod
+    def get_task_id(cls, response: core.OpalResponse) -> str:
+        """
+        Get the ID of the task that was launched, from the location of the response.
+        """
+        location = response.get_location()
+        return location.rstrip("/").split("/")[-1] if location else None
+
     def _make_request(self):
         request = self.client.new_request()
         request.fail_on_error()
@@ -152,6 +152,19 @@ class DeleteTableService:
             required=False,
             help="List of table names which will be deleted (default is all)",
         )
+        parser.add_argument(
+            "--max-workers",
+            "-mw",
+            type=int,
+            default=4,
+            help="Maximum number of concurrent requests (default is 4).",
+        )
+        parser.add_argument(
+            "--json",
+            "-j",
+            action="store_true",
+            help="Pretty JSON formatting of the response",
+        )
 
     @classmethod
     def do_command(cls, args):
@@ -161,7 +174,12 @@ class DeleteTableService:
         # Build and send requests
         client = core.OpalClient.build(core.OpalClient.LoginInfo.parse(args))
         try:
-            DictionaryService(client, args.verbose).delete_tables(args.project, args.tables)
+            res = DictionaryService(client, args.verbose).delete_tables(
+                args.project, args.tables, max_workers=args.max_workers, raise_on_error=False
+            )
+            core.Formatter.print_json(res, args.json)
+            if res["failed"]:
+                raise Exception(f"{len(res['failed'])} table(s) could not be deleted")
         finally:
             client.close()
 
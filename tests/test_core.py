@@ -1,10 +1,14 @@
 from argparse import Namespace
 import unittest
 
+import threading
+import time
+
 import pytest
 from obiba_opal import OpalClient
-from obiba_opal.core import HTTPError
+from obiba_opal.core import AdaptiveBackoff, HTTPError, OpalResponse, RequestCoalescer
 from os.path import exists
+from requests import Response
 from requests.exceptions import RequestException
 from tests.utils import TEST_SERVER, TEST_USER, TEST_PASSWORD
 
@@ -26,6 +30,125 @@ class TestClass(unittest.TestCase):
         except RequestException:
             assert True
 
+    def test_coalesceIdenticalRequests(self):
+        coalescer = RequestCoalescer()
+        calls = []
+        started = threading.Event()
+
+        def func():
+            calls.append(1)
+            started.set()
+            time.sleep(0.2)
+            return "response"
+
+        results = []
+        leader = threading.Thread(target=lambda: results.append(coalescer.send(("GET", "/projects"), func)))
+        leader.start()
+        started.wait()
+        waiters = [
+            threading.Thread(target=lambda: results.append(coalescer.send(("GET", "/projects"), func)))
+            for _ in range(4)
+        ]
+        for t in waiters:
+            t.start()
+        for t in [leader, *waiters]:
+            t.join()
+        assert len(calls) == 1
+        assert results == ["response"] * 5
+        metrics = coalescer.metrics()
+        assert metrics["requests"] == 5
+        assert metrics["coalesced"] == 4
+        assert metrics["hitRatio"] == 0.8
+
+    def test_coalesceInvalidatedByWrite(self):
+        coalescer = RequestCoalescer()
+        started = threading.Event()
+        release = threading.Event()
+        calls = []
+
+        def func():
+            calls.append(1)
+            started.set()
+            release.wait()
+            return len(calls)
+
+        key = ("GET", "http://opal/ws/datasource/P/table/T", ())
+        leader = threading.Thread(target=lambda: coalescer.send(key, func))
+        leader.start()
+        started.wait()
+        coalescer.invalidate("http://opal/ws/datasource/P/table/T/variables")
+        # the request following the write is sent again, not joined to the in-flight one
+        follower = threading.Thread(target=lambda: coalescer.send(key, func))
+        follower.start()
+        deadline = time.time() + 5
+        while len(calls) < 2 and time.time() < deadline:
+            time.sleep(0.01)
+        release.set()
+        leader.join()
+        follower.join()
+        assert len(calls) == 2
+
+    def test_coalescingOptIn(self):
+        client = OpalClient("http://localhost:8080")
+        assert client.coalescer is None
+        client.enable_coalescing()
+        assert client.coalescer is not None
+        client.enable_coalescing(False)
+        assert client.coalescer is None
+
+    def test_closeStreamedResponse(self):
+        class Raw:
+            closed = False
+
+            def close(self):
+                self.closed = True
+
+        response = Response()
+        response.raw = Raw()
+        with OpalResponse(response) as res:
+            assert res.response is response
+        assert response.raw.closed
+        with OpalResponse():
+            pass
+
+    def test_closeStreamedErrorResponse(self):
+        class Raw:
+            released = False
+
+            def release_conn(self):
+                self.released = True
+
+        response = Response()
+        response.status_code = 404
+        response.raw = Raw()
+        response._content = b""
+        client = OpalClient("http://localhost:8080")
+        client.session.send = lambda prepared, **kwargs: response
+        request = client.new_request().fail_on_error().stream().get().resource("/files/home/missing.csv")
+        self.assertRaises(HTTPError, request.send)
+        # the error body is read, the connection goes back to the pool
+        assert response.raw.released
+
+    def test_adaptiveBackoff(self):
+        backoff = AdaptiveBackoff(retries=2, initial_delay=0.01)
+        attempts = []
+
+        def flaky():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise RequestException("connection lost")
+            return "done"
+
+        # RequestException is not a connection error nor a timeout: not retried
+        self.assertRaises(RequestException, backoff.call, flaky)
+        assert len(attempts) == 1
+
+        backoff.is_retriable = lambda e: True
+        assert backoff.call(flaky) == "done"
+        assert len(attempts) == 3
+        # delay was set by the failure then halved by the success
+        assert backoff.delay == 0.005
+
     @pytest.mark.integration
     def test_sendRestBadCredentials(self):
         client = OpalClient.buildWithAuthentication(server=TEST_SERVER, user="admin", password=TEST_PASSWORD)
@@ -1,7 +1,12 @@
 import pytest
 from obiba_opal import DictionaryService, ExportAnnotationsService
+import obiba_opal.core as core
+from obiba_opal.dictionary import DictionaryReader
 from tests.utils import make_client
 import io
+import os
+import zipfile
+from requests import Response
 
 
 class TestClass:
@@ -76,3 +81,175 @@ class TestClass:
         assert row[1] == "Tracking_60min_R1"
         assert row[2] == "WGHTS_PROV_TRM"
         assert row[3] == "Mlstr_area"
+
+    @pytest.mark.integration
+    def test_diff_tables(self):
+        client = self.client
+        res = DictionaryService(client).diff("CNSIM.CNSIM1", "CNSIM.CNSIM2")
+        assert res["tables"]["modified"] + res["tables"]["unchanged"] == ["CNSIM1"]
+        assert res["tables"]["added"] == []
+        assert res["tables"]["removed"] == []
+
+
+def test_diff_variables():
+    service = DictionaryService(None)
+    source = {
+        "A": {"name": "A", "valueType": "text", "link": "/datasource/P1/table/T/variable/A"},
+        "B": {"name": "B", "valueType": "integer", "unit": "kg"},
+        "C": {"name": "C", "valueType": "text"},
+    }
+    destination = {
+        "A": {"name": "A", "valueType": "text", "link": "/datasource/P2/table/T/variable/A"},
+        "B": {"name": "B", "valueType": "decimal"},
+        "D": {"name": "D", "valueType": "text"},
+    }
+    changes = service._diff_variables("T", source, destination)
+    assert changes == [
+        {"table": "T", "variable": "C", "change": "added", "fields": []},
+        {"table": "T", "variable": "D", "change": "removed", "fields": []},
+        {"table": "T", "variable": "B", "change": "modified", "fields": ["unit", "valueType"]},
+    ]
+
+
+def test_diff_variables_attributes_order():
+    service = DictionaryService(None)
+    label = {"name": "label", "locale": "en", "value": "A"}
+    area = {"namespace": "Mlstr_area", "name": "Lifestyle", "value": "Smoking"}
+    source = {"A": {"name": "A", "attributes": [label, area], "categories": [{"name": "1", "attributes": [label]}]}}
+    destination = {
+        "A": {"name": "A", "attributes": [area, label], "categories": [{"name": "1", "attributes": [label]}]}
+    }
+    assert service._diff_variables("T", source, destination) == []
+    assert service._diff_variable_fields(source["A"], destination["A"]) == []
+    destination["A"]["categories"][0]["isMissing"] = True
+    assert service._diff_variables("T", source, destination)[0]["fields"] == ["categories"]
+    assert service._diff_variable_fields(source["A"], destination["A"]) == ["categories"]
+
+
+class _ApplyDictionaryService(DictionaryService):
+    def __init__(self, variables: list):
+        super().__init__(None)
+        self.variables = variables
+        self.posted = []
+
+    def get_variables(self, project: str, table: str) -> list:
+        return self.variables
+
+    def _post_variables(self, project: str, table: str, variables: list):
+        self.posted.extend(variables)
+
+
+def test_apply_merge_attributes():
+    label = {"name": "label", "locale": "en", "value": "Age"}
+    area = {"namespace": "Mlstr_area", "name": "Lifestyle", "value": "Smoking"}
+    service = _ApplyDictionaryService([{"name": "A", "valueType": "integer", "attributes": [label, area]}])
+    # the server attributes that are not in the local dictionary are kept
+    res = service.apply("P", "T", [{"name": "A", "attributes": [{**label, "value": "Age (years)"}]}])
+    assert res["modified"] == ["A"]
+    assert service.posted[0]["attributes"] == [{**label, "value": "Age (years)"}, area]
+    service = _ApplyDictionaryService([{"name": "A", "valueType": "integer", "attributes": [label, area]}])
+    res = service.apply("P", "T", [{"name": "A", "attributes": [label]}])
+    assert res["unchanged"] == ["A"]
+    assert service.posted == []
+
+
+def test_read_csv_dictionary(tmp_path):
+    path = tmp_path / "dictionary.csv"
+    path.write_text("table,name,valueType,repeatable,label:en,Mlstr_area::Lifestyle\nT,A,integer,1,A label,Smoking\n")
+    variables = DictionaryReader(str(path)).read()
+    assert variables == [
+        {
+            "name": "A",
+            "valueType": "integer",
+            "isRepeatable": True,
+            "attributes": [
+                {"name": "label", "value": "A label", "locale": "en"},
+                {"name": "Lifestyle", "value": "Smoking", "namespace": "Mlstr_area"},
+            ],
+        }
+    ]
+    service = DictionaryService(None)
+    current = {
+        "name": "A",
+        "valueType": "integer",
+        "isRepeatable": True,
+        "index": 3,
+        "attributes": [
+            {"namespace": "Mlstr_area", "name": "Lifestyle", "value": "Smoking"},
+            {"name": "label", "locale": "en", "value": "Another label"},
+        ],
+    }
+    assert service._diff_variable_fields(variables[0], current) == ["attributes"]
+
+
+class _ExcelDictionaryService(DictionaryService):
+    def _download_dictionary_as_excel(self, name: str, fp) -> int:
+        if name == "P.B:*":
+            fp.write(b"partial")
+            raise Exception("Not found")
+        fp.write(b"xlsx")
+        return 4
+
+
+def test_download_excel_dictionaries_failures(tmp_path):
+    service = _ExcelDictionaryService(None)
+    res = service.download_excel_dictionaries("P", ["A", "B"], str(tmp_path / "dicts"))
+    assert res == [
+        {"table": "A", "path": str(tmp_path / "dicts" / "A.xlsx"), "size": 4},
+        {"table": "B", "error": "Not found"},
+    ]
+    assert sorted(os.listdir(tmp_path / "dicts")) == ["A.xlsx"]
+    res = service.download_excel_dictionaries("P", ["A", "B"], str(tmp_path / "dicts.zip"))
+    assert [r.get("error") for r in res] == [None, "Not found"]
+    with zipfile.ZipFile(tmp_path / "dicts.zip") as archive:
+        assert archive.namelist() == ["A.xlsx"]
+
+
+def _http_error(code: int) -> core.HTTPError:
+    response = Response()
+    response.status_code = code
+    response._content = b""
+    return core.HTTPError(core.OpalResponse(response))
+
+
+class _DeleteDictionaryService(DictionaryService):
+    def __init__(self, bulk: bool):
+        super().__init__(None)
+        self.bulk = bulk
+        self.requests = []
+
+    def _delete_tables_batch(self, project: str, tables: list):
+        if not self.bulk:
+            raise _http_error(405)
+        self.requests.append(tables)
+
+    def _delete_table(self, project: str, tables: list):
+        self.requests.extend(tables)
+        if tables == ["C"]:
+            raise _http_error(404)
+
+
+def test_delete_tables_bulk_detection():
+    service = _DeleteDictionaryService(bulk=True)
+    res = service.delete_tables("P", ["A", "B", "D"], batch_size=2)
+    assert res == {"deleted": ["A", "B", "D"], "failed": []}
+    assert sorted(service.requests) == [["A", "B"], ["D"]]
+    service = _DeleteDictionaryService(bulk=False)
+    res = service.delete_tables("P", ["A", "B", "D"], batch_size=2)
+    assert res == {"deleted": ["A", "B", "D"], "failed": []}
+    assert sorted(service.requests) == ["A", "B", "D"]
+    # the detection is remembered
+    service.requests = []
+    service.delete_tables("P", ["A"])
+    assert service.requests == ["A"]
+
+
+def test_delete_tables_raise_on_error():
+    service = _DeleteDictionaryService(bulk=False)
+    with pytest.raises(core.HTTPError):
+        service.delete_tables("P", ["A", "C", "D"], retries=0)
+    # all the deletions were attempted
+    assert sorted(service.requests) == ["A", "C", "D"]
+    res = service.delete_tables("P", ["A", "C"], retries=0, raise_on_error=False)
+    assert res["deleted"] == ["A"]
+    assert [f["table"] for f in res["failed"]] == ["C"]
@@ -1,6 +1,9 @@
 import pytest
-from obiba_opal import ExportCSVCommand, TaskService
+from obiba_opal import ExportCSVCommand, ExportLocalCommand, ExportSyncCommand, FileService, TaskService
+from obiba_opal.exports import fetch_export, fetch_files, get_start_time
+from obiba_opal.io import OpalExporter
 from tests.utils import make_client
+import os
 import random
 
 
@@ -25,3 +28,117 @@ class TestClass:
         assert "id" in task
         status = TaskService(client).wait_task(task["id"])
         assert status in ["SUCCEEDED", "CANCELED", "FAILED"]
+
+
+def test_balance_tables():
+    counts = {"A": 100, "B": 60, "C": 50, "D": 10, "E": 5}
+    assert OpalExporter.balance_tables(counts, 2) == [["A", "D", "E"], ["B", "C"]]
+    assert OpalExporter.balance_tables(counts, 10) == [["A"], ["B"], ["C"], ["D"], ["E"]]
+    assert OpalExporter.balance_tables({}, 2) == []
+
+
+def test_write_local_csv(tmp_path):
+    path = str(tmp_path / "table.csv")
+    variables = [{"name": "A"}, {"name": "B"}]
+    value_sets = iter([("1", {"A": ["10"], "B": []}), ("2", {"A": ["20"], "B": ["a", "b"]})])
+    assert ExportLocalCommand(None)._write_csv(path, variables, value_sets, "id", True) == 2
+    with open(path) as f:
+        assert f.read() == "id,A,B\n1,10,\n2,20,a\n2,,b\n"
+
+
+def test_get_start_time():
+    assert get_start_time({"startTime": "2024-05-06T10:20:30.456+0000"}) == 1714990830000
+    assert get_start_time({"startTime": 1714990830456}) == 1714990830000
+    assert get_start_time({"startTime": "unknown"}) is None
+    assert get_start_time({}) is None
+
+
+def test_fetch_files_since(tmp_path, monkeypatch):
+    files = [
+        {"path": "/home/u/out/a.csv", "size": 3, "lastModifiedTime": 1000},
+        {"path": "/home/u/out/b.csv", "size": 3, "lastModifiedTime": 3000},
+        {"path": "/home/u/out/sub/c.csv", "size": 3, "lastModifiedTime": 2000},
+    ]
+    monkeypatch.setattr(FileService, "list_files", lambda self, path: files)
+    monkeypatch.setattr(FileService, "download_file", lambda self, path, fp: fp.write(b"abc"))
+    # the file of a previous export is not downloaded
+    res = fetch_files(None, "/home/u/out", str(tmp_path), since=2000)
+    assert [f["path"] for f in res] == ["/home/u/out/b.csv", "/home/u/out/sub/c.csv"]
+    assert all(f["verified"] for f in res)
+    assert os.path.exists(tmp_path / "out" / "sub" / "c.csv")
+    assert not os.path.exists(tmp_path / "out" / "a.csv")
+
+
+def test_fetch_export_while_running(tmp_path, monkeypatch):
+    a = {"path": "/home/u/out/a.csv", "size": 3, "lastModifiedTime": 2000}
+    b = {"path": "/home/u/out/b.csv", "size": 1, "lastModifiedTime": 2000}
+    old = {"path": "/home/u/out/old.csv", "size": 3, "lastModifiedTime": 1000}
+    # a is written before the task ends, b is still growing, old is from a previous export
+    polls = [
+        ("RUNNING", [a, old]),
+        ("RUNNING", [a, b, old]),
+        ("RUNNING", [a, {**b, "size": 2, "lastModifiedTime": 3000}, old]),
+        ("SUCCEEDED", [a, {**b, "size": 3, "lastModifiedTime": 4000}, old]),
+    ]
+    events = []
+
+    def get_task(self, id):
+        status, files = polls[len([e for e in events if e == "poll"])]
+        events.append("poll")
+        monkeypatch.setattr(FileService, "list_files", lambda self, path: files)
+        return {"id": id, "status": status, "startTime": 2000}
+
+    def download_file(self, path, fp):
+        events.append(os.path.basename(path))
+        fp.write(b"abc")
+
+    monkeypatch.setattr(TaskService, "get_task", get_task)
+    monkeypatch.setattr(FileService, "download_file", download_file)
+    report = fetch_export(None, {"id": "1"}, "/home/u/out", str(tmp_path), max_interval=0)
+    assert events == ["poll", "poll", "a.csv", "poll", "poll", "b.csv"]
+    assert report["status"] == "SUCCEEDED"
+    assert [f["path"] for f in report["files"]] == [a["path"], b["path"]]
+    assert all(f["verified"] for f in report["files"])
+    assert not os.path.exists(tmp_path / "out" / "old.csv")
+
+
+def test_export_sync_state(tmp_path):
+    path = str(tmp_path / "sync.json")
+    command = ExportSyncCommand(None)
+    assert command._read_state(path) == {}
+    state = {"tables": {"P.A": {"lastUpdate": "2024-01-01", "status": "SUCCEEDED"}}}
+    command._write_state(path, state)
+    assert command._read_state(path) == state
+
+
+class _SyncResponse:
+    def __init__(self, id: str):
+        self.id = id
+
+    def from_json(self):
+        return {"id": self.id}
+
+
+def test_export_sync_failure(tmp_path, monkeypatch):
+    def submit(exporter, format):
+        if exporter.tables == ["B"]:
+            raise ValueError("Cannot export")
+        assert not exporter.multilines
+        return _SyncResponse(exporter.tables[0])
+
+    monkeypatch.setattr(ExportSyncCommand, "_get_last_updates", lambda self, *args: {"A": "1", "B": "1"})
+    monkeypatch.setattr(OpalExporter, "submit", submit)
+    monkeypatch.setattr(TaskService, "wait_task", lambda self, id, *args, **kwargs: "SUCCEEDED")
+    path = str(tmp_path / "sync.json")
+    command = ExportSyncCommand(None)
+    res = command.sync("P", "/home/u/out", path, multilines=False)
+    # the failed table does not stop the other, which state is recorded
+    assert [(r["table"], r["status"], r.get("error")) for r in res["exports"]] == [
+        ("A", "SUCCEEDED", None),
+        ("B", "FAILED", "Cannot export"),
+    ]
+    assert list(command._read_state(path)["tables"]) == ["P.A"]
+    assert command.sync("P", "/home/u/out", path, multilines=False, dry_run=True)["changed"] == ["B"]
+    # another output, or other options, make the table changed
+    assert command.sync("P", "/home/u/other", path, multilines=False, dry_run=True)["changed"] == ["A", "B"]
+    assert command.sync("P", "/home/u/out", path, dry_run=True)["changed"] == ["A", "B"]
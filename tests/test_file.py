@@ -2,10 +2,15 @@ import unittest
 
 import pytest
 from tests.utils import make_client
-from obiba_opal.file import FileService
-from obiba_opal.core import HTTPError
+from obiba_opal.file import FileDownloadCommand, FileService, ZipStreamExtractor
+from obiba_opal.core import HTTPError, OpalClient, OpalResponse
+from requests import Response
+import argparse
+import io
+import json
 import os
 import shutil
+import zipfile
 from uuid import uuid4
 
 
@@ -91,3 +96,310 @@ class TestClass(unittest.TestCase):
             assert e.code == 404
         except Exception as e:
             raise AssertionError("Failed to delete file, check if the file exists and if the name is correct.") from e
+
+
+def test_list_local_tree(tmp_path):
+    (tmp_path / "a" / "b").mkdir(parents=True)
+    (tmp_path / "x.txt").write_text("one")
+    (tmp_path / "a" / "b" / "y.txt").write_text("three")
+    (tmp_path / "a" / "z.txt.part").write_text("partial")
+    files = FileService(None)._list_local_tree(str(tmp_path))
+    assert sorted(files) == ["a/b/y.txt", "x.txt"]
+    assert files["a/b/y.txt"]["size"] == 5
+
+
+def test_load_ranges(tmp_path):
+    part = str(tmp_path / "file.part")
+    service = FileService(None)
+    mb = 1024 * 1024
+    version = {"size": 100, "lastModifiedTime": 1}
+    assert service._load_ranges(part, {"size": 4 * mb}, 2) == [[0, 2 * mb - 1, 0], [2 * mb, 4 * mb - 1, 0]]
+    assert service._load_ranges(part, version, 4) == [[0, 99, 0]]
+    with open(part, "wb") as fp:
+        fp.write(b"x" * 10)
+    with open(f"{part}.json", "w") as fp:
+        json.dump({**version, "ranges": [[0, 99, 0]]}, fp)
+    assert service._load_ranges(part, version, 4) == [[0, 99, 10]]
+    # the Opal file was modified since
+    assert service._load_ranges(part, {"size": 100, "lastModifiedTime": 2}, 4) == [[0, 99, 0]]
+    assert not os.path.exists(part)
+
+
+class _RangeRequest:
+    def __init__(self, content: bytes, ranges: bool):
+        self.content = content
+        self.ranges = ranges
+        self.range = None
+
+    def __getattr__(self, name):
+        return lambda *args: self
+
+    def header(self, name: str, value: str):
+        self.range = [int(x) for x in value[len("bytes=") :].split("-")]
+        return self
+
+    def send(self):
+        response = Response()
+        response.status_code = 206 if self.ranges else 200
+        content = self.content[self.range[0] : self.range[1] + 1] if self.ranges else self.content
+        response.raw = io.BytesIO(content)
+        return OpalResponse(response)
+
+
+class _RangeClient:
+    def __init__(self, content: bytes, ranges: bool = True):
+        self.content = content
+        self.ranges = ranges
+
+    def new_request(self):
+        return _RangeRequest(self.content, self.ranges)
+
+
+class _RangeFileService(FileService):
+    def __init__(self, content: bytes, modified: int, ranges: bool = True):
+        super().__init__(_RangeClient(content, ranges), cache_ttl=0)
+        self.info = {"type": "FILE", "readable": True, "size": len(content), "lastModifiedTime": modified}
+
+    def _get_file_info(self, path) -> dict:
+        return {"path": path, **self.info}
+
+
+def test_download_resumable_remote_change(tmp_path):
+    local = str(tmp_path / "data.bin")
+    with open(f"{local}.part", "wb") as fp:
+        fp.write(b"old")
+    with open(f"{local}.part.json", "w") as fp:
+        json.dump({"size": 6, "lastModifiedTime": 1, "ranges": [[0, 5, 0]]}, fp)
+    # same size, modified since: the download restarts
+    res = _RangeFileService(b"newer!", 2).download_file_resumable("/home/u/data.bin", local)
+    assert res["resumed"] == 0
+    with open(local, "rb") as fp:
+        assert fp.read() == b"newer!"
+    assert not os.path.exists(f"{local}.part.json")
+
+
+def test_download_resumable_ranges_not_supported(tmp_path):
+    local = str(tmp_path / "data.bin")
+    content = os.urandom(3 * 1024 * 1024)
+    half = len(content) // 2
+    # segments partially written by a previous download
+    with open(f"{local}.part", "wb") as fp:
+        fp.write(b"x" * len(content))
+    with open(f"{local}.part.json", "w") as fp:
+        ranges = [[0, half - 1, 1000], [half, len(content) - 1, 0]]
+        json.dump({"size": len(content), "lastModifiedTime": 1, "ranges": ranges}, fp)
+    service = _RangeFileService(content, 1, ranges=False)
+    res = service.download_file_resumable("/home/u/data.bin", local, segments=2)
+    assert res["segments"] == 1
+    with open(local, "rb") as fp:
+        assert fp.read() == content
+
+
+def test_zip_stream_extractor(tmp_path):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w") as archive:
+        archive.writestr(zipfile.ZipInfo("data/a.txt"), "a" * 1000, zipfile.ZIP_DEFLATED)
+        archive.writestr(zipfile.ZipInfo("data/b.txt"), "b", zipfile.ZIP_STORED)
+        archive.writestr(zipfile.ZipInfo("empty/"), "")
+    content = buffer.getvalue()
+    chunks = [content[i : i + 10] for i in range(0, len(content), 10)]
+    files = ZipStreamExtractor(str(tmp_path)).extract(chunks)
+    assert files == [{"name": "data/a.txt", "size": 1000}, {"name": "data/b.txt", "size": 1}]
+    assert (tmp_path / "data" / "a.txt").read_text() == "a" * 1000
+    assert (tmp_path / "empty").is_dir()
+
+
+def test_metadata_cache():
+    cache = FileService.MetadataCache(60)
+    folder = {
+        "path": "/home/user",
+        "type": "FOLDER",
+        "children": [
+            {"path": "/home/user/data.csv", "type": "FILE", "size": 10},
+            {"path": "/home/user/sub", "type": "FOLDER"},
+        ],
+    }
+    cache.put(folder)
+    assert cache.get("/home/user/") == folder
+    assert cache.get("/home/user/data.csv")["size"] == 10
+    assert cache.get("/home/user/sub") is None
+    cache.invalidate("/home/user/data.csv")
+    assert cache.get("/home/user/data.csv") is None
+    assert cache.get("/home/user") is None
+    cache = FileService.MetadataCache(0)
+    cache.put(folder)
+    assert cache.get("/home/user") is None
+
+
+def test_hash_cache(tmp_path):
+    path = str(tmp_path / "hashes.json")
+    data = tmp_path / "data.csv"
+    data.write_text("a,b\n1,2\n")
+    hashes = FileService.HashCache(path)
+    digest = hashes.local_hash(str(data))
+    assert digest == FileService.HashCache.hash_file(str(data))
+    info = {"path": "/home/user/data.csv", "size": 8, "lastModifiedTime": 1000}
+    hashes.set_remote(info, digest)
+    hashes.save()
+    hashes = FileService.HashCache(path)
+    assert hashes.remote_hash(info) == digest
+    assert hashes.remote_hash(dict(info, lastModifiedTime=2000)) is None
+
+
+class _SyncFileService(FileService):
+    """
+    File service on an in-memory Opal file system.
+    """
+
+    def __init__(self, files: dict):
+        super().__init__(None, cache_ttl=0)
+        self.files = files
+        self.folders = {"/", "/home", "/home/u"}
+        for path in files:
+            while path != "/":
+                path = os.path.dirname(path)
+                self.folders.add(path)
+        self.created = []
+        self.uploaded = []
+
+    def _get_file_info(self, path) -> dict:
+        if path in self.files:
+            size = len(self.files[path])
+            return {"path": path, "name": os.path.basename(path), "type": "FILE", "size": size, "lastModifiedTime": 0}
+        if path not in self.folders:
+            response = Response()
+            response.status_code = 404
+            response._content = b""
+            raise HTTPError(OpalResponse(response))
+        children = [self._get_file_info(p) for p in sorted(self.files) if os.path.dirname(p) == path]
+        children += [
+            {"path": p, "name": os.path.basename(p), "type": "FOLDER"}
+            for p in sorted(self.folders)
+            if p != "/" and os.path.dirname(p) == path
+        ]
+        return {"path": path, "name": os.path.basename(path), "type": "FOLDER", "children": children}
+
+    def create_folder(self, path: str, parents: bool = False):
+        if parents:
+            return super().create_folder(path, parents)
+        self.created.append(path)
+        self.folders.add(path)
+
+    def upload_file(self, upload: str, path: str):
+        self.uploaded.append(f"{path}/{os.path.basename(upload)}")
+
+    def download_file(self, path: str, fd):
+        fd.write(self.files[path])
+
+
+def test_sync_missing_folder(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "x.txt").write_text("one")
+    (tmp_path / "sub" / "y.txt").write_text("two")
+    service = _SyncFileService({})
+    report = service.sync(str(tmp_path), "/home/u/a/b", dry_run=True)
+    assert report["transferred"] == ["sub/y.txt", "x.txt"]
+    assert service.created == []
+    # the missing folder is created with its missing parent
+    report = service.sync(str(tmp_path), "/home/u/a/b")
+    assert service.created == ["/home/u/a", "/home/u/a/b", "/home/u/a/b/sub"]
+    assert sorted(service.uploaded) == ["/home/u/a/b/sub/y.txt", "/home/u/a/b/x.txt"]
+
+
+def test_sync_missing_local_folder(tmp_path):
+    service = _SyncFileService({"/home/u/a.txt": b"one", "/home/u/sub/b.txt": b"two"})
+    service.delete_file = lambda path: service.files.pop(path)
+    with pytest.raises(Exception, match="does not exist"):
+        service.sync(str(tmp_path / "missing"), "/home/u", delete=True)
+    assert sorted(service.files) == ["/home/u/a.txt", "/home/u/sub/b.txt"]
+
+
+def test_sync_checksum(tmp_path):
+    for name in ["a", "b", "c"]:
+        (tmp_path / f"{name}.txt").write_text("one")
+    service = _SyncFileService({"/home/u/a.txt": b"one", "/home/u/b.txt": b"two", "/home/u/c.txt": b"one"})
+    report = service.sync(str(tmp_path), "/home/u", checksum=True, dry_run=True)
+    assert report["transferred"] == ["b.txt"]
+    assert report["unchanged"] == 2
+
+
+class _DownloadFileService(_SyncFileService):
+    def download_file_resumable(self, path: str, local: str, segments: int = 1, retries: int = 3, progress=None):
+        if path.endswith("bad.csv"):
+            raise Exception("Connection reset")
+        with open(local, "wb") as fp:
+            fp.write(self.files[path])
+        if progress:
+            progress(len(self.files[path]))
+        return {"path": path, "local": local, "size": len(self.files[path])}
+
+
+EXPORT_FILES = {
+    "/projects/A/export/a.csv": b"a",
+    "/projects/A/export/sub/x.csv": b"xx",
+    "/projects/B/export/a.csv": b"aaa",
+    "/projects/B/export/bad.csv": b"bad",
+    "/projects/B/other/b.csv": b"b",
+}
+
+
+def test_glob_files():
+    service = _DownloadFileService(EXPORT_FILES)
+
+    def paths(pattern: str) -> list:
+        return sorted(file["path"] for file in service.glob_files(pattern))
+
+    assert paths("/projects/*/export/*.csv") == [
+        "/projects/A/export/a.csv",
+        "/projects/B/export/a.csv",
+        "/projects/B/export/bad.csv",
+    ]
+    # matching folders are listed recursively
+    assert paths("/projects/?/exp*") == [
+        "/projects/A/export/a.csv",
+        "/projects/A/export/sub/x.csv",
+        "/projects/B/export/a.csv",
+        "/projects/B/export/bad.csv",
+    ]
+    assert paths("/projects/B/other") == ["/projects/B/other/b.csv"]
+    assert paths("/projects/C/*") == []
+
+
+def test_download_files(tmp_path):
+    service = _DownloadFileService(EXPORT_FILES)
+    report = service.download_files(
+        ["/projects/*/export/*.csv", "/projects/A/export/a.csv"], str(tmp_path), silently=True
+    )
+    # paths are relative to the common folder, a failed file does not stop the others
+    results = {file["path"]: file for file in report["files"]}
+    assert sorted(results) == ["/projects/A/export/a.csv", "/projects/B/export/a.csv", "/projects/B/export/bad.csv"]
+    assert results["/projects/B/export/a.csv"]["local"] == str(tmp_path / "B" / "export" / "a.csv")
+    assert (tmp_path / "A" / "export" / "a.csv").read_bytes() == b"a"
+    assert results["/projects/B/export/bad.csv"]["status"] == "FAILED"
+    assert results["/projects/B/export/bad.csv"]["error"] == "Connection reset"
+    assert report["failed"] == 1
+    assert report["size"] == 4
+
+
+def test_file_download_command(tmp_path, monkeypatch, capsys):
+    service = _DownloadFileService(EXPORT_FILES)
+    monkeypatch.setattr(OpalClient.LoginInfo, "parse", lambda args: None)
+    monkeypatch.setattr(OpalClient, "build", lambda login: service)
+    monkeypatch.setattr(FileService, "_get_file_info", service._get_file_info)
+    monkeypatch.setattr(FileService, "download_file_resumable", service.download_file_resumable)
+    service.close = lambda: None
+    args = argparse.Namespace(
+        paths=["/projects/B/export"],
+        output=str(tmp_path),
+        max_workers=2,
+        segments=1,
+        retries=0,
+        verbose=False,
+        json=False,
+    )
+    FileDownloadCommand.do_command(args)
+    report = json.loads(capsys.readouterr().out.split("\r\033[K")[-1])
+    assert [(file["local"], file["status"]) for file in report["files"]] == [
+        (str(tmp_path / "a.csv"), "SUCCEEDED"),
+        (str(tmp_path / "bad.csv"), "FAILED"),
+    ]
@@ -0,0 +1,61 @@
+import io
+
+from obiba_opal import IdentifierMap
+
+
+def test_resolve():
+    mapping = IdentifierMap(None, "Mapping")
+    try:
+        with mapping.db:
+            mapping.db.executemany(
+                "INSERT INTO mapping (id, mapped) VALUES (?, ?)", [(f"sys{i}", f"map{i}") for i in range(10)]
+            )
+        assert len(mapping) == 10
+        assert list(mapping.resolve(["sys1", "unknown", "sys9"], batch_size=2)) == [
+            ("sys1", "map1"),
+            ("unknown", None),
+            ("sys9", "map9"),
+        ]
+        assert list(mapping.resolve(["map3"], reverse=True)) == [("map3", "sys3")]
+        output = io.StringIO()
+        mapping.resolve_to_csv(["sys2"], output)
+        assert output.getvalue() == "id,mapped\r\nsys2,map2\r\n"
+    finally:
+        mapping.close()
+
+
+class _ExportRequest:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def __getattr__(self, name):
+        return lambda *args: self
+
+    def send(self, fp):
+        fp.write(self.content)
+
+
+class _ExportClient:
+    def __init__(self, content: bytes):
+        self.content = content
+
+    def new_request(self):
+        return _ExportRequest(self.content)
+
+
+class _ExportIdentifierMap(IdentifierMap):
+    def _get_last_update(self) -> str:
+        return self.client.content.decode()
+
+
+def test_download():
+    mapping = _ExportIdentifierMap(_ExportClient(b"ID,Mapping\nsys1,map1\nsys2,map2\nsys3,\n"), "Mapping")
+    try:
+        # the header row is skipped
+        assert mapping.download() == 2
+        assert not mapping.refresh()
+        mapping.client = _ExportClient(b"sys2,other2\nsys4,map4\n")
+        assert mapping.refresh()
+        assert list(mapping.resolve(["sys1", "sys2", "sys4"])) == [("sys1", None), ("sys2", "other2"), ("sys4", "map4")]
+    finally:
+        mapping.close()
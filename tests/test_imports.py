@@ -1,9 +1,24 @@
+import json
 import pytest
+import threading
+import time
 from obiba_opal import ImportCSVCommand, TaskService, FileService, DictionaryService
+from obiba_opal.imports import (
+    CSVChunker,
+    CSVValidator,
+    ImportBatchCommand,
+    ImportDataFrameCommand,
+    ImportOpalCommand,
+    ImportSQLCommand,
+    chunk_identifiers,
+    send_identifiers_chunks,
+)
+from obiba_opal.io import ImportCheckpoint, OpalImporter
 from tests.utils import make_client
 import random
 import shutil
 import os
+from pathlib import Path
 
 
 class TestClass:
@@ -39,3 +54,353 @@ class TestClass:
         dico.delete_tables("CNSIM", [inname])
         ds = dico.get_datasource("CNSIM")
         assert inname not in ds["table"]
+
+
+def test_csv_chunker(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text('id,comment\n1,"multi\nline"\n2,b\n3,c\n')
+    chunks = list(CSVChunker(str(path)).split(str(tmp_path), "data", 2))
+    assert [rows for _, rows in chunks] == [2, 1]
+    assert Path(chunks[0][0]).read_bytes() == b'id,comment\r\n1,"multi\nline"\r\n2,b\r\n'
+    assert Path(chunks[1][0]).read_bytes() == b"id,comment\r\n3,c\r\n"
+
+
+def test_csv_validator(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_text("id;age;weight;visit\n1;34;70.5;2020-01-02\n2;;68;2021-03-04\n2;41;80;2021-03-04\n3;41\n")
+    res = CSVValidator(str(path)).validate()
+    assert not res["valid"]
+    assert res["duplicates"] == 1
+    assert [c["valueType"] for c in res["columns"]] == ["text", "integer", "decimal", "date"]
+    assert [e["line"] for e in res["errors"]] == [4, 5]
+    assert res["config"]["separator"] == ";"
+
+
+def test_csv_validator_encoding(tmp_path):
+    path = tmp_path / "data.csv"
+    path.write_bytes("id,name\n1,a\n2,\u00e9\n".encode("utf-16") + b"\x00\xd8")
+    res = CSVValidator(str(path), characterSet="utf-16").validate()
+    assert res["errors"][0] == {"line": 4, "message": "Invalid utf-16 character: unexpected end of data"}
+    path.write_bytes(b"id,name\n1,a\n2,\xe9\n")
+    res = CSVValidator(str(path)).validate()
+    assert res["config"]["characterSet"] == "ISO-8859-1"
+    assert "line 3" in res["warnings"][0]
+
+
+def test_chunk_identifiers():
+    chunks = list(chunk_identifiers(iter(["a\n", "\n", "a\n", "b\n", "a\n", " c \n", "d"]), 2))
+    # the duplicates are skipped within a chunk only
+    assert chunks == [["a", "b"], ["a", "c"], ["d"]]
+
+
+class _IdentifiersRequest:
+    def __init__(self, sent: list, bad: str):
+        self.sent = sent
+        self.bad = bad
+
+    def __getattr__(self, name):
+        return lambda *args: self
+
+    def content(self, content: str):
+        self.chunk = content.split("\n")
+        return self
+
+    def send(self):
+        if self.bad in self.chunk:
+            raise ValueError("Bad identifier")
+        self.sent.append(self.chunk)
+
+
+class _IdentifiersClient:
+    def __init__(self, bad: str = "c"):
+        self.sent = []
+        self.bad = bad
+
+    def new_request(self):
+        return _IdentifiersRequest(self.sent, self.bad)
+
+
+def test_send_identifiers_chunks_failure():
+    client = _IdentifiersClient()
+    ids = iter([f"{x}\n" for x in "abcdefghij"])
+    res = send_identifiers_chunks(client, "/identifiers", ids, chunk_size=1, max_workers=1, retries=0)
+    assert res["status"] == "FAILED"
+    assert res["error"] == "Bad identifier"
+    # chunks are not sent after the failure
+    assert client.sent[:2] == [["a"], ["b"]]
+    assert len(client.sent) < 9
+    assert next(ids, None) is not None
+    # the sent chunks are reported, to be skipped when sending again
+    assert res["sent"][:2] == [0, 1]
+    assert 2 not in res["sent"]
+    client = _IdentifiersClient(bad=None)
+    ids = [f"{x}\n" for x in "abcdefghij"]
+    res = send_identifiers_chunks(client, "/identifiers", ids, chunk_size=1, max_workers=1, skip=res["sent"])
+    assert res["status"] == "SUCCEEDED"
+    assert res["sent"] == list(range(10))
+    assert client.sent[0] == ["c"]
+
+
+class _BlockingImportCommand:
+    # the first imports of each project wait for each other
+    barrier = threading.Barrier(2, timeout=5)
+
+    def __init__(self, client, verbose):
+        pass
+
+    def import_data(self, destination: str, table: str) -> dict:
+        if table == "first":
+            self.barrier.wait()
+        return {"id": f"{destination}.{table}"}
+
+
+class _BlockingImportBatchCommand(ImportBatchCommand):
+    SOURCES = {"csv": _BlockingImportCommand}
+
+
+def test_import_batch_projects_overlap(monkeypatch):
+    monkeypatch.setattr(TaskService, "wait_task", lambda self, id, *args, **kwargs: "SUCCEEDED")
+    imports = [
+        {"source": "csv", "destination": "A", "table": "first"},
+        {"source": "csv", "destination": "A", "table": "second"},
+        {"source": "csv", "destination": "B", "table": "first"},
+    ]
+    # the second import of A does not hold a worker while the first one runs
+    res = _BlockingImportBatchCommand(None).import_batch({"imports": imports}, max_workers=2)
+    assert res["status"] == "SUCCEEDED"
+    assert [r["task"] for r in res["imports"]] == ["A.first", "A.second", "B.first"]
+
+
+class _TransientResponse:
+    def __init__(self, content: dict, headers: dict = None):
+        self.content = json.dumps(content)
+        self.headers = headers if headers else {}
+
+    def from_json(self):
+        return json.loads(self.content)
+
+
+class _TransientRequest:
+    def __init__(self, requests: list):
+        self.requests = requests
+        self.method = None
+        self.body = None
+
+    def __getattr__(self, name):
+        return lambda *args: self
+
+    def get(self):
+        self.method = "GET"
+        return self
+
+    def post(self):
+        self.method = "POST"
+        return self
+
+    def delete(self):
+        self.method = "DELETE"
+        return self
+
+    def resource(self, uri: str):
+        self.uri = uri
+        return self
+
+    def content(self, body: str):
+        self.body = json.loads(body)
+        return self
+
+    def send(self):
+        self.requests.append((self.method, self.uri, self.body))
+        if self.uri.endswith("/transient-datasources?merge=false"):
+            return _TransientResponse({"name": "T1", "table": ["t1", "t10"]})
+        if self.uri.endswith("/commands/_import"):
+            return _TransientResponse({}, {"Location": "http://localhost/ws/shell/command/1"})
+        if self.uri.startswith("/shell/command/"):
+            return _TransientResponse({"id": self.uri.split("/")[-1]})
+        if self.uri.endswith("/tables"):
+            return _TransientResponse([{"name": "t1"}, {"name": "t10"}])
+        return _TransientResponse({})
+
+
+class _TransientClient:
+    def __init__(self):
+        self.requests = []
+
+    def new_request(self):
+        return _TransientRequest(self.requests)
+
+
+class _ExtensionFactory(OpalImporter.ExtensionFactoryInterface):
+    def __init__(self):
+        self.count = 0
+
+    def add(self, factory):
+        self.count += 1
+        factory["csvDatasourceFactory"] = {}
+
+
+def test_importer_transient_reuse():
+    client = _TransientClient()
+    factory = _ExtensionFactory()
+    importer = OpalImporter.build(client, "P", tables=["t", "t1"])
+    importer.prepare(factory)
+    assert [t["name"] for t in importer.preview(limit=0)["tables"]] == ["t1", "t10"]
+    importer.submit()
+    importer.submit(tables=["t10"])
+    # the source is parsed once, tables are matched by their exact name
+    assert factory.count == 1
+    imports = [body["tables"] for method, uri, body in client.requests if uri.endswith("/commands/_import")]
+    assert imports == [["T1.t1"], ["T1.t10"]]
+    # another source replaces the prepared one
+    other = _ExtensionFactory()
+    importer.submit(other)
+    assert other.count == 1
+    assert ("DELETE", "/datasource/T1", None) in client.requests
+
+
+def test_importer_transient_release():
+    client = _TransientClient()
+    importer = OpalImporter.build(client, "P")
+    importer.release()
+    assert client.requests == []
+    importer.prepare(_ExtensionFactory())
+    importer.release()
+    assert client.requests[-1] == ("DELETE", "/datasource/T1", None)
+    assert importer.transient is None
+    with pytest.raises(ValueError):
+        importer.get_tables()
+    with pytest.raises(ValueError):
+        importer.submit()
+
+
+class _GroupFailureRequest(_TransientRequest):
+    def send(self):
+        if self.uri.endswith("/commands/_import") and len(self.body["tables"]) > 1:
+            raise ValueError("Too many tables")
+        return super().send()
+
+
+class _GroupFailureClient(_TransientClient):
+    def new_request(self):
+        return _GroupFailureRequest(self.requests)
+
+
+def test_import_tables_group_failure(monkeypatch):
+    monkeypatch.setattr(TaskService, "wait_task", lambda self, id, *args, **kwargs: "SUCCEEDED")
+    client = _GroupFailureClient()
+    res = ImportOpalCommand(client).import_tables(None, "rds", None, None, None, "P", group_size=2)
+    # the tables of the group that could not be submitted are imported one by one
+    assert res["status"] == "SUCCEEDED"
+    assert [(r["table"], r["attempts"]) for r in res["tables"]] == [("t1", 1), ("t10", 1)]
+    imports = [body["tables"] for method, uri, body in client.requests if uri.endswith("/commands/_import")]
+    assert imports == [["T1.t1"], ["T1.t10"]]
+    assert client.requests[-1] == ("DELETE", "/datasource/T1", None)
+
+
+def test_import_tables_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.setattr(TaskService, "wait_task", lambda self, id, *args, **kwargs: "SUCCEEDED")
+    path = str(tmp_path / "checkpoint.json")
+    ImportCheckpoint(path).update("sql:db:P.t1", task="0", status="SUCCEEDED")
+    client = _TransientClient()
+    res = ImportSQLCommand(client).import_tables("db", "P", checkpoint=ImportCheckpoint(path, resume=True))
+    # the table which import has completed is not imported again
+    assert res["status"] == "SUCCEEDED"
+    assert [(r["table"], r["task"], r.get("resumed")) for r in res["tables"]] == [
+        ("t1", "0", "skipped"),
+        ("t10", "1", None),
+    ]
+    imports = [body["tables"] for method, uri, body in client.requests if uri.endswith("/commands/_import")]
+    assert imports == [["T1.t10"]]
+    # the throughput is the one of the value sets of the source table
+    counts = [uri for method, uri, body in client.requests if "counts" in uri]
+    assert [uri.split("?")[0] for uri in counts] == ["/datasource/T1/table/t10"]
+    assert ImportCheckpoint(path, resume=True).get("sql:db:P.t10") == {"task": "1", "status": "SUCCEEDED"}
+
+
+def test_run_tasks_submit_failure(monkeypatch):
+    monkeypatch.setattr(TaskService, "get_task", lambda self, id: {"id": id, "status": "SUCCEEDED"})
+    attempts = {}
+
+    def submit(item: str) -> str:
+        attempts[item] = attempts.get(item, 0) + 1
+        if item == "b.vcf" or attempts[item] == 1:
+            raise ValueError("Cannot submit")
+        return item
+
+    results = TaskService(None).run_tasks(submit, ["a.vcf", "b.vcf"], retries=1, silently=True)
+    # the submission failures are retried and reported
+    assert [(r["status"], r["attempts"], r.get("error")) for r in results] == [
+        ("SUCCEEDED", 2, None),
+        ("FAILED", 2, "Cannot submit"),
+    ]
+
+
+def test_import_local_data_first_chunk(tmp_path, monkeypatch):
+    path = tmp_path / "data.csv"
+    path.write_text("id,x\n" + "".join(f"{i},{i}\n" for i in range(5)))
+    lock = threading.Lock()
+    events = []
+
+    def import_data(self, remote: str, destination: str, **kwargs) -> dict:
+        with lock:
+            events.append(("start", remote))
+            calls = len([e for e in events if e[0] == "start"])
+        time.sleep(0.05)
+        with lock:
+            events.append(("end", remote))
+        if calls == 3:
+            raise ValueError("Cannot import")
+        return {"id": remote}
+
+    monkeypatch.setattr(FileService, "upload_file", lambda self, upload, path: None)
+    monkeypatch.setattr(FileService, "delete_file", lambda self, path: None)
+    monkeypatch.setattr(ImportCSVCommand, "import_data", import_data)
+    monkeypatch.setattr(TaskService, "wait_task", lambda self, id, *args, **kwargs: "SUCCEEDED")
+    res = ImportCSVCommand(None).import_local_data(str(path), "/tmp", "P", chunk_rows=1, max_workers=3, retries=0)
+    # the first chunk is imported before the others
+    assert events[:2] == [("start", events[0][1]), ("end", events[0][1])]
+    # a failed chunk does not stop the import
+    assert [c["status"] for c in res["chunks"]].count("FAILED") == 1
+    assert [c["index"] for c in res["chunks"]] == [0, 1, 2, 3, 4]
+    assert res["status"] == "FAILED"
+
+
+def test_import_batch_manifest():
+    with pytest.raises(ValueError):
+        ImportBatchCommand(None).import_batch({"imports": [{"source": "foo", "destination": "CNSIM"}]})
+    with pytest.raises(ValueError):
+        ImportBatchCommand(None).import_batch({"imports": [{"source": "csv", "path": "/tmp/data.csv"}]})
+    with pytest.raises(ValueError):
+        ImportBatchCommand(None).import_batch({"imports": [], "project_limit": 0})
+
+
+def test_data_frame_variables():
+    pd = pytest.importorskip("pandas")
+    df = pd.DataFrame({
+        "id": ["1", "2", "3"],
+        "age": [34, 41, 28],
+        "weight": [70.5, None, 80.0],
+        "smoker": [True, False, True],
+        "sex": pd.Categorical(["M", "F", "F"]),
+    })
+    command = ImportDataFrameCommand(None)
+    variables = command.get_pandas_variables(df)
+    assert [v["name"] for v in variables] == ["age", "weight", "smoker", "sex"]
+    assert [v["valueType"] for v in variables] == ["integer", "decimal", "boolean", "text"]
+    assert [c["name"] for c in variables[3]["categories"]] == ["F", "M"]
+    chunks = list(command._pandas_chunks(df[["age", "id"]], "id", 2))
+    assert b"".join(chunks) == b"id,age\n1,34\n2,41\n3,28\n"
+    assert len(chunks) == 2
+
+
+def test_import_checkpoint(tmp_path):
+    path = str(tmp_path / "checkpoint.json")
+    checkpoint = ImportCheckpoint(path)
+    checkpoint.update("CNSIM:0", task=1, status=None)
+    checkpoint.update("CNSIM:0", status="SUCCEEDED")
+    checkpoint.update("CNSIM:1", task=2, status="FAILED")
+    resumed = ImportCheckpoint(path, resume=True)
+    assert resumed.attach("CNSIM:0", None) == {"task": 1, "status": "SUCCEEDED", "resumed": "skipped"}
+    assert resumed.attach("CNSIM:1", None) is None
+    assert resumed.attach("CNSIM:2", None) is None
+    assert ImportCheckpoint(path).get("CNSIM:0") is None